@@ -2,8 +2,12 @@
 # Licensed under the MIT License. See LICENSE in the project root
 # for license information.
 
+import itertools
 import locale
+import math
 import sys
+import warnings
+from collections import OrderedDict
 from typing import ClassVar
 
 
@@ -404,6 +408,21 @@ class DisplayOptions:
 _safe_repr = SafeRepr()
 _collection_types = ["list", "tuple", "set"]
 _array_page_size = 50
+# This script runs in a new function scope on every request, the snapshot of the root
+# variables is kept in a user global that the variable requests skip.
+_snapshot_name = "__VSCODE_variable_snapshot"
+# Descriptions of immutable scalars by type, id and hash, the least recently used are
+# dropped first. Kept in a user global like the snapshot, and only used by
+# getVariableDescriptionsByName, whose client asks for changes with getVariableChanges.
+_cache_name = "__VSCODE_variable_cache"
+_cache_size = 512
+# Immutable values, the only ones whose changes getVariableChanges can see cheaply.
+_scalar_types = (int, float, complex, str, bytes, bool, type(None))
+# Arrays with more elements get no min, max and mean. Frames show this many rows at their
+# head and tail, and of their columns.
+_array_stats_max_size = 10**8
+_frame_preview_rows = 5
+_frame_preview_columns = 20
 
 
 def _get_value(variable):
@@ -432,7 +451,118 @@ def _get_full_type(var_type):
     return None
 
 
-def _get_variable_description(variable):
+def _get_module(variable, name):
+    """Return the module `name` if `variable` is one of its objects.
+
+    The module is taken from sys.modules and never imported, the user code that created
+    the variable imported it.
+    """
+    try:
+        if type(variable).__module__.partition(".")[0] != name:
+            return None
+    except Exception:
+        return None
+    return sys.modules.get(name)
+
+
+def _is_ndarray(variable):
+    numpy = _get_module(variable, "numpy")
+    return numpy is not None and isinstance(variable, numpy.ndarray)
+
+
+def _is_dataframe(variable):
+    pandas = _get_module(variable, "pandas")
+    return pandas is not None and isinstance(variable, pandas.DataFrame)
+
+
+def _is_series(variable):
+    pandas = _get_module(variable, "pandas")
+    return pandas is not None and isinstance(variable, pandas.Series)
+
+
+def _to_json_number(value):
+    value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    return value
+
+
+def _get_array_summary(array):
+    summary = {"shape": list(array.shape), "dtype": str(array.dtype), "nbytes": int(array.nbytes)}
+    # Booleans, integers and floats, the statistics are computed by numpy and skip NaNs.
+    if array.dtype.kind in "biuf" and 0 < array.size <= _array_stats_max_size:
+        numpy = sys.modules["numpy"]
+        with warnings.catch_warnings(), numpy.errstate(all="ignore"):
+            # Arrays of only NaNs warn, their statistics are NaN.
+            warnings.simplefilter("ignore", RuntimeWarning)
+            summary["min"] = _to_json_number(numpy.nanmin(array))
+            summary["max"] = _to_json_number(numpy.nanmax(array))
+            summary["mean"] = _to_json_number(numpy.nanmean(array))
+    return summary
+
+
+def _get_dataframe_summary(frame):
+    preview = frame.iloc[:, :_frame_preview_columns]
+    return {
+        "shape": list(frame.shape),
+        "nbytes": int(frame.memory_usage(index=True, deep=False).sum()),
+        "columns": [
+            {"name": str(name), "dtype": str(dtype)} for name, dtype in frame.dtypes.items()
+        ],
+        "head": preview.head(_frame_preview_rows).to_string(),
+        "tail": preview.tail(_frame_preview_rows).to_string(),
+    }
+
+
+def _get_series_summary(series):
+    return {
+        "shape": list(series.shape),
+        "dtype": str(series.dtype),
+        "nbytes": int(series.memory_usage(index=True, deep=False)),
+        "head": series.head(_frame_preview_rows).to_string(),
+        "tail": series.tail(_frame_preview_rows).to_string(),
+    }
+
+
+def _get_summary(variable):
+    """Return the shape, type and a preview of NumPy arrays and pandas objects."""
+    try:
+        if _is_ndarray(variable):
+            return _get_array_summary(variable)
+        if _is_dataframe(variable):
+            return _get_dataframe_summary(variable)
+        if _is_series(variable):
+            return _get_series_summary(variable)
+    except Exception:
+        pass
+    return None
+
+
+def _get_count(variable, full_type):
+    if hasattr(variable, "__len__") and full_type in _collection_types:
+        return len(variable)
+    # The rows of arrays and series are their indexed children.
+    if (_is_ndarray(variable) and variable.ndim > 0) or _is_series(variable):
+        return len(variable)
+    return None
+
+
+def _get_page(variable, start, end):
+    """Return the items of an indexed variable from start to end, taken with one slice."""
+    if isinstance(variable, (list, tuple)) or _is_ndarray(variable):
+        return variable[start:end]
+    if _is_series(variable):
+        return variable.iloc[start:end]
+    if isinstance(variable, (set, frozenset)):
+        return list(itertools.islice(variable, start, end))
+    return [_get_child_property(variable, [i]) for i in range(start, end)]
+
+
+def _has_named_children(variable):
+    return hasattr(variable, "__dict__") or isinstance(variable, dict)
+
+
+def _describe_variable(variable):
     result = {}
 
     var_type = type(variable)
@@ -440,24 +570,79 @@ def _get_variable_description(variable):
     if hasattr(var_type, "__mro__"):
         result["interfaces"] = [_get_full_type(t) for t in var_type.__mro__]
 
-    if hasattr(variable, "__len__") and result["type"] in _collection_types:
-        result["count"] = len(variable)
+    count = _get_count(variable, result["type"])
+    if count is not None:
+        result["count"] = count
+
+    result["hasNamedChildren"] = _has_named_children(variable)
 
-    result["hasNamedChildren"] = hasattr(variable, "__dict__") or isinstance(variable, dict)
+    summary = _get_summary(variable)
+    if summary is not None:
+        result["summary"] = summary
 
     result["value"] = _get_value(variable)
     return result
 
 
+def _get_version(variable):
+    """Return a signal that changes when an immutable scalar is replaced, or None.
+
+    Other values can change in place, such as `lst[0] = 1` or `p.x = 5`, which no cheap
+    signal shows, so they have no version. The type, id and hash of a scalar keep no
+    reference to it, and the hash tells apart values that reuse the id of a freed one.
+    """
+    if type(variable) not in _scalar_types:
+        return None
+    return type(variable), id(variable), hash(variable)
+
+
+def _get_variable_description(variable):
+    """Return the description of a variable, reusing it for the same immutable scalar."""
+    key = _get_version(variable)
+    if key is None:
+        return _describe_variable(variable)
+    cache = globals().get(_cache_name)
+    if cache is None:
+        cache = globals()[_cache_name] = OrderedDict()
+    description = cache.get(key)
+    if description is not None:
+        cache.move_to_end(key)
+        return description
+    description = _describe_variable(variable)
+    cache[key] = description
+    cache.move_to_end(key)
+    while len(cache) > _cache_size:
+        cache.popitem(last=False)
+    return description
+
+
+### Forget the cached descriptions of scalars, to free their memory
+def clearVariableCache():  # noqa: N802
+    globals().pop(_cache_name, None)
+
+
 def _get_child_property(root, property_chain):
     try:
         variable = root
         for prop in property_chain:
             if isinstance(prop, int):
-                if hasattr(variable, "__getitem__"):
+                if _is_series(variable):
+                    # Series are indexed by their labels, the children by position.
+                    variable = variable.iloc[prop]
+                elif hasattr(variable, "__getitem__"):
                     variable = variable[prop]
                 elif isinstance(variable, set):
-                    variable = list(variable)[prop]
+                    variable = next(itertools.islice(variable, prop, None))
+                else:
+                    return None
+            elif _is_dataframe(variable):
+                # Columns are looked up by name first, a column such as "count" would
+                # otherwise be the method of the same name.
+                columns = [column for column in variable.columns if str(column) == prop]
+                if columns:
+                    variable = variable[columns[0]]
+                elif hasattr(variable, prop):
+                    variable = getattr(variable, prop)
                 else:
                     return None
             elif hasattr(variable, prop):
@@ -475,22 +660,78 @@ def _get_child_property(root, property_chain):
 types_to_exclude = ["module", "function", "method", "class", "type"]
 
 
+def _get_root_variables():
+    return [
+        (name, variable)
+        for name, variable in list(globals().items())
+        if type(variable).__name__ not in types_to_exclude and not name.startswith("__")
+    ]
+
+
+def _get_root_name_and_type(name, variable):
+    return {
+        "name": name,
+        "type": _get_full_type(type(variable)),
+        "root": name,
+        "propertyChain": [],
+        "language": "python",
+    }
+
+
+def _get_root_description(name, variable, describe=_describe_variable):
+    return {
+        "name": name,
+        **describe(variable),
+        "root": name,
+        "propertyChain": [],
+        "language": "python",
+    }
+
+
 ### Get info on variables at the root level
 def getVariableDescriptions():  # noqa: N802
+    return [_get_root_description(name, variable) for name, variable in _get_root_variables()]
+
+
+### Get the names and types of a page of the variables at the root level, without values
+def getVariableNames(start=0, count=None):  # noqa: N802
+    variables = _get_root_variables()
+    end = len(variables) if count is None else start + count
+    return {
+        "total": len(variables),
+        "variables": [
+            _get_root_name_and_type(name, variable) for name, variable in variables[start:end]
+        ],
+    }
+
+
+### Get info on the variables at the root level with the given names, such as a visible page
+def getVariableDescriptionsByName(names):  # noqa: N802
+    variables = globals()
     return [
-        {
-            "name": varName,
-            **_get_variable_description(globals()[varName]),
-            "root": varName,
-            "propertyChain": [],
-            "language": "python",
-        }
-        for varName in globals()
-        if type(globals()[varName]).__name__ not in types_to_exclude
-        and not varName.startswith("__")
+        _get_root_description(name, variables[name], _get_variable_description)
+        for name in names
+        if name in variables and not name.startswith("__")
     ]
 
 
+### Get the variables at the root level added, changed or removed since the previous call
+def getVariableChanges():  # noqa: N802
+    previous = globals().get(_snapshot_name) or {}
+    variables = _get_root_variables()
+    # Variables without a version, all but immutable scalars, are always reported.
+    snapshot = {name: _get_version(variable) for name, variable in variables}
+    globals()[_snapshot_name] = snapshot
+    return {
+        "changed": [
+            _get_root_name_and_type(name, variable)
+            for name, variable in variables
+            if snapshot[name] is None or previous.get(name) != snapshot[name]
+        ],
+        "removed": [name for name in previous if name not in snapshot],
+    }
+
+
 ### Get info on children of a variable reached through the given property chain
 def getAllChildrenDescriptions(root_var_name, property_chain, start_index):  # noqa: N802
     root = globals()[root_var_name]
@@ -502,22 +743,36 @@ def getAllChildrenDescriptions(root_var_name, property_chain, start_index):  # n
         parent = _get_child_property(root, property_chain)
 
     children = []
-    parent_info = _get_variable_description(parent)
-    if "count" in parent_info:
-        if parent_info["count"] > 0:
-            last_item = min(parent_info["count"], start_index + _array_page_size)
+    # Only the size and kind of the parent are needed, not its value.
+    count = _get_count(parent, _get_full_type(type(parent)))
+    if count is not None:
+        if count > 0:
+            last_item = min(count, start_index + _array_page_size)
             index_range = range(start_index, last_item)
             children = [
                 {
-                    **_get_variable_description(_get_child_property(parent, [i])),
+                    **_describe_variable(child),
                     "name": str(i),
                     "root": root_var_name,
                     "propertyChain": [*property_chain, i],
                     "language": "python",
                 }
-                for i in index_range
+                for i, child in zip(index_range, _get_page(parent, start_index, last_item))
             ]
-    elif parent_info["hasNamedChildren"]:
+    elif _is_dataframe(parent):
+        # The children of a frame are its columns, not its attributes, some of which
+        # copy or transpose the whole frame.
+        children = [
+            {
+                **_describe_variable(column),
+                "name": str(name),
+                "root": root_var_name,
+                "propertyChain": [*property_chain, str(name)],
+                "language": "python",
+            }
+            for name, column in parent.items()
+        ]
+    elif _has_named_children(parent):
         children_names = []
         if hasattr(parent, "__dict__"):
             children_names = _get_property_names(parent)
@@ -529,7 +784,7 @@ def getAllChildrenDescriptions(root_var_name, property_chain, start_index):  # n
             child_property = _get_child_property(parent, [prop])
             if child_property is not None and type(child_property).__name__ not in types_to_exclude:
                 child = {
-                    **_get_variable_description(child_property),
+                    **_describe_variable(child_property),
                     "name": prop,
                     "root": root_var_name,
                     "propertyChain": [*property_chain, prop],
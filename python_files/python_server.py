@@ -1,28 +1,211 @@
+import _thread
 import ast
+import base64
 import contextlib
+import hashlib
 import io
 import json
+import os
+import queue
+import re
+import signal
 import sys
+import tempfile
+import threading
+import time
 import traceback
 import uuid
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from types import CodeType
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 STDIN = sys.stdin
 STDOUT = sys.stdout
 STDERR = sys.stderr
 USER_GLOBALS = {}
+# When enabled, output is sent in `output` notifications while the code runs, and the
+# response to `execute` only carries the status.
+STREAM_OUTPUT = os.getenv("PYTHON_SERVER_STREAM_OUTPUT") == "True"
+# Buffered output is sent when it reaches this many characters, or is this many seconds old.
+OUTPUT_FLUSH_SIZE = 16 * 1024
+OUTPUT_FLUSH_INTERVAL = 0.1
+# The output of one execution is cut to this many characters per stream, keeping its head
+# and tail, as is the text of a displayed value. The default 0 keeps all of it. With spilling enabled, the complete output of a
+# cut stream is written to a file in PYTHON_SERVER_OUTPUT_SPILL_DIR, or the temp directory.
+OUTPUT_MAX_CHARS = int(os.getenv("PYTHON_SERVER_OUTPUT_MAX_CHARS", "0"))
+OUTPUT_SPILL_ENABLED = os.getenv("PYTHON_SERVER_OUTPUT_SPILL_ENABLED") == "True"
+OUTPUT_SPILL_DIR = os.getenv("PYTHON_SERVER_OUTPUT_SPILL_DIR")
+# When enabled, the value of the last expression of an execution is sent in a `display`
+# notification with its representations by MIME type, instead of being printed.
+RICH_DISPLAY = os.getenv("PYTHON_SERVER_RICH_DISPLAY") == "True"
+# The MIME types the client renders, representations of other types are never rendered.
+DISPLAY_MIMETYPES = os.getenv(
+    "PYTHON_SERVER_DISPLAY_MIMETYPES", "text/plain,text/html,text/markdown,image/png,image/svg+xml"
+).split(",")
+# When set, every execution is appended to the history database at this path.
+HISTORY_FILE = os.getenv("PYTHON_SERVER_HISTORY_FILE")
+# The most history entries a single `history` request returns.
+HISTORY_MAX_RESULTS = 1000
+# The extension runs its own scripts, such as the variable requests, wrapped in functions
+# with this prefix. They are not part of the history.
+EXTENSION_SCRIPT_PREFIX = "def __VSCODE_"
+# The JSON library used for messages: orjson, ujson or json. Defaults to the fastest one
+# that is installed.
+JSON_CODEC = os.getenv("PYTHON_SERVER_JSON_CODEC")
+# Initial size of the buffer incoming messages are read into, it grows to the largest one.
+READ_BUFFER_SIZE = 64 * 1024
+# The end of the headers of a message.
+HEADER_END = re.compile(rb"\r?\n\r?\n")
+# Compiled user input by source hash, the least recently used entries are dropped first.
+CODE_CACHE_SIZE = 128
 
 
-def _send_message(msg: str):
-    # Content-Length is the data size in bytes.
-    length_msg = len(msg.encode())
-    STDOUT.buffer.write(f"Content-Length: {length_msg}\r\n\r\n{msg}".encode())
-    STDOUT.buffer.flush()
+class JsonCodec(NamedTuple):
+    """Functions that serialize messages to UTF-8 encoded JSON and back."""
+
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[Union[bytes, memoryview]], Any]
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj).encode()
+
+
+def _json_loads(data: Union[bytes, memoryview]) -> Any:
+    return json.loads(bytes(data))
+
+
+def _with_fallback(function: Callable, fallback: Callable) -> Callable:
+    """Serialize or parse with the standard library what `function` rejects.
+
+    The standard library also handles lone surrogates and integers of any size.
+    """
+
+    def function_with_fallback(arg: Any) -> Any:
+        try:
+            return function(arg)
+        except (TypeError, ValueError, OverflowError):
+            return fallback(arg)
+
+    return function_with_fallback
+
+
+def _json_codec() -> JsonCodec:
+    return JsonCodec("json", _json_dumps, _json_loads)
+
+
+def _orjson_codec() -> JsonCodec:
+    import orjson
+
+    return JsonCodec(
+        "orjson",
+        _with_fallback(orjson.dumps, _json_dumps),
+        _with_fallback(orjson.loads, _json_loads),
+    )
+
+
+def _ujson_codec() -> JsonCodec:
+    import ujson
+
+    def dumps(obj: Any) -> bytes:
+        return ujson.dumps(obj, ensure_ascii=False).encode()
+
+    def loads(data: Union[bytes, memoryview]) -> Any:
+        return ujson.loads(bytes(data))
+
+    return JsonCodec(
+        "ujson", _with_fallback(dumps, _json_dumps), _with_fallback(loads, _json_loads)
+    )
+
+
+# The codecs by library name, fastest first.
+JSON_CODECS: Dict[str, Callable[[], JsonCodec]] = {
+    "orjson": _orjson_codec,
+    "ujson": _ujson_codec,
+    "json": _json_codec,
+}
+
+
+def load_codec(name: Optional[str] = None) -> JsonCodec:
+    """Return the codec of the JSON library `name`, or of the fastest one installed.
+
+    The standard library is used when the library is not installed.
+    """
+    for codec_name in (name, "json") if name else JSON_CODECS:
+        factory = JSON_CODECS.get(codec_name)
+        if factory is None:
+            continue
+        try:
+            return factory()
+        except ImportError:
+            continue
+    return _json_codec()
+
+
+CODEC = load_codec(JSON_CODEC)
+
+
+class MessageWriter:
+    """Write content-length framed messages to stdout.
+
+    Messages that a thread sends inside `batch` are collected and written at once when
+    the batch ends. Messages of other threads are written right away, they never wait
+    for a batch.
+    """
+
+    def __init__(self):
+        # Output streams are flushed from a background thread, messages must not interleave.
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def send(self, body: bytes):
+        # Content-Length is the data size in bytes.
+        header = b"Content-Length: %d\r\n\r\n" % len(body)
+        pending: Optional[bytearray] = getattr(self._local, "pending", None)
+        if pending is not None:
+            pending += header
+            pending += body
+            return
+        with self._lock:
+            STDOUT.buffer.write(header)
+            STDOUT.buffer.write(body)
+            STDOUT.buffer.flush()
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[None]:
+        """Write the messages this thread sends in this context at once, when it ends."""
+        if getattr(self._local, "pending", None) is not None:
+            yield
+            return
+        self._local.pending = pending = bytearray()
+        try:
+            yield
+        finally:
+            self._local.pending = None
+            if pending:
+                with self._lock:
+                    STDOUT.buffer.write(pending)
+                    STDOUT.buffer.flush()
+
+
+MESSAGE_WRITER = MessageWriter()
 
 
 def send_message(**kwargs):
-    _send_message(json.dumps({"jsonrpc": "2.0", **kwargs}))
+    MESSAGE_WRITER.send(CODEC.dumps({"jsonrpc": "2.0", **kwargs}))
 
 
 def print_log(msg: str):
@@ -40,8 +223,16 @@ def send_response(
     )
 
 
-def send_request(params: Optional[Union[List, Dict]] = None):
-    request_id = uuid.uuid4().hex
+def send_output(response_id: int, stream: str, text: str):
+    send_message(method="output", params={"id": response_id, "stream": stream, "text": text})
+
+
+def send_display(response_id: int, data: Dict[str, Any], metadata: Dict[str, Any]):
+    send_message(method="display", params={"id": response_id, "data": data, "metadata": metadata})
+
+
+def send_request(params: Optional[Union[List, Dict]] = None, request_id: Optional[str] = None):
+    request_id = request_id or uuid.uuid4().hex
     if params is None:
         send_message(id=request_id, method="input")
     else:
@@ -55,14 +246,21 @@ original_input = input
 
 def custom_input(prompt=""):
     try:
+        # Show the output printed so far before asking for input.
+        sys.stdout.flush()
+        if READER is not None:
+            # The reader thread owns stdin, it passes the response on to this thread.
+            response = READER.request({"prompt": prompt})
+            if response is None:
+                sys.exit(0)
+            return response["result"]["userInput"]
         send_request({"prompt": prompt})
         headers = get_headers()
         # Content-Length is the data size in bytes.
         content_length = int(headers.get("Content-Length", 0))
 
         if content_length:
-            message_text = STDIN.buffer.read(content_length).decode()
-            message_json = json.loads(message_text)
+            message_json = CODEC.loads(STDIN.buffer.read(content_length))
             return message_json["result"]["userInput"]
     except EOFError:
         # Input stream closed, exit gracefully
@@ -84,8 +282,7 @@ def handle_response(request_id):
             content_length = int(headers.get("Content-Length", 0))
 
             if content_length:
-                message_text = STDIN.buffer.read(content_length).decode()
-                message_json = json.loads(message_text)
+                message_json = CODEC.loads(STDIN.buffer.read(content_length))
                 our_user_input = message_json["result"]["userInput"]
                 if message_json["id"] == request_id:
                     send_response(our_user_input, message_json["id"])
@@ -98,47 +295,162 @@ def handle_response(request_id):
             print_log(traceback.format_exc())
 
 
-def exec_function(user_input):
+class CompiledInput(NamedTuple):
+    """User input compiled like IPython does: the statements, then the value of a last expression.
+
+    `error` is set when the input parses but does not compile, for example for `return`
+    outside of a function.
+    """
+
+    body: Optional[CodeType]
+    expression: Optional[CodeType]
+    error: Optional[SyntaxError]
+
+
+class CodeCache:
+    """Parse and compile user input once, and keep the result for repeated input.
+
+    Syntax checks and executions of the same source share one entry, so a cell that was
+    checked while it was typed is not parsed again when it runs.
+    """
+
+    def __init__(self, size: int = CODE_CACHE_SIZE):
+        self.size = size
+        self._entries: OrderedDict[bytes, Union[CompiledInput, SyntaxError]] = OrderedDict()
+        # Syntax checks are answered on the reader thread while code runs on the main thread.
+        self._lock = threading.Lock()
+
+    def compile(self, source: str) -> CompiledInput:
+        """Return the compiled input, raise SyntaxError if the source does not parse."""
+        key = hashlib.blake2b(source.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            entry = compile_input(source)
+            with self._lock:
+                self._entries[key] = entry
+                if len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        if isinstance(entry, SyntaxError):
+            raise entry.with_traceback(None)
+        return entry
+
+
+def compile_input(source: str) -> Union[CompiledInput, SyntaxError]:
+    """Parse the source once and compile its statements and a last expression separately."""
     try:
-        compile(user_input, "<stdin>", "eval")
-    except SyntaxError:
-        return exec
-    return eval
+        tree = ast.parse(source, "<stdin>", "exec")
+    except SyntaxError as e:
+        return e
+    body = expression = None
+    try:
+        if tree.body and isinstance(tree.body[-1], ast.Expr):
+            last = tree.body.pop()
+            expression = compile(ast.Expression(last.value), "<stdin>", "eval")
+        if tree.body:
+            body = compile(tree, "<stdin>", "exec")
+    except SyntaxError as e:
+        return CompiledInput(None, None, e)
+    return CompiledInput(body, expression, None)
+
+
+CODE_CACHE = CodeCache()
 
 
 def check_valid_command(request):
+    user_input = request["params"]
     try:
-        user_input = request["params"]
-        ast.parse(user_input[0])
+        CODE_CACHE.compile(user_input[0])
+        # Input that parses but does not compile is complete, running it reports the error.
         send_response("True", request["id"])
     except SyntaxError:
         send_response("False", request["id"])
 
 
 def execute(request, user_globals):
-    str_output = CustomIO("<stdout>", encoding="utf-8")
-    str_error = CustomIO("<stderr>", encoding="utf-8")
+    # The extension reads the result of its own scripts, such as the variable requests,
+    # from the output of the response.
+    if STREAM_OUTPUT and not is_extension_script(request):
+        execute_streaming(request, user_globals)
+        return
+    str_output = CustomIO("<stdout>", encoding="utf-8", limit=OutputLimit.from_settings("stdout"))
+    str_error = CustomIO("<stderr>", encoding="utf-8", limit=OutputLimit.from_settings("stderr"))
     str_input = CustomIO("<stdin>", encoding="utf-8", newline="\n")
 
     with contextlib.redirect_stdout(str_output), contextlib.redirect_stderr(str_error):
         original_stdin = sys.stdin
         try:
             sys.stdin = str_input
-            execution_status = exec_user_input(request["params"], user_globals)
+            execution_status = exec_request(request, user_globals)
         finally:
             sys.stdin = original_stdin
 
     send_response(str_output.get_value(), request["id"], execution_status)
 
 
-def exec_user_input(user_input, user_globals) -> bool:
+def execute_streaming(request, user_globals):
+    """Execute the code of a request and send its output while it runs."""
+    str_output = OutputStream(request["id"], "stdout", OutputLimit.from_settings("stdout"))
+    str_error = OutputStream(request["id"], "stderr", OutputLimit.from_settings("stderr"))
+    str_input = CustomIO("<stdin>", encoding="utf-8", newline="\n")
+    flusher = OutputFlusher([str_output, str_error])
+
+    flusher.start()
+    try:
+        with contextlib.redirect_stdout(str_output), contextlib.redirect_stderr(str_error):
+            original_stdin = sys.stdin
+            try:
+                sys.stdin = str_input
+                execution_status = exec_request(request, user_globals)
+            finally:
+                sys.stdin = original_stdin
+    except BaseException:
+        flusher.stop()
+        raise
+
+    # The rest of the output goes out in one write with the response. Its output is empty,
+    # all of it was sent in notifications.
+    with MESSAGE_WRITER.batch():
+        flusher.stop()
+        send_response("", request["id"], execution_status)
+
+
+def is_extension_script(request) -> bool:
+    """Return whether a request runs one of the extension's own scripts."""
+    source = request["params"]
+    source = source[0] if isinstance(source, list) else source
+    return source.startswith(EXTENSION_SCRIPT_PREFIX)
+
+
+def exec_request(request, user_globals) -> bool:
+    """Execute the code of a request and append it to the history."""
+    started = time.time()
+    start = time.perf_counter()
+    execution_status = exec_user_input(request["params"], user_globals, request["id"])
+    if HISTORY is not None and not is_extension_script(request):
+        source = request["params"]
+        source = source[0] if isinstance(source, list) else source
+        HISTORY.record(source, started, time.perf_counter() - start, execution_status)
+    return execution_status
+
+
+def exec_user_input(user_input, user_globals, response_id: Optional[int] = None) -> bool:
     user_input = user_input[0] if isinstance(user_input, list) else user_input
 
     try:
-        callable_ = exec_function(user_input)
-        retval = callable_(user_input, user_globals)
+        compiled = CODE_CACHE.compile(user_input)
+        if compiled.error is not None:
+            raise compiled.error.with_traceback(None)
+        retval = None
+        with READER.execution() if READER is not None else contextlib.nullcontext():
+            if compiled.body is not None:
+                exec(compiled.body, user_globals)
+            if compiled.expression is not None:
+                retval = eval(compiled.expression, user_globals)
         if retval is not None:
-            print(retval)
+            display_value(retval, response_id)
         return True
     except KeyboardInterrupt:
         print(traceback.format_exc())
@@ -148,14 +460,286 @@ def exec_user_input(user_input, user_globals) -> bool:
         return False
 
 
+def truncation_marker(omitted: str, location: str = "") -> str:
+    """Return the line that takes the place of the `omitted` part of a cut output."""
+    return f"... {omitted} truncated{location} ..."
+
+
+class OutputLimit:
+    """Cut the output written to one stream during an execution to `max_chars` characters.
+
+    The first three quarters of the limit pass through as they are written, the text after
+    them is held back and only its last quarter is kept. Once the output is complete,
+    `finish` returns the held back text, preceded by a truncation marker if some of it was
+    dropped. With `spill`, the complete output of a stream that goes over the limit is
+    written to a temp file, whose path is given in the marker.
+    """
+
+    def __init__(self, name: str, max_chars: int, spill: bool = False):  # noqa: FBT001, FBT002
+        self.name = name
+        self.max_chars = max_chars
+        self.tail_chars = max_chars // 4
+        self.head_chars = max_chars - self.tail_chars
+        self.size = 0
+        self.spill_path: Optional[Path] = None
+        # The head is only kept to be written to the spill file.
+        self._head: Optional[List[str]] = [] if spill else None
+        self._tail: List[str] = []
+        self._tail_size = 0
+        self._spill_file: Optional[io.TextIOBase] = None
+
+    @classmethod
+    def from_settings(cls, name: str) -> "Optional[OutputLimit]":
+        """Create the limit set by OUTPUT_MAX_CHARS, or None if the output is not limited."""
+        if OUTPUT_MAX_CHARS <= 0:
+            return None
+        return cls(name, OUTPUT_MAX_CHARS, OUTPUT_SPILL_ENABLED)
+
+    def write(self, text: str) -> str:
+        """Account for `text` and return the part of it that can be passed on now."""
+        start = self.size
+        self.size += len(text)
+        if self._spill_file is not None:
+            self._spill_file.write(text)
+        if self.size <= self.head_chars:
+            if self._head is not None:
+                self._head.append(text)
+            return text
+        head = text[: max(self.head_chars - start, 0)]
+        if head and self._head is not None:
+            self._head.append(head)
+        self._tail.append(text[len(head) :])
+        self._tail_size += len(text) - len(head)
+        if self.size > self.max_chars:
+            if self._head is not None and self._spill_file is None:
+                self._start_spill()
+            # Only drop text once the tail holds twice what is kept, so that it is not
+            # joined again on every write.
+            if self._tail_size > 2 * self.tail_chars:
+                self._trim_tail()
+        return head
+
+    def finish(self) -> str:
+        """Return the text held back, with a truncation marker if the output was cut."""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        if self.size <= self.max_chars:
+            tail = "".join(self._tail)
+        else:
+            self._trim_tail()
+            tail = self._tail[0] if self._tail else ""
+            omitted = self.size - self.head_chars - len(tail)
+            location = f", full output in {self.spill_path}" if self.spill_path else ""
+            tail = f"\n{truncation_marker(f'{omitted} characters', location)}\n{tail}"
+        self._tail.clear()
+        self._tail_size = 0
+        return tail
+
+    def _trim_tail(self):
+        tail = "".join(self._tail)[-self.tail_chars :] if self.tail_chars else ""
+        self._tail = [tail]
+        self._tail_size = len(tail)
+
+    def _start_spill(self):
+        """Write the output so far to a new spill file, that receives the rest of it."""
+        try:
+            fd, path = tempfile.mkstemp(
+                prefix=f"python-server-{self.name}-", suffix=".txt", dir=OUTPUT_SPILL_DIR
+            )
+        except OSError as e:
+            print_log(f"Unable to create a file for the {self.name} output: {e}")
+            self._head = None
+            return
+        self.spill_path = Path(path)
+        self._spill_file = open(fd, "w", encoding="utf-8")  # noqa: SIM115, PTH123
+        for text in (*self._head, *self._tail):
+            self._spill_file.write(text)
+        self._head = None
+
+
+# The delimiters of the builtin containers whose repr is rendered one item at a time.
+CONTAINER_DELIMITERS = {
+    list: ("[", "]"),
+    tuple: ("(", ")"),
+    set: ("{", "}"),
+    frozenset: ("frozenset({", "})"),
+    dict: ("{", "}"),
+}
+# The methods that render a representation of a value, by MIME type.
+REPR_METHODS = {
+    "text/html": "_repr_html_",
+    "text/markdown": "_repr_markdown_",
+    "text/latex": "_repr_latex_",
+    "image/svg+xml": "_repr_svg_",
+    "image/png": "_repr_png_",
+    "image/jpeg": "_repr_jpeg_",
+    "application/json": "_repr_json_",
+}
+
+
+def iter_repr(value: Any, seen: Optional[set] = None) -> Iterator[str]:
+    """Yield the repr of `value` in pieces, rendering builtin containers item by item."""
+    delimiters = CONTAINER_DELIMITERS.get(type(value))
+    if delimiters is None or not value:
+        yield repr(value)
+        return
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        # The placeholder of repr for a container that contains itself.
+        yield "{...}" if isinstance(value, dict) else "[...]"
+        return
+    seen.add(id(value))
+    prefix, suffix = delimiters
+    yield prefix
+    if isinstance(value, dict):
+        for index, (key, item) in enumerate(value.items()):
+            if index:
+                yield ", "
+            yield from iter_repr(key, seen)
+            yield ": "
+            yield from iter_repr(item, seen)
+    else:
+        for index, item in enumerate(value):
+            if index:
+                yield ", "
+            yield from iter_repr(item, seen)
+        if isinstance(value, tuple) and len(value) == 1:
+            yield ","
+    yield suffix
+    seen.discard(id(value))
+
+
+def format_text(value: Any, max_chars: int) -> str:
+    """Return the text that `print(value)` shows, cut to `max_chars` characters.
+
+    Builtin containers are rendered one item at a time, no more of them than is shown.
+    A cut text ends with a truncation marker, which counts towards `max_chars`, so that
+    the output limit does not cut it again.
+    """
+    if type(value) not in CONTAINER_DELIMITERS:
+        text = str(value)
+        if 0 < max_chars < len(text):
+            # The marker is no longer than one counting the whole text.
+            longest = truncation_marker(f"{len(text)} characters")
+            keep = max(max_chars - len(longest) - 1, 0)
+            return f"{text[:keep]}\n{truncation_marker(f'{len(text) - keep} characters')}"
+        return text
+    pieces: List[str] = []
+    size = 0
+    for piece in iter_repr(value):
+        pieces.append(piece)
+        size += len(piece)
+        if 0 < max_chars < size:
+            marker = truncation_marker(f"{type(value).__name__} of {len(value)} items")
+            keep = max(max_chars - len(marker) - 1, 0)
+            return f"{''.join(pieces)[:keep]}\n{marker}"
+    return "".join(pieces)
+
+
+class DisplayFormatter:
+    """Render the representations of values by MIME type, as IPython does.
+
+    Values provide them with `_repr_mimebundle_` or the methods in REPR_METHODS, such as
+    `_repr_html_`. Only the MIME types in `mimetypes` are rendered, the methods of the
+    other types are not called. Representations over `max_chars` characters are left out
+    and listed in the `omitted` metadata. text/plain is always present, cut if needed.
+    """
+
+    def __init__(self, mimetypes: List[str], max_chars: int):
+        self.mimetypes = [mimetype.strip() for mimetype in mimetypes if mimetype.strip()]
+        self.max_chars = max_chars
+
+    def format(self, value: Any) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Return the data and metadata of the MIME bundle of `value`."""
+        data: Dict[str, Any] = {}
+        metadata: Dict[str, Any] = {}
+        # The methods of a class are the representations of its instances.
+        if not isinstance(value, type):
+            self._add_mimebundle(value, data, metadata)
+            for mimetype in self.mimetypes:
+                method = REPR_METHODS.get(mimetype)
+                if method is not None and mimetype not in data:
+                    self._add(data, metadata, mimetype, self._call(value, method))
+        omitted = [
+            mimetype
+            for mimetype, rendered in data.items()
+            if mimetype != "text/plain" and 0 < self.max_chars < self._size(rendered)
+        ]
+        for mimetype in omitted:
+            del data[mimetype]
+            metadata.pop(mimetype, None)
+        if omitted:
+            metadata["omitted"] = omitted
+        data["text/plain"] = format_text(data.get("text/plain", value), self.max_chars)
+        return data, metadata
+
+    def _add_mimebundle(self, value: Any, data: Dict[str, Any], metadata: Dict[str, Any]):
+        bundle = self._call(value, "_repr_mimebundle_", include=self.mimetypes, exclude=None)
+        if isinstance(bundle, tuple) and len(bundle) == 2:
+            bundle, bundle_metadata = bundle
+            if isinstance(bundle_metadata, dict):
+                metadata.update(bundle_metadata)
+        if isinstance(bundle, dict):
+            for mimetype, rendered in bundle.items():
+                if mimetype in self.mimetypes or mimetype == "text/plain":
+                    self._add(data, metadata, mimetype, rendered)
+
+    def _add(self, data: Dict[str, Any], metadata: Dict[str, Any], mimetype: str, rendered: Any):
+        if isinstance(rendered, tuple) and len(rendered) == 2:
+            rendered, metadata[mimetype] = rendered
+        if isinstance(rendered, (bytes, bytearray)):
+            # Binary representations, such as images, are sent base64 encoded.
+            rendered = base64.b64encode(rendered).decode("ascii")
+        # Objects that make up any attribute, such as mocks, return anything else.
+        if isinstance(rendered, str) or (
+            mimetype.endswith("json") and isinstance(rendered, (dict, list))
+        ):
+            data[mimetype] = rendered
+
+    def _call(self, value: Any, method_name: str, **kwargs) -> Any:
+        try:
+            method = getattr(value, method_name, None)
+            return method(**kwargs) if callable(method) else None
+        except Exception:
+            print_log(f"Unable to render {method_name} of a {type(value).__name__}:")
+            print_log(traceback.format_exc())
+            return None
+
+    def _size(self, rendered: Any) -> int:
+        return len(rendered) if isinstance(rendered, str) else len(CODEC.dumps(rendered))
+
+
+DISPLAY_FORMATTER = DisplayFormatter(DISPLAY_MIMETYPES, OUTPUT_MAX_CHARS)
+
+
+def display_value(value: Any, response_id: Optional[int] = None):
+    """Show the value of the last expression of an execution."""
+    if RICH_DISPLAY and response_id is not None:
+        data, metadata = DISPLAY_FORMATTER.format(value)
+        # Send the output printed so far first, so that the display follows it.
+        sys.stdout.flush()
+        send_display(response_id, data, metadata)
+    else:
+        # Leave room for the newline print adds.
+        print(format_text(value, max(OUTPUT_MAX_CHARS - 1, 0)))
+
+
 class CustomIO(io.TextIOWrapper):
     """Custom stream object to replace stdio."""
 
-    def __init__(self, name, encoding="utf-8", newline=None):
+    def __init__(self, name, encoding="utf-8", newline=None, limit=None):
         self._buffer = io.BytesIO()
         self._custom_name = name
+        self._limit: Optional[OutputLimit] = limit
         super().__init__(self._buffer, encoding=encoding, newline=newline)
 
+    def write(self, text):
+        if self._limit is None or not isinstance(text, str):
+            return super().write(text)
+        super().write(self._limit.write(text))
+        return len(text)
+
     def close(self):
         """Provide this close method which is used by some tools."""
         # This is intentionally empty.
@@ -163,7 +747,436 @@ class CustomIO(io.TextIOWrapper):
     def get_value(self) -> str:
         """Returns value from the buffer as string."""
         self.seek(0)
-        return self.read()
+        value = self.read()
+        if self._limit is not None:
+            value += self._limit.finish()
+        return value
+
+
+class OutputStream(io.TextIOBase):
+    """Stream object to replace stdout or stderr that sends its output to the client.
+
+    Written text is buffered and sent in an `output` notification once the buffer holds
+    OUTPUT_FLUSH_SIZE characters, its oldest text is OUTPUT_FLUSH_INTERVAL seconds old, or
+    the stream is flushed.
+    """
+
+    def __init__(self, response_id: int, name: str, limit: Optional[OutputLimit] = None):
+        super().__init__()
+        self.response_id = response_id
+        self._name = name
+        self._limit = limit
+        self._chunks: List[str] = []
+        self._size = 0
+        self._first_write = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return f"<{self._name}>"
+
+    @property
+    def encoding(self) -> str:
+        return "utf-8"
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if not isinstance(text, str):
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        length = len(text)
+        with self._lock:
+            if self._limit is not None:
+                text = self._limit.write(text)
+                if not text:
+                    return length
+            if not self._chunks:
+                self._first_write = time.monotonic()
+            self._chunks.append(text)
+            self._size += len(text)
+            if (
+                self._size >= OUTPUT_FLUSH_SIZE
+                or time.monotonic() - self._first_write >= OUTPUT_FLUSH_INTERVAL
+            ):
+                self._send()
+        return length
+
+    def flush(self):
+        with self._lock:
+            self._send()
+
+    def finish(self):
+        """Send the rest of the output, with a truncation marker if it was cut."""
+        with self._lock:
+            if self._limit is not None:
+                tail = self._limit.finish()
+                if tail:
+                    self._chunks.append(tail)
+            self._send()
+
+    def flush_if_due(self):
+        """Send the buffered text if it is older than OUTPUT_FLUSH_INTERVAL."""
+        with self._lock:
+            if self._chunks and time.monotonic() - self._first_write >= OUTPUT_FLUSH_INTERVAL:
+                self._send()
+
+    def _send(self):
+        if not self._chunks:
+            return
+        text = "".join(self._chunks)
+        self._chunks.clear()
+        self._size = 0
+        send_output(self.response_id, self._name, text)
+
+    def close(self):
+        """Provide this close method which is used by some tools."""
+        # This is intentionally empty.
+
+
+class OutputFlusher(threading.Thread):
+    """Send the output of streams that were written to but not flushed, while code runs."""
+
+    def __init__(self, streams: List[OutputStream]):
+        super().__init__(name="python-server-output", daemon=True)
+        self.streams = streams
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(OUTPUT_FLUSH_INTERVAL):
+            with MESSAGE_WRITER.batch():
+                for stream in self.streams:
+                    stream.flush_if_due()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        for stream in self.streams:
+            stream.finish()
+
+
+class FrameReader:
+    """Read content-length framed messages from a binary stream.
+
+    Data is read into one buffer that is reused for all messages, as much as is available
+    at a time. The headers are parsed and the body decoded where they are in the buffer,
+    so several messages that arrive together cost one read.
+    """
+
+    def __init__(self, stream: BinaryIO, codec: JsonCodec, size: int = READ_BUFFER_SIZE):
+        self._stream = stream
+        self._codec = codec
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        # The data read but not consumed yet is self._buffer[self._start : self._end].
+        self._start = 0
+        self._end = 0
+
+    def read_message(self) -> Optional[Dict]:
+        """Read the next message, or return None for a message without content.
+
+        Raises EOFError when the stream ends.
+        """
+        while True:
+            match = HEADER_END.search(self._buffer, self._start, self._end)
+            if match is not None:
+                break
+            self._fill(self._end - self._start + 1)
+        headers = self._buffer[self._start : match.start()]
+        self._start = match.end()
+        content_length = parse_content_length(headers)
+        while self._end - self._start < content_length:
+            self._fill(content_length)
+        body_start = self._start
+        self._start += content_length
+        if not content_length:
+            return None
+        with self._view[body_start : self._start] as body:
+            return self._codec.loads(body)
+
+    def _fill(self, size: int):
+        """Read more data, making room for `size` bytes from the start of the unread data."""
+        if self._start == self._end:
+            self._start = self._end = 0
+        if self._start + size > len(self._buffer):
+            unread = self._end - self._start
+            self._buffer[:unread] = self._buffer[self._start : self._end]
+            self._start, self._end = 0, unread
+            if size > len(self._buffer):
+                self._view.release()
+                self._buffer.extend(bytes(max(size, 2 * len(self._buffer)) - len(self._buffer)))
+                self._view = memoryview(self._buffer)
+        read = self._stream.readinto1(self._view[self._end :])
+        if not read:
+            raise EOFError("EOF reached while reading a message")
+        self._end += read
+
+
+def parse_content_length(headers: Union[bytes, bytearray]) -> int:
+    """Return the Content-Length in `headers`, the data size in bytes, or 0 if it is missing."""
+    for line in headers.splitlines():
+        name, separator, value = line.partition(b":")
+        if separator and name.strip().lower() == b"content-length":
+            return int(value)
+    return 0
+
+
+class RequestReader(threading.Thread):
+    """Read the messages of the client while user code runs on the main thread.
+
+    Syntax checks are answered right away and `interrupt` notifications interrupt the
+    running code, so their responses can overtake the response of an `execute` request.
+    Requests to execute code are put on `requests` for the main thread, followed by None
+    when the client sends `exit` or closes stdin.
+    """
+
+    def __init__(self, requests: "queue.Queue[Optional[Dict]]"):
+        super().__init__(name="python-server-reader", daemon=True)
+        self.requests = requests
+        self.executing = False
+        self.closed = False
+        self._lock = threading.Lock()
+        # Requests sent to the client by the main thread, by id, waiting for their response.
+        self._waiters: Dict[str, queue.Queue[Optional[Dict]]] = {}
+
+    def run(self):
+        frames = FrameReader(STDIN.buffer, CODEC)
+        while True:
+            try:
+                message = frames.read_message()
+            except EOFError:
+                # Input stream closed (VS Code terminated), exit gracefully
+                break
+            except Exception:
+                print_log(traceback.format_exc())
+                continue
+            if message is None:
+                continue
+            method = message.get("method")
+            if method is None:
+                self.resolve(message)
+            elif method == "check_valid_command":
+                check_valid_command(message)
+            elif method == "history":
+                search_history(message)
+            elif method == "interrupt":
+                self.interrupt()
+            elif method == "exit":
+                break
+            else:
+                self.requests.put(message)
+        self.close()
+
+    def request(self, params: Union[List, Dict]) -> Optional[Dict]:
+        """Send an input request to the client and wait for its response.
+
+        Returns None when the client exits before it responds.
+        """
+        request_id = uuid.uuid4().hex
+        waiter: queue.Queue[Optional[Dict]] = queue.Queue(maxsize=1)
+        with self._lock:
+            if self.closed:
+                return None
+            self._waiters[request_id] = waiter
+        send_request(params, request_id)
+        return waiter.get()
+
+    def resolve(self, response: Dict):
+        with self._lock:
+            waiter = self._waiters.pop(response.get("id"), None)
+        if waiter is not None:
+            waiter.put(response)
+
+    @contextlib.contextmanager
+    def execution(self) -> Iterator[None]:
+        """Mark the user code run in this context as interruptible."""
+        with self._lock:
+            self.executing = True
+        try:
+            yield
+        finally:
+            self.executing = False
+
+    def handle_interrupt(self, signum, frame):  # noqa: ARG002
+        """Handle SIGINT on the main thread, only while it is running user code.
+
+        The signal sent by `interrupt` is handled at the next bytecode of the main thread,
+        which can already be past the user code, e.g. sending its response. It is dropped
+        there so that the response is still sent.
+        """
+        if self.executing:
+            raise KeyboardInterrupt
+
+    def interrupt(self):
+        """Raise KeyboardInterrupt in the main thread, if it is running user code."""
+        with self._lock:
+            if not self.executing:
+                return
+            if hasattr(signal, "pthread_kill"):
+                # A signal also interrupts blocking calls such as time.sleep.
+                signal.pthread_kill(threading.main_thread().ident, signal.SIGINT)
+            else:
+                _thread.interrupt_main()
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            waiters = list(self._waiters.values())
+            self._waiters.clear()
+        for waiter in waiters:
+            waiter.put(None)
+        self.requests.put(None)
+        self.interrupt()
+
+
+READER: Optional[RequestReader] = None
+
+
+class HistoryStore:
+    """An append-only log of the executed inputs, in an SQLite database.
+
+    Every execution is written as it completes, with its execution count, start time,
+    duration and status. Searches run in the database, so a long session does not hold
+    its history in memory. Sessions that share the file tell their entries apart by
+    `session`.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        import sqlite3
+
+        self.session = uuid.uuid4().hex
+        self.execution_count = 0
+        # Executions are recorded on the main thread, searches run on the reader thread.
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "id INTEGER PRIMARY KEY, session TEXT NOT NULL, execution_count INTEGER NOT NULL,"
+                " started REAL NOT NULL, duration REAL NOT NULL, status INTEGER NOT NULL,"
+                " source TEXT NOT NULL)"
+            )
+
+    @classmethod
+    def from_settings(cls) -> "Optional[HistoryStore]":
+        """Open the history in HISTORY_FILE, or return None if it is not set or fails."""
+        if not HISTORY_FILE:
+            return None
+        try:
+            return cls(HISTORY_FILE)
+        except Exception:
+            print_log(f"Unable to open the history in {HISTORY_FILE}:")
+            print_log(traceback.format_exc())
+            return None
+
+    def record(
+        self,
+        source: str,
+        started: float,
+        duration: float,
+        status: bool,  # noqa: FBT001
+    ) -> int:
+        """Append an execution and return its execution count."""
+        self.execution_count += 1
+        try:
+            with self._lock:
+                self._connection.execute(
+                    "INSERT INTO history"
+                    " (session, execution_count, started, duration, status, source)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.session, self.execution_count, started, duration, status, source),
+                )
+        except Exception:
+            print_log(traceback.format_exc())
+        return self.execution_count
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        *,
+        all_sessions: bool = False,
+        slowest: bool = False,
+        before: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """Return the entries whose source contains `query`, the most recent first.
+
+        With `slowest`, the entries that took the longest come first instead. `before`
+        pages through recent entries, it is the id of the last entry of the previous page.
+        """
+        conditions = []
+        args: List[Any] = []
+        if not all_sessions:
+            conditions.append("session = ?")
+            args.append(self.session)
+        if query:
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append("source LIKE ? ESCAPE '\\'")
+            args.append(f"%{escaped}%")
+        if before is not None:
+            conditions.append("id < ?")
+            args.append(before)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = "duration DESC" if slowest else "id DESC"
+        args.append(max(0, min(limit, HISTORY_MAX_RESULTS)))
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, session, execution_count, started, duration, status, source"
+                f" FROM history{where} ORDER BY {order} LIMIT ?",
+                args,
+            ).fetchall()
+        return [
+            {
+                "id": row[0],
+                "session": row[1],
+                "executionCount": row[2],
+                "started": row[3],
+                "duration": row[4],
+                "status": bool(row[5]),
+                "source": row[6],
+            }
+            for row in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+HISTORY: Optional[HistoryStore] = None
+
+
+def search_history(request):
+    """Answer a `history` request with the entries that match its params."""
+    params = request.get("params") or {}
+    entries: List[Dict[str, Any]] = []
+    if HISTORY is not None:
+        try:
+            entries = HISTORY.search(
+                params.get("query"),
+                all_sessions=params.get("session") == "all",
+                slowest=params.get("order") == "duration",
+                before=params.get("before"),
+                limit=params.get("limit", 100),
+            )
+        except Exception:
+            print_log(traceback.format_exc())
+    send_message(id=request["id"], result={"entries": entries})
+
+
+def run_requests(requests: "queue.Queue[Optional[Dict]]"):
+    """Execute the requests read by the reader thread on this thread until the client exits."""
+    while True:
+        try:
+            request = requests.get()
+            if request is None:
+                sys.exit(0)
+            if request["method"] == "execute":
+                execute(request, USER_GLOBALS)
+        except Exception:  # noqa: PERF203
+            print_log(traceback.format_exc())
 
 
 def get_headers():
@@ -192,23 +1205,9 @@ if __name__ == "__main__":
     while "" in sys.path:
         sys.path.remove("")
     sys.path.insert(0, "")
-    while True:
-        try:
-            headers = get_headers()
-            # Content-Length is the data size in bytes.
-            content_length = int(headers.get("Content-Length", 0))
-
-            if content_length:
-                request_text = STDIN.buffer.read(content_length).decode()
-                request_json = json.loads(request_text)
-                if request_json["method"] == "execute":
-                    execute(request_json, USER_GLOBALS)
-                if request_json["method"] == "check_valid_command":
-                    check_valid_command(request_json)
-                elif request_json["method"] == "exit":
-                    sys.exit(0)
-        except EOFError:  # noqa: PERF203
-            # Input stream closed (VS Code terminated), exit gracefully
-            sys.exit(0)
-        except Exception:
-            print_log(traceback.format_exc())
+    HISTORY = HistoryStore.from_settings()
+    request_queue: "queue.Queue[Optional[Dict]]" = queue.Queue()
+    READER = RequestReader(request_queue)
+    signal.signal(signal.SIGINT, READER.handle_interrupt)
+    READER.start()
+    run_requests(request_queue)
@@ -0,0 +1,40 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import contextlib
+import mmap
+import os
+from typing import Iterator
+
+
+def iter_test_ids(path: str | os.PathLike[str]) -> Iterator[str]:
+    """Stream the test ids from a newline separated file written by the extension.
+
+    The file is memory-mapped and decoded one line at a time, so a selection of tens of
+    thousands of ids is never held as one large string next to its split copy. Empty
+    lines are skipped.
+    """
+    with open(path, "rb") as ids_file:  # noqa: PTH123
+        if os.fstat(ids_file.fileno()).st_size == 0:
+            # Empty files cannot be memory-mapped.
+            return
+        with contextlib.closing(
+            mmap.mmap(ids_file.fileno(), 0, access=mmap.ACCESS_READ)
+        ) as mapped_ids:
+            start = 0
+            size = len(mapped_ids)
+            while start < size:
+                end = mapped_ids.find(b"\n", start)
+                if end == -1:
+                    end = size
+                line = mapped_ids[start:end].rstrip(b"\r")
+                if line:
+                    yield line.decode("utf-8")
+                start = end + 1
+
+
+def get_id_file_path(test_id: str) -> str:
+    """Return the file path part of a test id of the form `path::Class::test[param]`."""
+    return test_id.split("::", 1)[0]
@@ -0,0 +1,154 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Record the JSON-RPC messages the test adapters send, and replay them into a pipe.
+
+Set MESSAGE_RECORDING_FILE to the path of a recording to have the pytest plugin or the
+unittest adapter write every message it sends to it. A recording is a gzip compressed
+text file with one message per line, prefixed by the time it was sent and a tab.
+
+    python -m testing_tools.message_recorder recording.gz PIPE_NAME [--speed 2 | --max-speed]
+
+replays a recording into the named pipe of the extension, with the recorded delays
+between the messages divided by `--speed`, or as fast as the pipe accepts them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import gzip
+import os
+import pathlib
+import sys
+import threading
+import time
+from typing import Iterator, Sequence, TextIO
+
+
+class MessageRecorder:
+    """Write the messages sent to the extension to a gzip compressed recording.
+
+    The recording is only opened when the first message is recorded, so importing a module
+    that creates a recorder has no side effect.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]):
+        self.path = pathlib.Path(path)
+        self.file: TextIO | None = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, path: str | os.PathLike[str]) -> MessageRecorder:
+        """Return the recorder of this process for `path`, creating it on the first call.
+
+        A module can be imported twice under different names, as the unittest adapter does
+        with pvsc_utils, and two writers of the same gzip file would corrupt it.
+        """
+        key = os.path.normcase(os.path.abspath(path))  # noqa: PTH100
+        with _RECORDERS_LOCK:
+            recorder = _RECORDERS.get(key)
+            if recorder is None:
+                recorder = _RECORDERS[key] = cls(path)
+        return recorder
+
+    @classmethod
+    def from_env(cls) -> MessageRecorder | None:
+        """Create a recorder for the file in MESSAGE_RECORDING_FILE, if it is set."""
+        recording_file = os.getenv("MESSAGE_RECORDING_FILE")
+        if not recording_file:
+            return None
+        path = pathlib.Path(recording_file)
+        # Every pytest-xdist worker sends its own messages, keep their recordings apart.
+        worker = os.getenv("PYTEST_XDIST_WORKER")
+        if worker:
+            path = path.with_name(f"{path.name}-{worker}")
+        return cls.for_path(path)
+
+    def open(self) -> TextIO:
+        with self.lock:
+            if self.file is None:
+                self.file = gzip.open(self.path, "wt", encoding="utf-8", compresslevel=6)  # noqa: SIM115
+                atexit.register(self.close)
+            return self.file
+
+    def record(self, data: str) -> None:
+        """Record the serialized JSON-RPC message `data`, which must not contain a newline."""
+        file = self.file or self.open()
+        file.write(f"{time.time():.6f}\t{data}\n")
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file is not None and not self.file.closed:
+                self.file.close()
+
+
+_RECORDERS: dict[str, MessageRecorder] = {}
+_RECORDERS_LOCK = threading.Lock()
+
+
+def iter_recording(path: str | os.PathLike[str]) -> Iterator[tuple[float, str]]:
+    """Yield the time and serialized message of every message in a recording."""
+    with gzip.open(path, "rt", encoding="utf-8") as recording:
+        for line in recording:
+            timestamp, _, data = line.rstrip("\n").partition("\t")
+            if data:
+                yield float(timestamp), data
+
+
+def frame_message(data: str) -> bytes:
+    """Frame a serialized message the way the adapters send it over the pipe."""
+    return f"content-length: {len(data)}\r\ncontent-type: application/json\r\n\r\n{data}".encode()
+
+
+def replay(
+    path: str | os.PathLike[str], pipe_name: str, speed: float | None = 1.0
+) -> tuple[int, int, float]:
+    """Send a recording to `pipe_name` and return the messages, bytes and seconds it took.
+
+    With a `speed` of None, messages are sent as fast as the pipe accepts them.
+    """
+    messages = 0
+    bytes_sent = 0
+    start = time.perf_counter()
+    first_timestamp: float | None = None
+    with open(pipe_name, "wb") as pipe:  # noqa: PTH123
+        for timestamp, data in iter_recording(path):
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            if speed:
+                delay = (timestamp - first_timestamp) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            frame = frame_message(data)
+            pipe.write(frame)
+            pipe.flush()
+            messages += 1
+            bytes_sent += len(frame)
+    return messages, bytes_sent, time.perf_counter() - start
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a recording of adapter messages.")
+    parser.add_argument("recording", help="Recording written with MESSAGE_RECORDING_FILE.")
+    parser.add_argument("pipe", help="Named pipe to send the messages to.")
+    speed_group = parser.add_mutually_exclusive_group()
+    speed_group.add_argument(
+        "--speed", type=float, default=1.0, help="Replay speed relative to the recording."
+    )
+    speed_group.add_argument(
+        "--max-speed", action="store_true", help="Send the messages without any delay."
+    )
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error("--speed must be greater than 0.")
+
+    messages, bytes_sent, elapsed = replay(
+        args.recording, args.pipe, None if args.max_speed else args.speed
+    )
+    rate = messages / elapsed if elapsed else float("inf")
+    print(f"Replayed {messages} messages, {bytes_sent} bytes in {elapsed:.3f}s ({rate:.0f}/s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
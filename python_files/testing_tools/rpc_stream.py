@@ -0,0 +1,137 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Decode streams of content-length framed JSON-RPC messages, as sent by the test adapters.
+
+    python -m testing_tools.rpc_stream STREAM_FILE [--dump]
+
+prints a summary of a captured stream, or with `--dump` the params of every message as one
+JSON line each. Use `-` to read the stream from stdin.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from typing import Any, BinaryIO, Iterator, Sequence
+
+# The end of the headers, the pipe listeners of the tests read in text mode and turn the
+# "\r\n" line endings into "\n".
+HEADER_END = re.compile(rb"\r?\n\r?\n")
+READ_SIZE = 1024 * 1024
+
+
+class RpcStreamDecoder:
+    """Decode content-length framed JSON-RPC messages from data that arrives in pieces.
+
+    Every byte is scanned once: the headers are parsed as soon as they are complete, and
+    the body of a message is only sliced out of the buffer once all of it has arrived.
+    Consumed data is dropped from the front of the buffer, which does not copy the rest.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        # Start and end of the body of the message whose headers were parsed.
+        self._body_start = 0
+        self._body_end: int | None = None
+
+    @property
+    def pending(self) -> int:
+        """The number of bytes received that are not part of a decoded message yet."""
+        return len(self._buffer)
+
+    def feed(self, data: bytes) -> list[dict[str, Any]]:
+        """Add `data` to the stream and return the messages it completed."""
+        self._buffer += data
+        messages: list[dict[str, Any]] = []
+        offset = 0
+        while True:
+            if self._body_end is None:
+                match = HEADER_END.search(self._buffer, offset)
+                if match is None:
+                    break
+                self._body_start = match.end()
+                self._body_end = self._body_start + parse_content_length(
+                    self._buffer[offset : match.start()]
+                )
+            if self._body_end > len(self._buffer):
+                break
+            messages.append(json.loads(self._buffer[self._body_start : self._body_end]))
+            offset = self._body_end
+            self._body_end = None
+        if offset:
+            del self._buffer[:offset]
+            if self._body_end is not None:
+                self._body_start -= offset
+                self._body_end -= offset
+        return messages
+
+    def close(self) -> None:
+        """Check that the stream did not end in the middle of a message."""
+        if self._buffer.strip():
+            raise ValueError(
+                f"The stream ended with {len(self._buffer)} bytes of a partial message."
+            )
+
+
+def parse_content_length(headers: bytes | bytearray) -> int:
+    for line in headers.split(b"\n"):
+        name, separator, value = line.partition(b":")
+        if separator and name.strip().lower() == b"content-length":
+            return int(value)
+    raise ValueError(f"Message headers do not contain Content-Length: {bytes(headers)!r}")
+
+
+def decode_stream(stream: BinaryIO, read_size: int = READ_SIZE) -> Iterator[dict[str, Any]]:
+    """Yield the JSON-RPC messages read from a binary stream until it ends."""
+    decoder = RpcStreamDecoder()
+    while True:
+        data = stream.read(read_size)
+        if not data:
+            break
+        yield from decoder.feed(data)
+    decoder.close()
+
+
+def decode_messages(data: bytes) -> list[dict[str, Any]]:
+    """Decode all JSON-RPC messages in `data`."""
+    decoder = RpcStreamDecoder()
+    messages = decoder.feed(data)
+    decoder.close()
+    return messages
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect a stream of adapter messages.")
+    parser.add_argument("stream", help="File with the captured stream, or - for stdin.")
+    parser.add_argument(
+        "--dump", action="store_true", help="Print the params of every message as a JSON line."
+    )
+    args = parser.parse_args(argv)
+
+    counts: dict[str, int] = {}
+    total = 0
+    start = time.perf_counter()
+    stream = sys.stdin.buffer if args.stream == "-" else open(args.stream, "rb")  # noqa: SIM115, PTH123
+    with stream:
+        for message in decode_stream(stream):
+            total += 1
+            params = message.get("params")
+            if args.dump:
+                print(json.dumps(params))
+                continue
+            # Name messages by the keys of their params, such as "result" or "tests".
+            kind = ",".join(sorted(params)) if isinstance(params, dict) else type(params).__name__
+            counts[kind] = counts.get(kind, 0) + 1
+    if not args.dump:
+        elapsed = time.perf_counter() - start
+        print(f"{total} messages decoded in {elapsed:.3f}s")
+        for kind, count in sorted(counts.items(), key=lambda item: -item[1]):
+            print(f"{count:>10}  {kind}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pathlib
+import tempfile
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+
+def hash_text(text: str) -> str:
+    """Return a short hash of a formatted traceback."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=8).hexdigest()
+
+
+def hash_exception(
+    exc_type: type[BaseException] | None,
+    exc_value: BaseException | None,
+    tb: TracebackType | None,
+) -> str:
+    """Return a short hash of an exception and the frames of its traceback.
+
+    Only code objects and line numbers are visited, so two identical failures can be
+    recognized without formatting either traceback.
+    """
+    try:
+        value = str(exc_value)
+    except Exception:
+        value = ""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(
+        f"{getattr(exc_type, '__qualname__', exc_type)}\0{value}".encode("utf-8", "surrogatepass")
+    )
+    while tb is not None:
+        code = tb.tb_frame.f_code
+        digest.update(
+            f"\0{code.co_filename}:{tb.tb_lineno}:{code.co_name}".encode("utf-8", "surrogatepass")
+        )
+        tb = tb.tb_next
+    return digest.hexdigest()
+
+
+class TracebackStore:
+    """Deduplicate and cap the traceback text sent with test results.
+
+    With `dedup`, the first test that fails with a traceback gets the full text; later tests
+    with the same traceback get a one line reference to that test instead. With
+    `max_chars`, longer tracebacks are cut down to their head and tail, and the full text
+    is written once per traceback to a file in `spill_dir` whose path is named in the
+    truncation marker.
+    """
+
+    def __init__(
+        self,
+        max_chars: int | None = None,
+        spill_dir: str | os.PathLike[str] | None = None,
+        *,
+        dedup: bool = False,
+    ):
+        self.max_chars = max_chars if max_chars and max_chars > 0 else None
+        self.spill_dir = pathlib.Path(spill_dir) if spill_dir else None
+        self.dedup = dedup
+        # traceback hash -> id of the first test that reported it
+        self._first_test_ids: dict[str, str] = {}
+        self._spill_files: dict[str, pathlib.Path] = {}
+
+    @classmethod
+    def from_env(cls) -> TracebackStore:
+        """Create a store configured by the TRACEBACK_* environment variables."""
+        max_chars = os.getenv("TRACEBACK_MAX_CHARS")
+        return cls(
+            max_chars=int(max_chars) if max_chars and max_chars.isdigit() else None,
+            spill_dir=os.getenv("TRACEBACK_SPILL_DIR"),
+            dedup=os.getenv("TRACEBACK_DEDUP_ENABLED") == "True",
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.dedup or self.max_chars is not None
+
+    def get_reference(self, key: str, test_id: str) -> str | None:
+        """Return the reference text if another test already reported the traceback `key`."""
+        if not self.dedup:
+            return None
+        first_test_id = self._first_test_ids.get(key)
+        if first_test_id is None or first_test_id == test_id:
+            return None
+        return f"Same traceback as {first_test_id} [traceback {key}]\n"
+
+    def get_text(self, test_id: str, key: str, render: Callable[[], str]) -> str:
+        """Return the traceback text to send for `test_id`.
+
+        `render` formats the traceback, it is not called when the traceback `key` is sent
+        as a reference.
+        """
+        reference = self.get_reference(key, test_id)
+        if reference is not None:
+            return reference
+        text = render()
+        if self.dedup:
+            self._first_test_ids.setdefault(key, test_id)
+        if self.max_chars is None or len(text) <= self.max_chars:
+            return text
+        return self.truncate(key, text)
+
+    def process(self, test_id: str, text: str) -> str:
+        """Return the text to send for a traceback of `test_id` that is already formatted."""
+        if not self.enabled or not text:
+            return text
+        return self.get_text(test_id, hash_text(text), lambda: text)
+
+    def truncate(self, key: str, text: str) -> str:
+        head_size = (self.max_chars or 0) // 2
+        tail_size = (self.max_chars or 0) - head_size
+        omitted = len(text) - head_size - tail_size
+        spill_file = self.spill(key, text)
+        location = f", full traceback in {spill_file}" if spill_file else ""
+        marker = f"\n... {omitted} characters truncated{location} ...\n"
+        return f"{text[:head_size]}{marker}{text[len(text) - tail_size :]}"
+
+    def spill(self, key: str, text: str) -> pathlib.Path | None:
+        """Write the full traceback to the spill directory once and return its path."""
+        spill_file = self._spill_files.get(key)
+        if spill_file is not None:
+            return spill_file
+        try:
+            if self.spill_dir is None:
+                self.spill_dir = pathlib.Path(tempfile.mkdtemp(prefix="vscode-tracebacks-"))
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            spill_file = self.spill_dir / f"traceback-{key}.txt"
+            spill_file.write_text(text, encoding="utf-8", errors="surrogateescape")
+        except OSError:
+            return None
+        self._spill_files[key] = spill_file
+        return spill_file
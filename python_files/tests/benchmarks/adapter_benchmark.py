@@ -0,0 +1,403 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Benchmark the pytest and unittest adapters on a generated workspace.
+
+Usage, from the python_files directory:
+
+    python -m tests.benchmarks.adapter_benchmark --files 50 --output results.json
+    python -m tests.benchmarks.adapter_benchmark --files 50 --compare results.json
+
+Each adapter runs in a subprocess exactly as the extension starts it. The harness reads
+everything sent over TEST_RUN_PIPE and records the wall time, the number of messages and
+payload bytes, the number of tests reported and the peak RSS of the subprocess. Results
+are written as JSON so they can be compared across commits with `--compare`.
+
+Named pipes are created with `os.mkfifo` and the peak RSS is read with `os.wait4`, so the
+harness only runs on POSIX platforms.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pathlib
+import platform
+import select
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, NamedTuple
+
+script_dir = pathlib.Path(__file__).parent.parent.parent
+sys.path.append(os.fspath(script_dir))
+
+from tests.pytestadapter.helpers import (  # noqa: E402
+    generate_random_pipe_name,
+    process_data_received,
+)
+
+ADAPTERS = ("pytest", "unittest")
+TEST_FILE_PATTERN = "test_*.py"
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class WorkspaceShape(NamedTuple):
+    """The size of a generated workspace.
+
+    Every folder holds `files` test files, every file `classes` test classes and every
+    class `tests` test methods. In the pytest workspace each method is parametrized with
+    `params` cases, in the unittest workspace each method runs `subtests` subtests.
+    """
+
+    folders: int = 2
+    files: int = 5
+    classes: int = 2
+    tests: int = 5
+    params: int = 3
+    subtests: int = 3
+    fail_every: int = 0
+
+    @property
+    def pytest_test_count(self) -> int:
+        return self.folders * self.files * self.classes * self.tests * max(self.params, 1)
+
+    @property
+    def unittest_test_count(self) -> int:
+        return self.folders * self.files * self.classes * self.tests
+
+
+def _is_failing(shape: WorkspaceShape, index: int) -> bool:
+    return shape.fail_every > 0 and index % shape.fail_every == shape.fail_every - 1
+
+
+def generate_pytest_file(shape: WorkspaceShape) -> str:
+    """Return the source of one pytest test file."""
+    lines = ["import pytest", ""]
+    index = 0
+    for class_index in range(shape.classes):
+        lines.extend(["", f"class TestBench{class_index}:"])
+        for test_index in range(shape.tests):
+            # A threshold above every value makes the test fail.
+            threshold = max(shape.params, 1) if _is_failing(shape, index) else 0
+            index += 1
+            if shape.params > 1:
+                lines.extend(
+                    [
+                        f'    @pytest.mark.parametrize("value", range({shape.params}))',
+                        f"    def test_case_{test_index}(self, value):",
+                        f"        assert value >= {threshold}",
+                    ]
+                )
+            else:
+                lines.extend(
+                    [
+                        f"    def test_case_{test_index}(self):",
+                        f"        assert 0 >= {threshold}",
+                    ]
+                )
+            lines.append("")
+    return "\n".join(lines)
+
+
+def generate_unittest_file(shape: WorkspaceShape) -> str:
+    """Return the source of one unittest test file."""
+    lines = ["import unittest", ""]
+    index = 0
+    for class_index in range(shape.classes):
+        lines.extend(["", f"class TestBench{class_index}(unittest.TestCase):"])
+        for test_index in range(shape.tests):
+            threshold = max(shape.subtests, 1) if _is_failing(shape, index) else 0
+            index += 1
+            lines.append(f"    def test_case_{test_index}(self):")
+            if shape.subtests > 0:
+                lines.extend(
+                    [
+                        f"        for value in range({shape.subtests}):",
+                        "            with self.subTest(value=value):",
+                        f"                self.assertGreaterEqual(value, {threshold})",
+                    ]
+                )
+            else:
+                lines.append(f"        self.assertGreaterEqual(0, {threshold})")
+            lines.append("")
+    return "\n".join(lines)
+
+
+def generate_workspace(root: pathlib.Path, adapter: str, shape: WorkspaceShape) -> pathlib.Path:
+    """Write a synthetic workspace for the adapter under root and return its path."""
+    workspace = root / f"{adapter}_workspace"
+    source = generate_pytest_file(shape) if adapter == "pytest" else generate_unittest_file(shape)
+    for folder_index in range(shape.folders):
+        folder = workspace / f"bench_folder_{folder_index}"
+        folder.mkdir(parents=True, exist_ok=True)
+        # unittest discovery only loads test files from packages.
+        (folder / "__init__.py").write_text("", encoding="utf-8")
+        for file_index in range(shape.files):
+            (folder / f"test_bench_{file_index}.py").write_text(source, encoding="utf-8")
+    return workspace
+
+
+class AdapterRun(NamedTuple):
+    """The measurements of a single adapter subprocess."""
+
+    seconds: float
+    returncode: int
+    payload_bytes: int
+    peak_rss_kb: int | None
+    messages: list[dict[str, Any]]
+
+
+def _read_pipe(fd: int, chunks: list[bytes], finished: threading.Event) -> None:
+    while True:
+        readable, _, _ = select.select([fd], [], [], 0.05)
+        if readable:
+            chunks.append(os.read(fd, READ_CHUNK_SIZE))
+        elif finished.is_set():
+            return
+
+
+def _peak_rss_kb(max_rss: int) -> int:
+    # ru_maxrss is reported in bytes on macOS and in kilobytes everywhere else.
+    return max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+
+def run_adapter(
+    args: list[str], cwd: pathlib.Path, env_add: dict[str, str] | None = None
+) -> AdapterRun:
+    """Run an adapter script and collect everything it sends over TEST_RUN_PIPE."""
+    pipe_name = generate_random_pipe_name("adapter-benchmark")
+    os.mkfifo(pipe_name)
+    # Keep a write end open as well, so that reads never see EOF while the adapter
+    # opens and closes the pipe between messages.
+    fd = os.open(pipe_name, os.O_RDWR)
+    try:
+        env = os.environ.copy()
+        env.update(
+            {
+                "TEST_RUN_PIPE": pipe_name,
+                "PYTHONPATH": os.fspath(script_dir),
+            }
+        )
+        env.update(env_add or {})
+
+        chunks: list[bytes] = []
+        finished = threading.Event()
+        reader = threading.Thread(target=_read_pipe, args=(fd, chunks, finished), daemon=True)
+        reader.start()
+
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, *args],
+            cwd=cwd,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+        process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+
+        finished.set()
+        reader.join()
+    finally:
+        os.close(fd)
+        os.unlink(pipe_name)  # noqa: PTH108
+
+    data = b"".join(chunks)
+    return AdapterRun(
+        seconds=seconds,
+        returncode=process.returncode,
+        payload_bytes=len(data),
+        peak_rss_kb=_peak_rss_kb(usage.ru_maxrss),
+        messages=process_data_received(data.decode("utf-8")) if data else [],
+    )
+
+
+def get_run_ids(node: dict[str, Any] | None) -> list[str]:
+    """Return the run ids of all tests in a discovered test tree."""
+    if node is None:
+        return []
+    if "children" not in node:
+        return [node["runID"]]
+    return [run_id for child in node["children"] for run_id in get_run_ids(child)]
+
+
+def count_results(messages: list[dict[str, Any]]) -> int:
+    """Return the number of test results reported by execution messages."""
+    return sum(
+        len(message["result"])
+        for message in messages
+        if isinstance(message.get("result"), dict) and not message.get("coverage")
+    )
+
+
+def discovery_args(adapter: str, workspace: pathlib.Path) -> list[str]:
+    if adapter == "pytest":
+        return ["-m", "pytest", "-p", "vscode_pytest", "--collect-only", os.fspath(workspace)]
+    discovery = script_dir / "unittestadapter" / "discovery.py"
+    return [
+        os.fspath(discovery),
+        "--udiscovery",
+        "-s",
+        os.fspath(workspace),
+        "-p",
+        TEST_FILE_PATTERN,
+    ]
+
+
+def execution_args(adapter: str, workspace: pathlib.Path) -> list[str]:
+    if adapter == "pytest":
+        return [
+            os.fspath(script_dir / "vscode_pytest" / "run_pytest_script.py"),
+            "-p",
+            "no:cacheprovider",
+            f"--rootdir={workspace}",
+        ]
+    execution = script_dir / "unittestadapter" / "execution.py"
+    return [
+        os.fspath(execution),
+        "--udiscovery",
+        "-s",
+        os.fspath(workspace),
+        "-p",
+        TEST_FILE_PATTERN,
+    ]
+
+
+def summarize(runs: list[AdapterRun], tests: int) -> dict[str, Any]:
+    """Reduce repeated runs of one phase to the numbers stored in the results file."""
+    seconds = [run.seconds for run in runs]
+    median_seconds = statistics.median(seconds)
+    peak_rss = [run.peak_rss_kb for run in runs if run.peak_rss_kb is not None]
+    return {
+        "median_seconds": round(median_seconds, 4),
+        "min_seconds": round(min(seconds), 4),
+        "messages": len(runs[-1].messages),
+        "payload_bytes": runs[-1].payload_bytes,
+        "tests": tests,
+        "tests_per_second": round(tests / median_seconds, 1) if median_seconds else None,
+        "peak_rss_kb": max(peak_rss) if peak_rss else None,
+        "returncodes": sorted({run.returncode for run in runs}),
+    }
+
+
+def benchmark_adapter(
+    adapter: str, shape: WorkspaceShape, root: pathlib.Path, repeat: int = 1
+) -> dict[str, Any]:
+    """Benchmark discovery and execution of one adapter on a generated workspace."""
+    workspace = generate_workspace(root, adapter, shape)
+
+    discovery_runs = [
+        run_adapter(discovery_args(adapter, workspace), workspace) for _ in range(repeat)
+    ]
+    tests = discovery_runs[-1].messages[-1].get("tests") if discovery_runs[-1].messages else None
+    run_ids = get_run_ids(tests)
+
+    execution_runs = []
+    for _ in range(repeat):
+        # The adapters delete the ids file once it has been read.
+        ids_file = root / f"{adapter}_ids.txt"
+        ids_file.write_text("\n".join(run_ids), encoding="utf-8")
+        execution_runs.append(
+            run_adapter(
+                execution_args(adapter, workspace),
+                workspace,
+                {"RUN_TEST_IDS_PIPE": os.fspath(ids_file)},
+            )
+        )
+
+    return {
+        "discovery": summarize(discovery_runs, len(run_ids)),
+        "execution": summarize(execution_runs, count_results(execution_runs[-1].messages)),
+    }
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=script_dir,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(
+    shape: WorkspaceShape, adapters: tuple[str, ...] = ADAPTERS, repeat: int = 1
+) -> dict[str, Any]:
+    """Benchmark the adapters and return the results in the format of the results file."""
+    with tempfile.TemporaryDirectory(prefix="adapter-benchmark-") as temp_dir:
+        results = {
+            adapter: benchmark_adapter(adapter, shape, pathlib.Path(temp_dir), repeat)
+            for adapter in adapters
+        }
+    return {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "shape": shape._asdict(),
+        "results": results,
+    }
+
+
+def compare_results(baseline: dict[str, Any], current: dict[str, Any]) -> list[str]:
+    """Return one line per measurement with its relative change against the baseline."""
+    lines = []
+    if baseline.get("shape") != current.get("shape"):
+        lines.append("warning: the baseline was measured on a different workspace shape")
+    for adapter, phases in current["results"].items():
+        for phase, values in phases.items():
+            base_values = baseline.get("results", {}).get(adapter, {}).get(phase, {})
+            for key in ("median_seconds", "payload_bytes", "peak_rss_kb"):
+                old, new = base_values.get(key), values.get(key)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old * 100
+                lines.append(f"{adapter} {phase} {key}: {old} -> {new} ({change:+.1f}%)")
+    return lines
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    defaults = WorkspaceShape()
+    for field in WorkspaceShape._fields:
+        parser.add_argument(
+            f"--{field.replace('_', '-')}", type=int, default=getattr(defaults, field)
+        )
+    parser.add_argument("--adapter", choices=ADAPTERS, action="append", dest="adapters")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", type=pathlib.Path, help="Write the results to this file.")
+    parser.add_argument(
+        "--compare", type=pathlib.Path, help="Compare the results with a previous results file."
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    if sys.platform == "win32":
+        print("The adapter benchmark requires a POSIX platform.", file=sys.stderr)
+        return 1
+    args = parse_args(argv)
+    shape = WorkspaceShape(*(getattr(args, field) for field in WorkspaceShape._fields))
+    results = run_benchmarks(shape, tuple(args.adapters or ADAPTERS), max(args.repeat, 1))
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare_results(baseline, results)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Benchmark the request/response round trip of the REPL server for small commands.
+
+Usage, from the python_files directory:
+
+    python -m tests.benchmarks.python_server_benchmark --requests 2000 --output results.json
+
+The server runs in a subprocess once per JSON codec. Every request is sent after the
+response to the previous one was read, and the time between writing a request and
+decoding its response is its round-trip latency. `check_valid_command` is answered by the
+reader thread of the server, `execute` runs "1 + 1" on its main thread.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any
+
+script_dir = pathlib.Path(__file__).parent.parent.parent
+sys.path.append(os.fspath(script_dir))
+
+from testing_tools.rpc_stream import RpcStreamDecoder  # noqa: E402
+
+CODECS = ("orjson", "ujson", "json")
+COMMANDS = {
+    "check_valid_command": "1 + 1",
+    "execute": "1 + 1",
+}
+
+
+class ServerClient:
+    """Send requests to a python_server.py subprocess and wait for their responses."""
+
+    def __init__(self, codec: str):
+        self.process = subprocess.Popen(
+            [sys.executable, os.fspath(script_dir / "python_server.py")],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env={**os.environ, "PYTHON_SERVER_JSON_CODEC": codec},
+        )
+        self.decoder = RpcStreamDecoder()
+        self.received: list[dict[str, Any]] = []
+        self.next_id = 0
+
+    def round_trip(self, method: str, params: Any) -> float:
+        """Send a request and return the seconds until its response was decoded."""
+        self.next_id += 1
+        body = json.dumps(
+            {"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params}
+        ).encode()
+        start = time.perf_counter()
+        self.process.stdin.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+        self.process.stdin.flush()
+        while True:
+            while self.received:
+                message = self.received.pop(0)
+                if message.get("id") == self.next_id:
+                    return time.perf_counter() - start
+            data = self.process.stdout.read1(65536)
+            if not data:
+                raise RuntimeError("The server exited before it responded.")
+            self.received.extend(self.decoder.feed(data))
+
+    def close(self) -> None:
+        body = json.dumps({"jsonrpc": "2.0", "method": "exit"}).encode()
+        self.process.stdin.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+        self.process.stdin.close()
+        self.process.wait(timeout=10)
+        self.process.stdout.close()
+
+
+def summarize(latencies: list[float]) -> dict[str, Any]:
+    """Reduce the latencies of one command to the numbers stored in the results file."""
+    ordered = sorted(latencies)
+
+    def percentile(fraction: float) -> float:
+        return round(ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] * 1e6, 1)
+
+    return {
+        "requests": len(ordered),
+        "median_us": round(statistics.median(ordered) * 1e6, 1),
+        "p95_us": percentile(0.95),
+        "p99_us": percentile(0.99),
+        "max_us": round(ordered[-1] * 1e6, 1),
+        "requests_per_second": round(len(ordered) / sum(ordered), 1),
+    }
+
+
+def benchmark_codec(codec: str, requests: int, warmup: int = 50) -> dict[str, Any]:
+    """Measure the round trip of every command with the server using `codec`."""
+    client = ServerClient(codec)
+    try:
+        results = {}
+        for method, params in COMMANDS.items():
+            for _ in range(warmup):
+                client.round_trip(method, params)
+            latencies = [client.round_trip(method, params) for _ in range(requests)]
+            results[method] = summarize(latencies)
+    finally:
+        client.close()
+    return results
+
+
+def installed_codecs() -> tuple[str, ...]:
+    """Return the codecs whose JSON library can be imported."""
+    codecs = []
+    for codec in CODECS:
+        try:
+            __import__(codec)
+        except ImportError:
+            continue
+        codecs.append(codec)
+    return tuple(codecs)
+
+
+def run_benchmarks(codecs: tuple[str, ...], requests: int, warmup: int = 50) -> dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "results": {codec: benchmark_codec(codec, requests, warmup) for codec in codecs},
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--codec",
+        choices=CODECS,
+        action="append",
+        dest="codecs",
+        help="Codec to measure, defaults to all installed ones.",
+    )
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--output", type=pathlib.Path, help="Write the results to this file.")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        tuple(args.codecs or installed_codecs()), max(args.requests, 1), args.warmup
+    )
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+import sys
+
+import pytest
+
+from .adapter_benchmark import WorkspaceShape, compare_results, run_benchmarks
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="The benchmark uses POSIX named pipes.")
+def test_adapter_benchmark_reports_both_adapters():
+    shape = WorkspaceShape(folders=1, files=2, classes=1, tests=2, params=2, subtests=2)
+    results = run_benchmarks(shape)
+
+    pytest_results = results["results"]["pytest"]
+    assert pytest_results["discovery"]["tests"] == shape.pytest_test_count
+    assert pytest_results["execution"]["tests"] == shape.pytest_test_count
+    unittest_results = results["results"]["unittest"]
+    assert unittest_results["discovery"]["tests"] == shape.unittest_test_count
+    for phase in (*pytest_results.values(), *unittest_results.values()):
+        assert phase["messages"] > 0
+        assert phase["payload_bytes"] > 0
+        assert phase["peak_rss_kb"] > 0
+
+    assert len(compare_results(results, results)) == 12
@@ -0,0 +1,14 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+from .python_server_benchmark import COMMANDS, run_benchmarks
+
+
+def test_python_server_benchmark_reports_round_trips():
+    results = run_benchmarks(("json",), requests=20, warmup=2)
+
+    commands = results["results"]["json"]
+    assert set(commands) == set(COMMANDS)
+    for summary in commands.values():
+        assert summary["requests"] == 20
+        assert 0 < summary["median_us"] <= summary["p95_us"] <= summary["max_us"]
@@ -0,0 +1,17 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+import sys
+
+
+def test_short_output():  # test_marker--test_short_output
+    print("short output")
+    print("short error", file=sys.stderr)
+
+
+def test_long_output():  # test_marker--test_long_output
+    for i in range(200):
+        print(f"line {i:03}")
+
+
+def test_no_output():  # test_marker--test_no_output
+    assert True
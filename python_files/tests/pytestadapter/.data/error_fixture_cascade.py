@@ -0,0 +1,14 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+import pytest
+
+
+@pytest.fixture
+def broken_fixture():
+    raise Exception("Dummy exception")
+
+
+@pytest.mark.parametrize("num", range(3))
+def test_uses_broken_fixture(broken_fixture, num):  # test_marker--test_uses_broken_fixture
+    assert num >= 0
@@ -2,8 +2,6 @@
 # Licensed under the MIT License.
 
 import contextlib
-import io
-import json
 import os
 import pathlib
 import socket
@@ -25,9 +23,9 @@ sys.path.append(os.fspath(script_dir_child))
 sys.path.append(os.fspath(script_dir / "lib" / "python"))
 print("sys add path", script_dir)
 
+from testing_tools.rpc_stream import decode_messages  # noqa: E402
+
 TEST_DATA_PATH = pathlib.Path(__file__).parent / ".data"
-CONTENT_LENGTH: str = "Content-Length:"
-CONTENT_TYPE: str = "Content-Type:"
 PIPE_RESULT_TIMEOUT_SECONDS = 10
 TEST_SUBPROCESS_TIMEOUT_SECONDS = 300
 
@@ -75,9 +73,7 @@ def process_data_received(data: str) -> List[Dict[str, Any]]:
     - Checks that the jsonrpc value is 2.0
     """
     json_messages = []
-    remaining = data
-    while remaining:
-        json_data, remaining = parse_rpc_message(remaining)
+    for json_data in decode_messages(data.encode("utf-8")):
         # here json_data is a single rpc payload, now check its jsonrpc 2 and save the param data
         if "params" not in json_data or "jsonrpc" not in json_data:
             raise ValueError("Invalid JSON-RPC message received, missing params or jsonrpc key")
@@ -134,47 +130,6 @@ def expand_compact_discovery_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
     return expanded_payload
 
 
-def parse_rpc_message(data: str) -> Tuple[Dict[str, Any], str]:
-    """Process the JSON data which comes from the server.
-
-    A single rpc payload is in the format:
-    content-length: #LEN# \r\ncontent-type: application/json\r\n\r\n{"jsonrpc": "2.0", "params": ENTIRE_DATA}
-
-    returns:
-    json_data: A single rpc payload of JSON data from the server.
-    remaining: The remaining data after the JSON data.
-    """
-    str_stream: io.StringIO = io.StringIO(data)
-
-    length: int = 0
-    while True:
-        line: str = str_stream.readline()
-        if CONTENT_LENGTH.lower() in line.lower():
-            length = int(line[len(CONTENT_LENGTH) :])
-
-            line: str = str_stream.readline()
-            if CONTENT_TYPE.lower() not in line.lower():
-                raise ValueError("Header does not contain Content-Type")
-
-            line = str_stream.readline()
-            if line not in ["\r\n", "\n"]:
-                raise ValueError("Header does not contain space to separate header and body")
-            # if it passes all these checks then it has the right headers
-            break
-
-        if not line or line.isspace():
-            raise ValueError("Header does not contain Content-Length")
-
-    while True:  # keep reading until the number of bytes is the CONTENT_LENGTH
-        line: str = str_stream.readline(length)
-        try:
-            # try to parse the json, if successful it is single payload so return with remaining data
-            json_data: dict[str, Any] = json.loads(line)
-            return json_data, str_stream.read()
-        except json.JSONDecodeError:
-            print("json decode error")
-
-
 def _listen_on_fifo(pipe_name: str, result: List[str], completed: threading.Event):
     # Open the FIFO for reading
     fifo_path = pathlib.Path(pipe_name)
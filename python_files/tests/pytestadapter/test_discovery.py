@@ -143,6 +143,122 @@ def test_compact_discovery_payload_expands_after_rpc_parsing(tmp_path):
     )
 
 
+class _FakeCache:
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+
+    def get(self, key, default):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        self.values[key] = json.loads(json.dumps(value))
+
+
+def _compact_discovery_payload(base_path: str, files: Dict[str, List[str]]) -> Dict[str, Any]:
+    return {
+        "cwd": base_path,
+        "status": "success",
+        "payloadVersion": 2,
+        "pathBase": base_path,
+        "idBase": base_path,
+        "tests": {
+            "name": "workspace",
+            "path": ".",
+            "type_": "folder",
+            "id_": ".",
+            "children": [
+                {
+                    "name": file_name,
+                    "path": file_name,
+                    "type_": "file",
+                    "id_": file_name,
+                    "children": [
+                        {
+                            "name": test_name,
+                            "path": file_name,
+                            "type_": "test",
+                            "id_": f"{file_name}::{test_name}",
+                            "runID": f"{file_name}::{test_name}",
+                            "lineno": "1",
+                        }
+                        for test_name in test_names
+                    ],
+                }
+                for file_name, test_names in files.items()
+            ],
+        },
+        "error": [],
+    }
+
+
+def test_discovery_diff_payload_sends_changed_subtrees(tmp_path, monkeypatch):
+    cache = _FakeCache()
+    base_path = os.fspath(tmp_path)
+    state_key = vscode_pytest.get_discovery_state_key(base_path)
+
+    def create_payload(files):
+        return vscode_pytest.create_discovery_diff_payload(
+            cast(
+                "vscode_pytest.CompactDiscoveryPayloadDict",
+                _compact_discovery_payload(base_path, files),
+            ),
+            cache,
+        )
+
+    first, state = create_payload({"test_a.py": ["test_one"], "test_b.py": ["test_two"]})
+    assert first["tests"] is not None
+    assert first["version"] == 1
+    cache.set(state_key, state)
+
+    monkeypatch.setenv("DISCOVERY_BASE_VERSION", "1")
+    second, state = create_payload(
+        {"test_a.py": ["test_one", "test_three"], "test_c.py": ["test_c"]}
+    )
+    second = cast("Dict[str, Any]", second)
+    # An extension without diff support reads "tests": null as a discovery without tests.
+    assert "tests" not in second
+    assert second["payloadVersion"] == 3
+    assert (second["baseVersion"], second["version"]) == (1, 2)
+    assert second["removed"] == ["test_b.py"]
+    assert [(update["parentId"], update["node"]["id_"]) for update in second["added"]] == [
+        ("test_a.py", "test_a.py::test_three"),
+        (".", "test_c.py"),
+    ]
+    assert second["changed"] == []
+    cache.set(state_key, state)
+
+    # The extension holds an older tree, so the full tree is sent again.
+    third, _ = create_payload({"test_a.py": ["test_one"]})
+    assert third["tests"] is not None
+    assert third["version"] == 3
+
+
+def test_discovery_state_kept_when_send_fails(tmp_path, monkeypatch):
+    cache = _FakeCache()
+    session_node = cast("vscode_pytest.TestNode", {})
+    payload = _compact_discovery_payload(os.fspath(tmp_path), {"test_a.py": ["test_one"]})
+    monkeypatch.setattr(vscode_pytest, "DISCOVERY_DIFF_ENABLED", True)
+    monkeypatch.setattr(vscode_pytest, "create_compact_discovery_payload", lambda *_: payload)
+    sent: List[Any] = []
+
+    def send_message(message):
+        sent.append(message)
+        return False
+
+    monkeypatch.setattr(vscode_pytest, "send_message", send_message)
+
+    vscode_pytest.send_discovery_message(os.fspath(tmp_path), session_node, cache)
+
+    assert sent == [payload]
+    assert cache.values == {}
+
+    monkeypatch.setattr(vscode_pytest, "send_message", lambda _: True)
+    vscode_pytest.send_discovery_message(os.fspath(tmp_path), session_node, cache)
+
+    state_key = vscode_pytest.get_discovery_state_key(os.fspath(tmp_path))
+    assert cache.values[state_key]["version"] == 1
+
+
 def test_import_error():
     """Test pytest discovery on a file that has a pytest marker but does not import pytest.
 
@@ -176,6 +292,23 @@ def test_import_error():
                 pytest.fail(f"{error_content} is None or not a list, str, or tuple")
 
 
+def test_profiling_summary_not_sent_with_failed_discovery(tmp_path):
+    """Test that PROFILING_ENABLED keeps a failed discovery an error and still writes a trace."""
+    trace_file = tmp_path / "trace.json"
+    file_path = helpers.TEST_DATA_PATH / "error_pytest_import.txt"
+    with helpers.text_to_python_file(file_path) as p:
+        actual = helpers.runner_with_cwd_env(
+            ["--collect-only", os.fspath(p)],
+            helpers.TEST_DATA_PATH,
+            {"PROFILING_ENABLED": "True", "PROFILING_TRACE_FILE": os.fspath(trace_file)},
+        )
+
+    assert actual
+    assert all("profiling" not in message for message in actual)
+    assert actual[-1]["status"] == "error"
+    assert json.loads(trace_file.read_text(encoding="utf-8"))["traceEvents"]
+
+
 def test_syntax_error(tmp_path):  # noqa: ARG001
     """Test pytest discovery on a file that has a syntax error.
 
@@ -0,0 +1,133 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+import os
+import pathlib
+import sys
+
+script_dir = pathlib.Path(__file__).parent.parent.parent
+sys.path.append(os.fspath(script_dir))
+
+from testing_tools.file_watcher import PollingFileWatcher  # noqa: E402
+from vscode_pytest.discovery_daemon import PytestDiscoveryDaemon  # noqa: E402
+
+
+def test_polling_file_watcher_reports_changes(tmp_path):
+    (tmp_path / "test_modified.py").write_text("x = 1\n", encoding="utf-8")
+    (tmp_path / "test_deleted.py").write_text("x = 1\n", encoding="utf-8")
+    (tmp_path / "helper.txt").write_text("ignored\n", encoding="utf-8")
+    watcher = PollingFileWatcher(tmp_path, ["test_*.py"])
+
+    (tmp_path / "test_modified.py").write_text("x = 12\n", encoding="utf-8")
+    (tmp_path / "test_deleted.py").unlink()
+    (tmp_path / "test_created.py").write_text("x = 1\n", encoding="utf-8")
+    (tmp_path / "helper.txt").write_text("still ignored\n", encoding="utf-8")
+    changes = watcher.poll()
+
+    assert changes.created == (os.fspath(tmp_path / "test_created.py"),)
+    assert changes.modified == (os.fspath(tmp_path / "test_modified.py"),)
+    assert changes.deleted == (os.fspath(tmp_path / "test_deleted.py"),)
+    assert not watcher.poll()
+
+
+def test_discovery_daemon_sends_changed_files_only(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(os.fspath(tmp_path))
+    (tmp_path / "test_daemon_one.py").write_text("def test_one():\n    pass\n", encoding="utf-8")
+    (tmp_path / "test_daemon_two.py").write_text("def test_two():\n    pass\n", encoding="utf-8")
+    sent = []
+    daemon = PytestDiscoveryDaemon(
+        [f"--rootdir={tmp_path}", "-p", "no:cacheprovider"], send_message=sent.append
+    )
+    daemon.start()
+
+    assert len(sent) == 1
+    assert {child["name"] for child in sent[0]["tests"]["children"]} == {
+        "test_daemon_one.py",
+        "test_daemon_two.py",
+    }
+
+    (tmp_path / "test_daemon_one.py").write_text(
+        "def test_one():\n    pass\n\n\ndef test_added():\n    pass\n", encoding="utf-8"
+    )
+    (tmp_path / "test_daemon_two.py").unlink()
+    payload = daemon.handle_changes(daemon.watcher.poll())  # type: ignore
+
+    assert payload is not None
+    assert payload["status"] == "success"
+    assert payload["removed"] == ["test_daemon_two.py"]
+    assert len(payload["changed"]) == 1
+    assert payload["changed"][0]["id_"] == "test_daemon_one.py"
+    assert [child["name"] for child in payload["changed"][0]["children"]] == [
+        "test_one",
+        "test_added",
+    ]
+    assert sent[-1] is payload
+
+
+def test_discovery_daemon_reloads_changed_package_conftest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(os.fspath(tmp_path))
+    # A conftest inside a package is imported as "<package>.conftest", which pytest itself
+    # would return from sys.modules when it collects the package again.
+    package = tmp_path / "daemon_conftest_package"
+    package.mkdir()
+    (package / "__init__.py").write_text("", encoding="utf-8")
+    conftest = (
+        "def pytest_generate_tests(metafunc):\n"
+        "    if 'value' in metafunc.fixturenames:\n"
+        "        metafunc.parametrize('value', {values})\n"
+    )
+    (package / "conftest.py").write_text(conftest.format(values="[1]"), encoding="utf-8")
+    (package / "test_daemon_hook.py").write_text(
+        "def test_value(value):\n    pass\n", encoding="utf-8"
+    )
+    sent = []
+    daemon = PytestDiscoveryDaemon(
+        [f"--rootdir={tmp_path}", "-p", "no:cacheprovider"], send_message=sent.append
+    )
+    daemon.start()
+
+    def test_names():
+        (package_node,) = sent[-1]["tests"]["children"]
+        (file_node,) = package_node["children"]
+        (function_node,) = file_node["children"]
+        return [child["name"] for child in function_node["children"]]
+
+    assert test_names() == ["[1]"]
+
+    (package / "conftest.py").write_text(conftest.format(values="[1, 2, 3]"), encoding="utf-8")
+    assert daemon.handle_changes(daemon.watcher.poll()) is None  # type: ignore
+
+    assert len(sent) == 2
+    assert test_names() == ["[1]", "[2]", "[3]"]
+
+
+def test_discovery_daemon_with_plugin_args_sends_only_its_payloads(tmp_path, monkeypatch):
+    import vscode_pytest
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(os.fspath(tmp_path))
+    (tmp_path / "test_plugin_one.py").write_text("def test_one():\n    pass\n", encoding="utf-8")
+    (tmp_path / "test_plugin_two.py").write_text("def test_two():\n    pass\n", encoding="utf-8")
+    plugin_sent = []
+    monkeypatch.setattr(vscode_pytest, "send_message", plugin_sent.append)
+    sent = []
+    # The arguments of a regular discovery run, which load the plugin.
+    daemon = PytestDiscoveryDaemon(
+        ["-p", "vscode_pytest", "--collect-only", f"--rootdir={tmp_path}", os.fspath(tmp_path)],
+        send_message=sent.append,
+    )
+    daemon.start()
+    (tmp_path / "test_plugin_two.py").write_text(
+        "def test_two():\n    pass\n\ndef test_three():\n    pass\n", encoding="utf-8"
+    )
+    update = daemon.handle_changes(daemon.watcher.poll())  # type: ignore
+
+    assert plugin_sent == []
+    assert len(sent) == 2
+    assert {child["name"] for child in sent[0]["tests"]["children"]} == {
+        "test_plugin_one.py",
+        "test_plugin_two.py",
+    }
+    assert update is sent[1]
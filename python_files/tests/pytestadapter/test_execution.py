@@ -4,6 +4,7 @@ import json
 import os
 import pathlib
 import sys
+import threading
 from typing import Any, Dict, List
 
 import pytest
@@ -17,8 +18,10 @@ from .helpers import (  # noqa: E402
     TEST_DATA_PATH,
     create_symlink,
     get_absolute_test_id,
+    process_data_received,
     runner,
     runner_with_cwd,
+    runner_with_cwd_env,
 )
 
 
@@ -272,3 +275,198 @@ def test_symlink_run():
                 # Print the actual_item in JSON format if an assertion fails
                 print(json.dumps(actual_item, indent=4))
                 pytest.fail(str(e))
+
+
+def test_test_ids_file_filters_after_collection(tmp_path):
+    """Test that --vscode-test-ids-file runs only the listed tests when each file is passed once."""
+    test_file = TEST_DATA_PATH / "parametrize_tests.py"
+    selected_ids = [
+        f"{test_file}::TestClass::test_adding[3+5-8]",
+        f"{test_file}::test_string",
+    ]
+    ids_file = tmp_path / "test_ids.txt"
+    ids_file.write_text("\n".join(selected_ids), encoding="utf-8")
+
+    actual = runner([f"--vscode-test-ids-file={ids_file}", os.fspath(test_file)])
+
+    assert actual
+    actual_result_dict = {}
+    for actual_item in actual:
+        assert actual_item.get("status") == "success"
+        actual_result_dict.update(actual_item["result"])
+    assert sorted(actual_result_dict) == [
+        f"{test_file}::TestClass::test_adding[3+5-8]",
+        f"{test_file}::test_string[complicated split [] ()]",
+        f"{test_file}::test_string[hello]",
+    ]
+
+
+def test_profiling_summary_sent_at_session_end(tmp_path):
+    """Test that PROFILING_ENABLED sends hook timings after the results and writes a trace."""
+    trace_file = tmp_path / "trace.json"
+    test_file = TEST_DATA_PATH / "parametrize_tests.py"
+
+    actual = runner_with_cwd_env(
+        [f"{test_file}::test_string"],
+        TEST_DATA_PATH,
+        {"PROFILING_ENABLED": "True", "PROFILING_TRACE_FILE": os.fspath(trace_file)},
+    )
+
+    assert actual
+    *results, summary_message = actual
+    assert len(results) == 2
+    assert summary_message["status"] == "success"
+    summary = summary_message["profiling"]
+    assert summary["messages"] == len(results)
+    assert summary["bytesSent"] > 0
+    assert summary["hooks"]["pytest_report_teststatus"]["calls"] == 6
+    assert summary["hooks"]["send_message"]["calls"] == len(results)
+    trace = json.loads(trace_file.read_text(encoding="utf-8"))
+    assert {event["name"] for event in trace["traceEvents"]} >= {
+        "pytest_runtest_protocol",
+        "send_message",
+    }
+
+
+def test_repeated_errors_sent_by_reference():
+    """Test that TRACEBACK_DEDUP_ENABLED sends the traceback of a failing fixture only once."""
+    test_file = TEST_DATA_PATH / "error_fixture_cascade.py"
+
+    actual = runner_with_cwd_env(
+        [os.fspath(test_file)], TEST_DATA_PATH, {"TRACEBACK_DEDUP_ENABLED": "True"}
+    )
+
+    assert actual
+    results = [item for message in actual for item in message["result"].values()]
+    assert [item["outcome"] for item in results] == ["error"] * 3
+    first, *repeated = results
+    assert "Dummy exception" in first["traceback"]
+    for item in repeated:
+        assert item["traceback"].startswith(f"Same traceback as {first['test']} [traceback ")
+
+
+def test_captured_output_attached_to_outcome(tmp_path):
+    """Test that CAPTURED_OUTPUT_ENABLED sends captured output inline, in chunks or spilled."""
+    test_file = TEST_DATA_PATH / "captured_output_tests.py"
+
+    actual = runner_with_cwd_env(
+        ["--capture=fd", os.fspath(test_file)],
+        TEST_DATA_PATH,
+        {
+            "CAPTURED_OUTPUT_ENABLED": "True",
+            "CAPTURED_OUTPUT_CHUNK_CHARS": "400",
+            "CAPTURED_OUTPUT_MAX_CHARS": "1000",
+            "CAPTURED_OUTPUT_SPILL_DIR": os.fspath(tmp_path),
+        },
+    )
+
+    assert actual
+    chunks = [message["output"] for message in actual if "output" in message]
+    results = {}
+    for message in actual:
+        results.update(message.get("result") or {})
+    short_result = results[f"{test_file}::test_short_output"]
+    assert short_result["output"] == (
+        "----- Captured stdout call -----\nshort output\n"
+        "----- Captured stderr call -----\nshort error\n"
+    )
+    assert short_result["output_chunks"] == 0
+
+    long_id = f"{test_file}::test_long_output"
+    long_result = results[long_id]
+    assert long_result["output"] is None
+    assert long_result["output_chunks"] == len(chunks) == 3
+    assert all(chunk["test"] == long_id and chunk["count"] == 3 for chunk in chunks)
+    streamed = "".join(chunk["data"] for chunk in chunks)
+    assert streamed.startswith("----- Captured stdout call -----\nline 000\n")
+    assert f"characters truncated, full output in {long_result['output_file']}" in streamed
+    full_output = pathlib.Path(long_result["output_file"]).read_text(encoding="utf-8")
+    assert len(full_output) == long_result["output_size"]
+    assert full_output.endswith("line 199\n")
+
+    assert "output" not in results[f"{test_file}::test_no_output"]
+
+
+def test_shards_run_balanced_partitions_that_merge(tmp_path):
+    """Test that --vscode-shard splits the tests by duration and the shard files merge."""
+    from vscode_pytest.merge_shards import iter_messages
+    from vscode_pytest.merge_shards import main as merge_main
+
+    test_file = TEST_DATA_PATH / "parametrize_tests.py"
+    durations = {
+        "parametrize_tests.py::TestClass::test_adding[3+5-8]": 0.1,
+        "parametrize_tests.py::TestClass::test_adding[2+4-6]": 0.1,
+        "parametrize_tests.py::TestClass::test_adding[6+9-16]": 10.0,
+        "parametrize_tests.py::test_string[hello]": 0.1,
+        "parametrize_tests.py::test_string[complicated split [] ()]": 0.1,
+    }
+    durations_file = tmp_path / "durations.json"
+    durations_file.write_text(json.dumps(durations), encoding="utf-8")
+
+    shard_files = []
+    shard_results = []
+    for shard in ("1/2", "2/2"):
+        shard_file = tmp_path / f"shard-{shard[0]}.jsonrpc"
+        actual = runner(
+            [
+                f"--vscode-shard={shard}",
+                f"--vscode-shard-output={shard_file}",
+                f"--vscode-shard-durations={durations_file}",
+                "-p",
+                "no:cacheprovider",
+                os.fspath(test_file),
+            ]
+        )
+        assert actual
+        assert list(iter_messages(shard_file.read_bytes())) == actual
+        shard_files.append(shard_file)
+        shard_results.append({test_id for item in actual for test_id in item["result"]})
+
+    heavy_test_id = f"{test_file}::TestClass::test_adding[6+9-16]"
+    assert shard_results[0] == {heavy_test_id}
+    assert len(shard_results[1]) == 4
+
+    merged_file = tmp_path / "merged.jsonrpc"
+    assert merge_main([*map(os.fspath, shard_files), "-o", os.fspath(merged_file)]) == 0
+    (merged,) = iter_messages(merged_file.read_bytes())
+    assert merged["status"] == "success"
+    assert set(merged["result"]) == shard_results[0] | shard_results[1]
+    assert merged["result"][heavy_test_id]["outcome"] == "failure"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="The replay is read from a POSIX named pipe.")
+def test_recorded_messages_replay_into_pipe(tmp_path):
+    """Test that MESSAGE_RECORDING_FILE records every message and the recording replays as sent."""
+    from testing_tools.message_recorder import iter_recording, replay
+
+    recording_file = tmp_path / "recording.gz"
+    test_file = TEST_DATA_PATH / "parametrize_tests.py"
+
+    actual = runner_with_cwd_env(
+        [os.fspath(test_file)],
+        TEST_DATA_PATH,
+        {"MESSAGE_RECORDING_FILE": os.fspath(recording_file)},
+    )
+
+    assert actual
+    recording = list(iter_recording(recording_file))
+    assert [json.loads(data)["params"] for _, data in recording] == actual
+    timestamps = [timestamp for timestamp, _ in recording]
+    assert timestamps == sorted(timestamps)
+
+    pipe_name = os.fspath(tmp_path / "replay.pipe")
+    os.mkfifo(pipe_name)
+    received: List[bytes] = []
+
+    def read_pipe():
+        with open(pipe_name, "rb") as pipe:  # noqa: PTH123
+            received.append(pipe.read())
+
+    reader = threading.Thread(target=read_pipe, daemon=True)
+    reader.start()
+    messages, bytes_sent, _ = replay(recording_file, pipe_name, speed=None)
+    reader.join(timeout=10)
+
+    assert messages == len(actual)
+    assert bytes_sent == len(received[0])
+    assert process_data_received(received[0].decode("utf-8")) == actual
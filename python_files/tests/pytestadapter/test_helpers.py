@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 
+import json
 import os
 import subprocess
 import sys
@@ -8,6 +9,8 @@ import threading
 
 import pytest
 
+from testing_tools.rpc_stream import RpcStreamDecoder, decode_messages
+
 from . import helpers
 
 
@@ -52,3 +55,43 @@ def test_wait_for_pipe_result_times_out(monkeypatch):
     finally:
         release_listener.set()
         listener_thread.join()
+
+
+def frame(params, line_ending="\r\n"):
+    body = json.dumps({"jsonrpc": "2.0", "params": params}, ensure_ascii=False).encode("utf-8")
+    headers = f"content-length: {len(body)}{line_ending}content-type: application/json{line_ending}"
+    return f"{headers}{line_ending}".encode() + body
+
+
+def test_rpc_stream_decoder_handles_split_messages():
+    params = [{"test": f"test_{i}", "message": "caf\u00e9 \U0001f600"} for i in range(50)]
+    stream = b"".join(frame(item, "\n" if i % 2 else "\r\n") for i, item in enumerate(params))
+    for size in (1, 7, 4096):
+        decoder = RpcStreamDecoder()
+        decoded = []
+        for start in range(0, len(stream), size):
+            decoded.extend(decoder.feed(stream[start : start + size]))
+        decoder.close()
+        assert [message["params"] for message in decoded] == params
+        assert decoder.pending == 0
+
+
+def test_rpc_stream_decoder_rejects_partial_message():
+    decoder = RpcStreamDecoder()
+    data = frame({"status": "success"})
+
+    assert decoder.feed(data[:-1]) == []
+    with pytest.raises(ValueError, match="partial message"):
+        decoder.close()
+    with pytest.raises(ValueError, match="Content-Length"):
+        decode_messages(b"content-type: application/json\r\n\r\n{}")
+
+
+def test_process_data_received_decodes_many_messages():
+    count = 20000
+    data = b"".join(frame({"result": {f"test_{i}": {"outcome": "success"}}}) for i in range(count))
+
+    messages = helpers.process_data_received(data.decode("utf-8"))
+
+    assert len(messages) == count
+    assert messages[-1] == {"result": {f"test_{count - 1}": {"outcome": "success"}}}
@@ -6,13 +6,16 @@ import pathlib
 import sys
 import tempfile
 
+import pytest
+
 from .helpers import (
     TEST_DATA_PATH,
 )
 
 script_dir = pathlib.Path(__file__).parent.parent.parent
 sys.path.append(os.fspath(script_dir))
-from vscode_pytest import cached_fsdecode, has_symlink_parent  # noqa: E402
+from testing_tools.id_selection import iter_test_ids  # noqa: E402
+from vscode_pytest import TestIdFilter, cached_fsdecode, has_symlink_parent  # noqa: E402
 
 
 def test_has_symlink_parent_with_symlink():
@@ -55,3 +58,96 @@ def test_cached_fsdecode():
     result3 = cached_fsdecode(test_path2)
     assert result3 == os.fspath(test_path2)
     assert result3 != result1
+
+
+def test_iter_test_ids_streams_lines(tmp_path):
+    ids_file = tmp_path / "ids.txt"
+    ids_file.write_bytes(b"a.py::test_one\r\n\nb.py::TestClass::test_two[1]\nc.py::test_three")
+
+    assert list(iter_test_ids(ids_file)) == [
+        "a.py::test_one",
+        "b.py::TestClass::test_two[1]",
+        "c.py::test_three",
+    ]
+
+    ids_file.write_bytes(b"")
+    assert list(iter_test_ids(ids_file)) == []
+
+
+def test_test_id_filter_selects_tests_and_parents(tmp_path, monkeypatch):
+    test_file = tmp_path / "test_filter_sample.py"
+    test_file.write_text(
+        "import pytest\n\n"
+        "def test_one():\n    pass\n\n"
+        "def test_two():\n    pass\n\n"
+        "@pytest.mark.parametrize('n', [1, 2])\n"
+        "def test_param(n):\n    pass\n\n"
+        "class TestGroup:\n    def test_a(self):\n        pass\n\n    def test_b(self):\n        pass\n",
+        encoding="utf-8",
+    )
+    monkeypatch.chdir(tmp_path)
+
+    class ItemRecorder:
+        def __init__(self):
+            self.names = []
+
+        def pytest_collection_finish(self, session):
+            self.names.extend(item.nodeid for item in session.items)
+
+    recorder = ItemRecorder()
+    test_ids = {
+        f"{test_file}::test_one",
+        f"{test_file}::test_param",
+        "test_filter_sample.py::TestGroup",
+    }
+    pytest.main(
+        ["--collect-only", "-q", "-p", "no:cacheprovider", os.fspath(test_file)],
+        plugins=[TestIdFilter(test_ids), recorder],
+    )
+
+    assert recorder.names == [
+        "test_filter_sample.py::test_one",
+        "test_filter_sample.py::test_param[1]",
+        "test_filter_sample.py::test_param[2]",
+        "test_filter_sample.py::TestGroup::test_a",
+        "test_filter_sample.py::TestGroup::test_b",
+    ]
+
+
+def test_test_id_filter_with_brackets_in_path(tmp_path, monkeypatch):
+    test_dir = tmp_path / "case[1]"
+    test_dir.mkdir()
+    test_file = test_dir / "test_bracket_sample.py"
+    test_file.write_text(
+        "import pytest\n\n"
+        "def test_one():\n    pass\n\n"
+        "@pytest.mark.parametrize('n', [1, 2])\n"
+        "def test_param(n):\n    pass\n",
+        encoding="utf-8",
+    )
+    monkeypatch.chdir(tmp_path)
+
+    test_filter = TestIdFilter({f"{test_file}::test_param"})
+    assert test_filter.is_selected(f"{test_file}::test_param[1]")
+    assert not test_filter.is_selected(f"{test_file}::test_one")
+    assert TestIdFilter({os.fspath(test_file)}).is_selected(f"{test_file}::test_param[2]")
+    assert not TestIdFilter({os.fspath(tmp_path / "case")}).is_selected(f"{test_file}::test_one")
+
+    class ItemRecorder:
+        def __init__(self):
+            self.names = []
+
+        def pytest_collection_finish(self, session):
+            self.names.extend(item.nodeid for item in session.items)
+
+    recorder = ItemRecorder()
+    # pytest rejects "[" in path arguments, the directory above is collected instead.
+    pytest.main(
+        ["--collect-only", "-q", "-p", "no:cacheprovider", os.fspath(tmp_path)],
+        plugins=[TestIdFilter({"case[1]/test_bracket_sample.py::test_param"}), recorder],
+    )
+
+    assert recorder.names == [
+        "case[1]/test_bracket_sample.py::test_param[1]",
+        "case[1]/test_bracket_sample.py::test_param[2]",
+    ]
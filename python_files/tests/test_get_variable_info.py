@@ -1,3 +1,5 @@
+import pytest
+
 import get_variable_info
 
 
@@ -112,3 +114,315 @@ def test_get_nested_children():
     found = assert_property(found, "a")
     found = assert_indexed_child(found, 0, 0)
     assert found["value"] == "'hello'"
+
+
+def test_variable_names_paged_without_values():
+    set_global_variable([1, 2, 3])
+    result = get_variable_info.getVariableNames()
+    names = [variable["name"] for variable in result["variables"]]
+    assert result["total"] == len(names)
+    index = names.index("test_variable")
+
+    page = get_variable_info.getVariableNames(index, 1)["variables"]
+
+    assert page == [
+        {
+            "name": "test_variable",
+            "type": "list",
+            "root": "test_variable",
+            "propertyChain": [],
+            "language": "python",
+        }
+    ]
+    (description,) = get_variable_info.getVariableDescriptionsByName(["test_variable", "missing"])
+    assert description["value"] == "[1, 2, 3]"
+    assert description["count"] == 3
+
+
+def changed_test_variable():
+    changes = get_variable_info.getVariableChanges()
+    changed = [variable["name"] for variable in changes["changed"]]
+    return "test_variable" in changed, "test_variable" in changes["removed"]
+
+
+def test_variable_changes_since_snapshot():
+    set_global_variable("text")
+    assert changed_test_variable() == (True, False)
+    assert changed_test_variable() == (False, False)
+    set_global_variable("other text")
+    assert changed_test_variable() == (True, False)
+    set_global_variable(12345)
+    assert changed_test_variable() == (True, False)
+
+    del get_variable_info.test_variable  # pyright: ignore[reportAttributeAccessIssue]
+    assert changed_test_variable() == (False, True)
+
+
+def test_variable_changes_in_place_always_reported():
+    import dataclasses
+
+    @dataclasses.dataclass
+    class Point:
+        x: int
+
+    items = [1, 2]
+    set_global_variable(items)
+    changed_test_variable()
+    items[0] = 100
+    assert changed_test_variable() == (True, False)
+
+    point = Point(1)
+    set_global_variable(point)
+    changed_test_variable()
+    point.x = 5
+    assert changed_test_variable() == (True, False)
+
+
+def test_variable_snapshot_keeps_no_references():
+    import gc
+
+    freed = []
+
+    class Value:
+        # Without weak references, like lists and dicts.
+        __slots__ = ()
+
+        def __del__(self):
+            freed.append(True)
+
+    set_global_variable(Value())
+    get_variable_info.getVariableChanges()
+
+    set_global_variable(None)
+    gc.collect()
+
+    assert freed == [True]
+
+
+def test_variable_changes_across_script_runs():
+    """Test the diff when the script runs wrapped in a function, as the extension runs it."""
+    import pathlib
+
+    script = pathlib.Path(get_variable_info.__file__).read_text(encoding="utf-8")
+    wrapped = "\n".join(
+        [
+            "def __VSCODE_run_script():",
+            *(f"    {line}" for line in script.splitlines()),
+            "    return getVariableChanges()",
+            "result = __VSCODE_run_script()",
+            "del __VSCODE_run_script",
+        ]
+    )
+    user_globals = {"a": 1, "b": [1]}
+
+    exec(wrapped, user_globals)
+    first = user_globals.pop("result")
+    user_globals["b"].append(2)
+    exec(wrapped, user_globals)
+    second = user_globals.pop("result")
+
+    assert [variable["name"] for variable in first["changed"]] == ["a", "b"]
+    assert second == {
+        "changed": [
+            {"name": "b", "type": "list", "root": "b", "propertyChain": [], "language": "python"}
+        ],
+        "removed": [],
+    }
+
+
+class CountingRepr:
+    def __init__(self, shape=(1,)):
+        self.shape = shape
+        self.repr_calls = 0
+
+    def __repr__(self):
+        self.repr_calls += 1
+        return f"CountingRepr{self.shape}"
+
+
+def get_described_variable():
+    (description,) = get_variable_info.getVariableDescriptionsByName(["test_variable"])
+    return description
+
+
+def count_descriptions(monkeypatch):
+    described = []
+    describe = get_variable_info._describe_variable  # noqa: SLF001
+
+    def counting_describe(variable):
+        described.append(variable)
+        return describe(variable)
+
+    monkeypatch.setattr(get_variable_info, "_describe_variable", counting_describe)
+    return described
+
+
+def test_scalar_description_cached(monkeypatch):
+    get_variable_info.clearVariableCache()
+    described = count_descriptions(monkeypatch)
+    set_global_variable("a long text " * 10)
+
+    assert get_described_variable()["value"] == repr("a long text " * 10)
+    assert get_described_variable()["value"] == repr("a long text " * 10)
+    assert len(described) == 1
+
+    set_global_variable("other text")
+    assert get_described_variable()["value"] == "'other text'"
+    get_variable_info.clearVariableCache()
+    get_described_variable()
+    assert len(described) == 3
+
+
+def test_attribute_change_described_again():
+    import dataclasses
+
+    @dataclasses.dataclass
+    class Point:
+        x: int
+
+    point = Point(1)
+    set_global_variable(point)
+    assert get_described_variable()["value"].endswith("Point(x=1)")
+
+    point.x = 99
+
+    assert get_described_variable()["value"].endswith("Point(x=99)")
+
+
+def test_all_root_descriptions_not_cached():
+    variable = CountingRepr()
+    set_global_variable(variable)
+
+    get_global_variable()
+    get_global_variable()
+
+    # Changes the version does not see, such as attribute assignment, show on every refresh.
+    assert variable.repr_calls == 2
+
+
+class SlottedValue:
+    """A value without weak references, whose id can be reused once it is freed."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return f"SlottedValue({self.value})"
+
+
+def test_description_not_reused_for_reused_id():
+    for value in range(20):
+        set_global_variable(None)
+        set_global_variable(SlottedValue(value))
+        assert get_described_variable()["value"] == f"SlottedValue({value})"
+        assert get_variable_info.getVariableChanges()["changed"]
+
+
+def test_numpy_scalars_not_reused_for_reused_id():
+    numpy = pytest.importorskip("numpy")
+    set_global_variable(numpy.arange(10.0))
+    get_variable_info.getAllChildrenDescriptions("test_variable", [], 0)
+    set_global_variable(numpy.arange(100, 110.0))
+
+    children = get_variable_info.getAllChildrenDescriptions("test_variable", [], 0)
+    set_global_variable(numpy.float64(1.5))
+    get_described_variable()
+    set_global_variable(numpy.float64(2.5))
+
+    def number(value):
+        # NumPy 2 shows scalars as np.float64(2.5), earlier versions as 2.5.
+        return float(value.rpartition("(")[2].rstrip(")"))
+
+    assert [number(child["value"]) for child in children] == list(range(100, 110))
+    assert number(get_described_variable()["value"]) == 2.5
+
+
+def test_builtin_collections_described_again():
+    variable = [1, 2, 3]
+    set_global_variable(variable)
+    get_global_variable()
+
+    variable[0] = 9
+
+    assert get_global_variable()["value"] == "[9, 2, 3]"
+
+
+def test_description_cache_bounded(monkeypatch):
+    monkeypatch.setattr(get_variable_info, "_cache_size", 3)
+    get_variable_info.clearVariableCache()
+    variables = [f"text {i}" for i in range(5)]
+    names = [f"test_cached_{i}" for i in range(5)]
+    for name, variable in zip(names, variables):
+        monkeypatch.setattr(get_variable_info, name, variable, raising=False)
+
+    descriptions = get_variable_info.getVariableDescriptionsByName(names)
+
+    assert [description["value"] for description in descriptions] == list(map(repr, variables))
+    cache = vars(get_variable_info)["__VSCODE_variable_cache"]
+    assert list(cache) == [(str, id(variable), hash(variable)) for variable in variables[2:]]
+
+
+def test_numpy_array_summary_and_rows():
+    numpy = pytest.importorskip("numpy")
+    array = numpy.arange(200, dtype=numpy.float64).reshape(100, 2)
+    array[0, 0] = numpy.nan
+
+    found = assert_variable_found(array, None, "numpy.ndarray", 100)
+
+    assert found["summary"] == {
+        "shape": [100, 2],
+        "dtype": "float64",
+        "nbytes": 1600,
+        "min": 1.0,
+        "max": 199.0,
+        "mean": 100.0,
+    }
+    row = assert_indexed_child(found, 60, 1)
+    assert row["propertyChain"] == [61]
+    assert row["summary"]["shape"] == [2]
+    assert (row["summary"]["min"], row["summary"]["max"]) == (122.0, 123.0)
+    children = get_variable_info.getAllChildrenDescriptions("test_variable", [], 90)
+    assert [child["name"] for child in children] == [str(i) for i in range(90, 100)]
+    set_global_variable(numpy.full(3, numpy.nan))
+    assert get_global_variable()["summary"]["max"] == "nan"
+
+
+def test_numpy_array_changed_in_place():
+    numpy = pytest.importorskip("numpy")
+    array = numpy.arange(4.0)
+    set_global_variable(array)
+    get_variable_info.getVariableChanges()
+    assert get_described_variable()["summary"]["max"] == 3.0
+
+    array += 100
+
+    changes = get_variable_info.getVariableChanges()
+    assert "test_variable" in [variable["name"] for variable in changes["changed"]]
+    summary = get_described_variable()["summary"]
+    assert (summary["min"], summary["max"], summary["mean"]) == (100.0, 103.0, 101.5)
+    assert get_global_variable()["summary"]["max"] == 103.0
+
+
+def test_pandas_frame_columns_and_preview():
+    pandas = pytest.importorskip("pandas")
+    frame = pandas.DataFrame(
+        {"count": range(10), "name": [f"row {i}" for i in range(10)]},
+        index=range(100, 110),
+    )
+
+    found = assert_variable_found(frame, None, "pandas.DataFrame", None)
+
+    summary = found["summary"]
+    assert summary["shape"] == [10, 2]
+    assert [column["name"] for column in summary["columns"]] == ["count", "name"]
+    assert summary["columns"][0]["dtype"] == "int64"
+    assert "row 4" in summary["head"]
+    assert "row 5" not in summary["head"]
+    assert "row 9" in summary["tail"]
+    column = assert_property(found, "count")
+    assert column["summary"]["shape"] == [10]
+    assert column["language"] == "python"
+    # Rows of a series are its children by position, not by label.
+    assert_indexed_child(column, 0, 3, "3")
@@ -160,3 +160,624 @@ class TestMainLoopEOFHandling:
         empty_line_stream2 = io.BytesIO(b"\n")
         result = empty_line_stream2.readline()
         assert result == b"\n", "Empty line should return newline bytes"
+
+
+class TestStreamingOutput:
+    """Tests for sending output in `output` notifications while code runs."""
+
+    def run_streaming(self, code):
+        import python_server
+        from testing_tools.rpc_stream import decode_messages
+
+        mock_stdout = io.BytesIO()
+        with mock.patch.object(python_server, "STDOUT", mock.Mock(buffer=mock_stdout)):
+            python_server.execute({"id": 1, "params": [code]}, {})
+        return decode_messages(mock_stdout.getvalue())
+
+    def test_output_sent_before_status(self):
+        """Test that stdout and stderr are sent as notifications and the response has no output."""
+        import python_server
+
+        with mock.patch.object(python_server, "STREAM_OUTPUT", True):  # noqa: FBT003
+            messages = self.run_streaming(
+                "import sys\nprint('hello')\nprint('oops', file=sys.stderr)"
+            )
+
+        *notifications, response = messages
+        assert response == {"jsonrpc": "2.0", "id": 1, "result": {"status": True, "output": ""}}
+        assert all(message["method"] == "output" for message in notifications)
+        streamed = {}
+        for message in notifications:
+            params = message["params"]
+            assert params["id"] == 1
+            streamed[params["stream"]] = streamed.get(params["stream"], "") + params["text"]
+        assert streamed == {"stdout": "hello\n", "stderr": "oops\n"}
+
+    def test_output_sent_in_size_window(self):
+        """Test that output is sent once the buffered text reaches the flush size."""
+        import python_server
+
+        with mock.patch.object(python_server, "STREAM_OUTPUT", True), mock.patch.object(  # noqa: FBT003
+            python_server, "OUTPUT_FLUSH_SIZE", 10
+        ):
+            messages = self.run_streaming("for i in range(5):\n    print('line', i)")
+
+        *notifications, response = messages
+        texts = [message["params"]["text"] for message in notifications]
+        assert len(texts) > 1
+        assert all(len(text) >= 10 for text in texts[:-1])
+        assert "".join(texts) == "".join(f"line {i}\n" for i in range(5))
+        assert response["result"] == {"status": True, "output": ""}
+
+    def test_output_sent_while_code_runs(self):
+        """Test that output waiting in the buffer is sent by the flusher before the code ends."""
+        import python_server
+
+        with mock.patch.object(python_server, "STREAM_OUTPUT", True):  # noqa: FBT003
+            messages = self.run_streaming(
+                "import sys, time\n"
+                "sys.stdout.write('progress')\n"
+                "time.sleep(0.5)\n"
+                "sent = sys.stdout._chunks == []\n"
+                "raise ValueError(sent)"
+            )
+
+        *notifications, response = messages
+        assert notifications[0]["params"]["text"] == "progress"
+        assert "ValueError: True" in notifications[-1]["params"]["text"]
+        assert response["result"] == {"status": False, "output": ""}
+
+    def test_extension_script_output_in_response(self):
+        """Test that the output of the extension's own scripts is returned with the response."""
+        import python_server
+
+        code = "def __VSCODE_getVariable():\n    print('[1, 2]')\n\n__VSCODE_getVariable()"
+        with mock.patch.object(python_server, "STREAM_OUTPUT", True):  # noqa: FBT003
+            messages = self.run_streaming(code)
+
+        assert messages == [
+            {"jsonrpc": "2.0", "id": 1, "result": {"status": True, "output": "[1, 2]\n"}}
+        ]
+
+    def test_buffered_output_without_streaming(self):
+        """Test that the output is returned with the response when streaming is disabled."""
+        messages = self.run_streaming("print('hello')")
+
+        assert messages == [
+            {"jsonrpc": "2.0", "id": 1, "result": {"status": True, "output": "hello\n"}}
+        ]
+
+
+class TestOutputLimits:
+    """Tests for cutting large outputs and spilling them to a file."""
+
+    def run_execute(self, code, **settings):
+        import python_server
+        from testing_tools.rpc_stream import decode_messages
+
+        mock_stdout = io.BytesIO()
+        with mock.patch.multiple(python_server, STDOUT=mock.Mock(buffer=mock_stdout), **settings):
+            python_server.execute({"id": 1, "params": [code]}, {})
+        return decode_messages(mock_stdout.getvalue())
+
+    def test_output_limit_keeps_head_and_tail(self):
+        """Test that the output is cut in the middle when it writes in many small pieces."""
+        import python_server
+
+        output = "".join(f"{i:02}|" for i in range(50))
+        limit = python_server.OutputLimit("stdout", 40)
+        passed = "".join(limit.write(output[i : i + 3]) for i in range(0, len(output), 3))
+        rest = limit.finish()
+
+        assert passed == output[:30]
+        assert rest == "\n... 110 characters truncated ...\n" + output[-10:]
+
+    def test_buffered_output_truncated(self):
+        """Test that a response only carries the head and tail of a large output."""
+        messages = self.run_execute(
+            "print('\u00e9' * 100 + 'end')", OUTPUT_MAX_CHARS=40, STREAM_OUTPUT=False
+        )
+
+        output = messages[0]["result"]["output"]
+        assert (
+            output == "\u00e9" * 30 + "\n... 64 characters truncated ...\n" + "\u00e9" * 6 + "end\n"
+        )
+
+    def test_output_under_limit_unchanged(self):
+        """Test that output that fits the limit is sent as it was written."""
+        messages = self.run_execute("print('x' * 39)", OUTPUT_MAX_CHARS=40, STREAM_OUTPUT=False)
+
+        assert messages[0]["result"]["output"] == "x" * 39 + "\n"
+
+    def test_output_not_limited_by_default(self):
+        """Test that a large output is sent whole when no limit is configured."""
+        import python_server
+
+        messages = self.run_execute("print('x' * 2000000)", STREAM_OUTPUT=False)
+
+        assert python_server.OUTPUT_MAX_CHARS == 0
+        assert messages[0]["result"]["output"] == "x" * 2000000 + "\n"
+
+    def test_streamed_output_spilled_to_file(self, tmp_path):
+        """Test that the full output of a cut stream is written to a file named in the marker."""
+        messages = self.run_execute(
+            "for i in range(1000):\n    print(i)",
+            OUTPUT_MAX_CHARS=100,
+            OUTPUT_SPILL_ENABLED=True,
+            OUTPUT_SPILL_DIR=str(tmp_path),
+            STREAM_OUTPUT=True,
+        )
+
+        *notifications, response = messages
+        text = "".join(message["params"]["text"] for message in notifications)
+        (spill_file,) = tmp_path.iterdir()
+        full_output = "".join(f"{i}\n" for i in range(1000))
+        assert spill_file.read_text(encoding="utf-8") == full_output
+        assert text.startswith(full_output[:75])
+        assert f"truncated, full output in {spill_file} ...\n" in text
+        assert text.endswith(full_output[-25:])
+        assert response["result"] == {"status": True, "output": ""}
+
+
+class TestDisplay:
+    """Tests for showing the value of the last expression."""
+
+    def run_execute(self, code, user_globals=None, **settings):
+        import python_server
+        from testing_tools.rpc_stream import decode_messages
+
+        mock_stdout = io.BytesIO()
+        with mock.patch.multiple(python_server, STDOUT=mock.Mock(buffer=mock_stdout), **settings):
+            python_server.execute({"id": 1, "params": [code]}, user_globals or {})
+        return decode_messages(mock_stdout.getvalue())
+
+    @pytest.mark.parametrize(
+        "value",
+        [
+            [],
+            (1,),
+            {"a": [1, "x", (2, 3)], "b": {4, frozenset({5})}},
+            [1.5, None, True, b"bytes", frozenset()],
+        ],
+    )
+    def test_container_text_matches_print(self, value):
+        """Test that containers rendered item by item show what print shows."""
+        import python_server
+
+        assert python_server.format_text(value, 1000) == str(value)
+
+    def test_recursive_container_text(self):
+        import python_server
+
+        value = [1, {}]
+        value[1]["self"] = value
+        value.append(value)
+
+        assert python_server.format_text(value, 1000) == str(value)
+
+    def test_huge_container_rendered_up_to_limit(self):
+        """Test that a huge container is summarized without rendering all of its items."""
+        rendered = []
+
+        class Item:
+            def __repr__(self):
+                rendered.append(self)
+                return "item"
+
+        messages = self.run_execute(
+            "items", {"items": [Item() for _ in range(10000)]}, OUTPUT_MAX_CHARS=60
+        )
+
+        output = messages[0]["result"]["output"]
+        marker = "\n... list of 10000 items truncated ...\n"
+        expected = ("[" + ", ".join(["item"] * 20))[: 60 - len(marker)]
+        assert output == expected + marker
+        assert len(rendered) < 20
+
+    def test_display_not_limited_by_default(self):
+        """Test that the text of a large value is shown whole when no limit is configured."""
+        import python_server
+
+        messages = self.run_execute("value", {"value": list(range(200000))})
+
+        assert python_server.DISPLAY_FORMATTER.max_chars == 0
+        assert messages[0]["result"]["output"] == f"{list(range(200000))}\n"
+
+    def test_rich_display_renders_accepted_types(self):
+        """Test that only the representations of the accepted MIME types are rendered."""
+        import python_server
+
+        class Rich:
+            latex_calls = 0
+
+            def _repr_html_(self):
+                return "<b>rich</b>"
+
+            def _repr_png_(self):
+                return b"\x89PNG", {"width": 10}
+
+            def _repr_latex_(self):
+                Rich.latex_calls += 1
+                return "$rich$"
+
+            def __repr__(self):
+                return "Rich()"
+
+        formatter = python_server.DisplayFormatter(["text/plain", "text/html", "image/png"], 100)
+        with mock.patch.object(python_server, "DISPLAY_FORMATTER", formatter):
+            messages = self.run_execute(
+                "print('before')\nrich", {"Rich": Rich, "rich": Rich()}, RICH_DISPLAY=True
+            )
+
+        display, response = messages
+        assert display["method"] == "display"
+        assert display["params"] == {
+            "id": 1,
+            "data": {"text/html": "<b>rich</b>", "image/png": "iVBORw==", "text/plain": "Rich()"},
+            "metadata": {"image/png": {"width": 10}},
+        }
+        assert response["result"] == {"status": True, "output": "before\n"}
+        assert Rich.latex_calls == 0
+
+    def test_rich_display_omits_large_representations(self):
+        """Test that representations over the limit are left out, and the text is cut."""
+        import python_server
+
+        class Large:
+            def _repr_mimebundle_(self, include=None, exclude=None):  # noqa: ARG002
+                return {"text/html": "<p>" * 100, "text/plain": "x" * 100, "text/csv": "a,b"}
+
+        data, metadata = python_server.DisplayFormatter(["text/html"], 50).format(Large())
+
+        assert data == {"text/plain": "x" * 17 + "\n... 83 characters truncated ..."}
+        assert metadata == {"omitted": ["text/html"]}
+
+    def test_rich_display_ignores_made_up_attributes(self):
+        """Test that objects answering any attribute, like mocks, only show their text."""
+        import python_server
+
+        value = mock.Mock()
+        data, _ = python_server.DisplayFormatter(["text/html"], 1000).format(value)
+
+        assert data == {"text/plain": str(value)}
+
+
+class ChunkedStream:
+    """A binary stream that returns at most `chunk_size` bytes per read."""
+
+    def __init__(self, data, chunk_size):
+        self.data = memoryview(data)
+        self.chunk_size = chunk_size
+        self.reads = 0
+
+    def readinto1(self, buffer):
+        size = min(len(buffer), self.chunk_size, len(self.data))
+        buffer[:size] = self.data[:size]
+        self.data = self.data[size:]
+        self.reads += 1
+        return size
+
+
+def frame(message):
+    import json
+
+    body = json.dumps(message).encode()
+    return f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+
+
+class TestMessageFraming:
+    """Tests for the JSON codecs, and reading and writing framed messages."""
+
+    @pytest.mark.parametrize("codec_name", ["orjson", "ujson", "json"])
+    def test_codecs_round_trip(self, codec_name):
+        """Test that every codec reads what it writes, and falls back to json if missing."""
+        import python_server
+
+        codec = python_server.load_codec(codec_name)
+        message = {"jsonrpc": "2.0", "id": 1, "result": {"output": "\u00e9\udc80\n"}}
+
+        assert codec.name in (codec_name, "json")
+        assert codec.loads(memoryview(codec.dumps(message))) == message
+
+    def test_unknown_codec_falls_back_to_json(self):
+        import python_server
+
+        assert python_server.load_codec("missing").name == "json"
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+    def test_frames_read_from_reused_buffer(self, chunk_size):
+        """Test that messages split across reads or sharing a read are all decoded."""
+        import python_server
+
+        messages = [{"id": i, "params": ["x" * i * 10]} for i in range(20)]
+        data = b"".join(frame(message) for message in messages)
+        data += b"Content-Type: text/plain\r\n\r\n"
+        stream = ChunkedStream(data, chunk_size)
+        # The small buffer has to grow to hold the larger messages.
+        size = 32 if chunk_size < 4096 else python_server.READ_BUFFER_SIZE
+        reader = python_server.FrameReader(stream, python_server.load_codec("json"), size)
+
+        received = [reader.read_message() for _ in range(len(messages) + 1)]
+
+        assert received == [*messages, None]
+        with pytest.raises(EOFError):
+            reader.read_message()
+        if chunk_size == 4096:
+            assert stream.reads == 2
+
+    def test_batched_messages_written_at_once(self):
+        """Test that the messages sent in a batch are written with a single write."""
+        import python_server
+        from testing_tools.rpc_stream import decode_messages
+
+        mock_stdout = mock.Mock(buffer=io.BytesIO())
+        writes = []
+        mock_stdout.buffer.write = lambda data: writes.append(bytes(data))
+        with mock.patch.object(python_server, "STDOUT", mock_stdout):
+            with python_server.MESSAGE_WRITER.batch():
+                python_server.send_output(1, "stdout", "hello\n")
+                python_server.send_response("", 1)
+                assert writes == []
+            python_server.print_log("done")
+
+        assert len(writes) == 3
+        assert decode_messages(b"".join(writes)) == [
+            {
+                "jsonrpc": "2.0",
+                "method": "output",
+                "params": {"id": 1, "stream": "stdout", "text": "hello\n"},
+            },
+            {"jsonrpc": "2.0", "id": 1, "result": {"status": True, "output": ""}},
+            {"jsonrpc": "2.0", "method": "log", "params": "done"},
+        ]
+
+
+class ServerProcess:
+    """Run python_server.py in a subprocess and collect the messages it sends."""
+
+    def __init__(self, env=None):
+        import os
+        import pathlib
+        import subprocess
+        import sys
+        import threading
+
+        server_path = pathlib.Path(__file__).parent.parent / "python_server.py"
+        self.process = subprocess.Popen(
+            [sys.executable, str(server_path)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env={**os.environ, **(env or {})},
+        )
+        self.messages = []
+        self.received = threading.Condition()
+        threading.Thread(target=self.read, daemon=True).start()
+
+    def read(self):
+        from testing_tools.rpc_stream import RpcStreamDecoder
+
+        decoder = RpcStreamDecoder()
+        while True:
+            data = self.process.stdout.read1(65536)
+            if not data:
+                break
+            with self.received:
+                self.messages.extend(decoder.feed(data))
+                self.received.notify_all()
+
+    def send(self, **message):
+        import json
+
+        body = json.dumps({"jsonrpc": "2.0", **message}).encode()
+        self.process.stdin.write(f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        self.process.stdin.flush()
+
+    def wait_for(self, predicate, timeout=10):
+        with self.received:
+            assert self.received.wait_for(
+                lambda: any(predicate(message) for message in self.messages), timeout
+            ), self.messages
+            return next(message for message in self.messages if predicate(message))
+
+
+class TestThreadedServer:
+    """Tests for reading requests on a thread while user code runs on the main thread."""
+
+    def test_check_and_interrupt_while_code_runs(self, tmp_path):
+        """Test that syntax checks are answered and code is interrupted while it runs."""
+        import time
+
+        started_file = tmp_path / "started"
+        server = ServerProcess()
+        try:
+            server.send(
+                id=1,
+                method="execute",
+                params=[
+                    f"import pathlib, time\npathlib.Path({str(started_file)!r}).touch()\ntime.sleep(60)"
+                ],
+            )
+            deadline = time.monotonic() + 10
+            while not started_file.exists() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            server.send(id=2, method="check_valid_command", params=["x ="])
+            check = server.wait_for(lambda message: message.get("id") == 2)
+            assert check["result"]["output"] == "False"
+            assert not any(message.get("id") == 1 for message in server.messages)
+
+            server.send(method="interrupt")
+            execution = server.wait_for(lambda message: message.get("id") == 1)
+            assert execution["result"]["status"] is False
+            assert "KeyboardInterrupt" in execution["result"]["output"]
+
+            server.send(method="exit")
+            assert server.process.wait(10) == 0
+        finally:
+            server.process.kill()
+
+    def test_input_response_routed_to_running_code(self):
+        """Test that the response to an input request reaches the code that asked for it."""
+        server = ServerProcess()
+        try:
+            server.send(id=1, method="execute", params=["name = input('name? ')\nprint(name)"])
+            request = server.wait_for(lambda message: message.get("method") == "input")
+            assert request["params"] == {"prompt": "name? "}
+            server.send(id=request["id"], result={"userInput": "world"})
+            execution = server.wait_for(lambda message: message.get("id") == 1)
+            assert execution["result"] == {"status": True, "output": "world\n"}
+
+            server.process.stdin.close()
+            assert server.process.wait(10) == 0
+        finally:
+            server.process.kill()
+
+    def test_interrupt_after_execution_is_dropped(self):
+        """Test that SIGINT only raises KeyboardInterrupt while user code runs."""
+        import queue
+        import signal
+
+        import python_server
+
+        reader = python_server.RequestReader(queue.Queue())
+        with reader.execution(), pytest.raises(KeyboardInterrupt):
+            reader.handle_interrupt(signal.SIGINT, None)
+        # Late for the code that finished, e.g. while its response is sent.
+        assert reader.handle_interrupt(signal.SIGINT, None) is None
+
+
+class TestHistory:
+    """Tests for the history of executed inputs."""
+
+    def test_history_search_and_paging(self, tmp_path):
+        """Test that entries are found by their source, newest or slowest first, in pages."""
+        import python_server
+
+        history = python_server.HistoryStore(tmp_path / "history.sqlite")
+        for count, (source, duration) in enumerate(
+            [("x = 1", 0.1), ("print('100%')", 3.0), ("x_y = 2", 0.2), ("x + 1", 1.0)], 1
+        ):
+            assert history.record(source, 1000.0 + count, duration, count != 2) == count
+
+        newest = history.search(limit=2)
+        older = history.search(limit=2, before=newest[-1]["id"])
+
+        assert [entry["source"] for entry in newest + older] == [
+            "x + 1",
+            "x_y = 2",
+            "print('100%')",
+            "x = 1",
+        ]
+        assert newest[0]["executionCount"] == 4
+        assert [entry["source"] for entry in history.search("%")] == ["print('100%')"]
+        assert [entry["source"] for entry in history.search("x_")] == ["x_y = 2"]
+        slowest = history.search(slowest=True, limit=1)[0]
+        assert (slowest["duration"], slowest["status"]) == (3.0, False)
+        history.close()
+
+    def test_history_kept_across_sessions(self, tmp_path):
+        """Test that a new session appends to the history, and can search the previous one."""
+        import python_server
+
+        first = python_server.HistoryStore(tmp_path / "history.sqlite")
+        first.record("a = 1", 1.0, 0.1, True)  # noqa: FBT003
+        first.close()
+        second = python_server.HistoryStore(tmp_path / "history.sqlite")
+        second.record("b = 2", 2.0, 0.1, True)  # noqa: FBT003
+
+        assert [entry["source"] for entry in second.search()] == ["b = 2"]
+        all_entries = second.search(all_sessions=True)
+        assert [entry["source"] for entry in all_entries] == ["b = 2", "a = 1"]
+        assert [entry["executionCount"] for entry in all_entries] == [1, 1]
+        second.close()
+
+    def test_history_request(self, tmp_path):
+        """Test that executions are recorded and searched over JSON-RPC."""
+        server = ServerProcess({"PYTHON_SERVER_HISTORY_FILE": str(tmp_path / "history.sqlite")})
+        try:
+            server.send(id=1, method="execute", params=["value = 42"])
+            server.wait_for(lambda message: message.get("id") == 1)
+            server.send(id=2, method="execute", params=["1 / 0"])
+            server.wait_for(lambda message: message.get("id") == 2)
+            server.send(
+                id=3,
+                method="execute",
+                params=[
+                    "def __VSCODE_run_script():\n    return 1 / 2\nprint(__VSCODE_run_script())"
+                ],
+            )
+            server.wait_for(lambda message: message.get("id") == 3)
+            server.send(id=4, method="history", params={"query": "/"})
+
+            response = server.wait_for(lambda message: message.get("id") == 4)
+            (entry,) = response["result"]["entries"]
+            assert entry["source"] == "1 / 0"
+            assert entry["executionCount"] == 2
+            assert entry["status"] is False
+            assert entry["duration"] >= 0
+
+            server.send(method="exit")
+            assert server.process.wait(10) == 0
+        finally:
+            server.process.kill()
+
+
+class TestCompilePipeline:
+    """Tests for parsing and compiling user input once."""
+
+    def test_last_expression_value_printed(self):
+        """Test that the statements run first and the value of a last expression is printed."""
+        import python_server
+
+        user_globals = {}
+        output = io.StringIO()
+        with mock.patch("sys.stdout", output):
+            status = python_server.exec_user_input(["x = 40\nx + 2"], user_globals)
+
+        assert status is True
+        assert user_globals["x"] == 40
+        assert output.getvalue() == "42\n"
+
+    def test_source_parsed_once_for_check_and_execution(self):
+        """Test that a syntax check and the execution of the same source share one parse."""
+        import python_server
+
+        cache = python_server.CodeCache(size=2)
+        source = "value = 1"
+        with mock.patch.object(python_server, "CODE_CACHE", cache), mock.patch.object(
+            python_server, "send_response"
+        ) as send_response, mock.patch.object(
+            python_server, "compile_input", wraps=python_server.compile_input
+        ) as compile_input:
+            python_server.check_valid_command({"id": 1, "params": [source]})
+            python_server.check_valid_command({"id": 2, "params": ["value ="]})
+            python_server.exec_user_input(source, {})
+
+        assert [call.args[0] for call in send_response.call_args_list] == ["True", "False"]
+        assert compile_input.call_count == 2
+
+    def test_code_cache_drops_least_recently_used(self):
+        """Test that the cache keeps at most `size` entries."""
+        import python_server
+
+        cache = python_server.CodeCache(size=2)
+        first = cache.compile("1")
+        cache.compile("2")
+        assert cache.compile("1") is first
+        cache.compile("3")
+
+        assert cache.compile("1") is first
+        assert len(cache._entries) == 2  # noqa: SLF001
+
+    def test_compile_error_reported_when_run(self):
+        """Test that input which parses but does not compile counts as a complete command."""
+        import python_server
+
+        with mock.patch.object(python_server, "send_response") as send_response:
+            python_server.check_valid_command({"id": 1, "params": ["return 1"]})
+        output = io.StringIO()
+        with mock.patch("sys.stdout", output):
+            status = python_server.exec_user_input("return 1", {})
+
+        send_response.assert_called_once_with("True", 1)
+        assert status is False
+        assert "SyntaxError: 'return' outside function" in output.getvalue()
@@ -0,0 +1,25 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+import unittest
+
+# Test class for the test_repeated_tracebacks_sent_by_reference test.
+# Every test fails in setUp with the same traceback.
+
+
+def connect() -> None:
+    raise ConnectionError("database is not available " + "x" * 200)
+
+
+class CascadingFailure(unittest.TestCase):
+    def setUp(self) -> None:
+        connect()
+
+    def test_one(self) -> None:
+        pass
+
+    def test_two(self) -> None:
+        pass
+
+    def test_three(self) -> None:
+        pass
@@ -13,5 +13,9 @@ if __name__ == "__main__":
     args = sys.argv[1:]
     manage_py_path = args[0]
     test_ids = args[1:]
-    # currently doesn't support additional args past test_ids.
-    django_execution_runner(manage_py_path, test_ids, [])
+    # Arguments for `manage.py test` can follow the test ids after a "--".
+    django_args = []
+    if "--" in test_ids:
+        index = test_ids.index("--")
+        test_ids, django_args = test_ids[:index], test_ids[index + 1 :]
+    django_execution_runner(manage_py_path, test_ids, django_args)
@@ -328,6 +328,22 @@ def test_simple_django_collect():
         )
 
 
+def test_run_manage_py_in_process(tmp_path, capsys) -> None:
+    """Test that manage.py runs in this interpreter with its own argv and returns its exit code."""
+    from unittestadapter.django_handler import run_manage_py
+
+    manage_path = tmp_path / "manage.py"
+    manage_path.write_text(
+        "import os, sys\nprint(os.path.basename(__file__), sys.argv[1:])\nsys.exit(3)\n",
+        encoding="utf-8",
+    )
+    original_argv = sys.argv
+
+    assert run_manage_py(manage_path, [os.fspath(manage_path), "test", "app"]) == 3
+    assert sys.argv is original_argv
+    assert "manage.py ['test', 'app']" in capsys.readouterr().out
+
+
 def test_project_root_path_with_cwd_override() -> None:
     """Test unittest discovery with project_root_path parameter.
 
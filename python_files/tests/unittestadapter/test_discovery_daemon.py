@@ -0,0 +1,50 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+import os
+import pathlib
+import sys
+
+script_dir = pathlib.Path(__file__).parent.parent.parent
+sys.path.insert(0, os.fspath(script_dir))
+
+from unittestadapter.discovery_daemon import UnittestDiscoveryDaemon  # noqa: E402
+
+TEST_FILE_CONTENT = """import unittest
+
+
+class DaemonTests(unittest.TestCase):
+    def test_one(self):
+        pass
+"""
+
+
+def test_discovery_daemon_sends_changed_files_only(tmp_path):
+    (tmp_path / "test_udaemon_one.py").write_text(TEST_FILE_CONTENT, encoding="utf-8")
+    (tmp_path / "test_udaemon_two.py").write_text(TEST_FILE_CONTENT, encoding="utf-8")
+    sent = []
+    daemon = UnittestDiscoveryDaemon(
+        os.fspath(tmp_path),
+        "test*.py",
+        None,
+        "fake-pipe",
+        send=lambda payload, _pipe: sent.append(payload),
+    )
+    daemon.start()
+
+    assert len(sent) == 1
+    assert sent[0]["status"] == "success"
+    assert len(daemon.file_nodes) == 2
+
+    (tmp_path / "test_udaemon_one.py").write_text(
+        TEST_FILE_CONTENT + "\n    def test_added(self):\n        pass\n", encoding="utf-8"
+    )
+    (tmp_path / "test_udaemon_two.py").unlink()
+    payload = daemon.handle_changes(daemon.watcher.poll())  # type: ignore
+
+    assert payload is not None
+    assert payload["status"] == "success"
+    assert payload["removed"] == [os.fspath(tmp_path / "test_udaemon_two.py")]
+    assert len(payload["changed"]) == 1
+    (class_node,) = payload["changed"][0]["children"]
+    assert {test["name"] for test in class_node["children"]} == {"test_one", "test_added"}
@@ -1,8 +1,10 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 
+import json
 import os
 import pathlib
+import shutil
 import sys
 from typing import TYPE_CHECKING, Any, Dict, List, Optional
 from unittest.mock import patch
@@ -15,6 +17,7 @@ python_files_path = pathlib.Path(__file__).parent.parent.parent
 sys.path.insert(0, os.fspath(python_files_path))
 sys.path.insert(0, os.fspath(python_files_path / "lib" / "python"))
 
+from testing_tools.traceback_store import TracebackStore  # noqa: E402
 from tests.pytestadapter import helpers  # noqa: E402
 from unittestadapter.execution import run_tests  # noqa: E402
 
@@ -115,6 +118,33 @@ def test_subtest_run(mock_send_run_data) -> None:  # noqa: ARG001
         assert id_ in result
 
 
+def test_subtest_successes_batched(mock_send_run_data) -> None:
+    """Test that failed subtests are sent immediately and successful ones in a single message."""
+    os.environ["TEST_RUN_PIPE"] = "fake"
+    run_tests(
+        os.fspath(TEST_DATA_PATH),
+        ["test_subtest.NumbersTest.test_even"],
+        "test_subtest.py",
+        None,
+        1,
+        None,
+    )
+
+    sent = [call.args[0] for call in mock_send_run_data.call_args_list]
+    *failures, successes = sent
+    assert [list(results) for results in failures] == [
+        ["test_subtest.NumbersTest.test_even (i=1)"],
+        ["test_subtest.NumbersTest.test_even (i=3)"],
+        ["test_subtest.NumbersTest.test_even (i=5)"],
+    ]
+    assert list(successes) == [
+        "test_subtest.NumbersTest.test_even (i=0)",
+        "test_subtest.NumbersTest.test_even (i=2)",
+        "test_subtest.NumbersTest.test_even (i=4)",
+    ]
+    assert {result["outcome"] for result in successes.values()} == {"subtest-success"}
+
+
 @pytest.mark.parametrize(
     ("test_ids", "pattern", "cwd", "expected_outcome"),
     [
@@ -255,6 +285,38 @@ def test_failed_tests(mock_send_run_data):  # noqa: ARG001
     assert True
 
 
+def test_repeated_tracebacks_sent_by_reference(mock_send_run_data, tmp_path):  # noqa: ARG001
+    """Test that identical tracebacks are sent once and the first one is capped and spilled."""
+    os.environ["TEST_RUN_PIPE"] = "fake"
+    test_ids = [
+        "test_cascading_failure.CascadingFailure.test_one",
+        "test_cascading_failure.CascadingFailure.test_three",
+        "test_cascading_failure.CascadingFailure.test_two",
+    ]
+    store = TracebackStore(max_chars=200, spill_dir=tmp_path, dedup=True)
+    with patch("unittestadapter.execution.TRACEBACK_STORE", store):
+        actual = run_tests(
+            os.fspath(TEST_DATA_PATH),
+            test_ids,
+            "test_cascading_failure*",
+            None,
+            1,
+            None,
+        )
+    result = actual["result"]
+    assert result is not None
+    first, *repeated = (result[test_id] for test_id in test_ids)
+    assert all(item["outcome"] == "error" for item in result.values())
+    assert "characters truncated, full traceback in" in str(first["traceback"])
+    assert len(str(first["traceback"])) < 400
+    (spill_file,) = tmp_path.iterdir()
+    assert "ConnectionError: database is not available" in spill_file.read_text(encoding="utf-8")
+    for item in repeated:
+        assert item["traceback"] == (
+            f"Same traceback as {test_ids[0]} [traceback {spill_file.stem[len('traceback-') :]}]\n"
+        )
+
+
 def test_unknown_id(mock_send_run_data):  # noqa: ARG001
     """This test runs on a unknown test_id, therefore it should return an error as the outcome as it attempts to find the given test."""
     os.environ["TEST_RUN_PIPE"] = "fake"
@@ -343,6 +405,67 @@ def test_basic_run_django():
             assert id_result["outcome"] == "success"
 
 
+def test_django_keepdb_saves_migrations_hash(tmp_path):
+    """Test that DJANGO_KEEPDB_ENABLED records the migrations the kept test database was built with."""
+    data_path: pathlib.Path = TEST_DATA_PATH / "simple_django"
+    manage_py_path: str = os.fsdecode(data_path / "manage.py")
+    script_str = os.fsdecode(pathlib.Path(__file__).parent / "django_test_execution_script.py")
+    state_file = tmp_path / "keepdb-state.txt"
+    test_id = "polls.tests.QuestionModelTests.test_question_creation_and_retrieval"
+    env = {
+        "MANAGE_PY_PATH": manage_py_path,
+        "DJANGO_KEEPDB_ENABLED": "True",
+        "DJANGO_KEEPDB_STATE_FILE": os.fspath(state_file),
+    }
+
+    hashes = []
+    for _ in range(2):
+        actual = helpers.runner_with_cwd_env([script_str, manage_py_path, test_id], data_path, env)
+        assert actual
+        assert actual[0]["result"][test_id]["outcome"] == "success"
+        hashes.append(state_file.read_text(encoding="utf-8"))
+
+    assert len(hashes[0]) == 32
+    assert hashes[0] == hashes[1]
+
+
+def test_django_parallel_run(tmp_path):
+    """Test that results of parallel Django test workers are relayed with their tracebacks."""
+    data_path = tmp_path / "simple_django"
+    shutil.copytree(
+        TEST_DATA_PATH / "simple_django", data_path, ignore=shutil.ignore_patterns("db.sqlite3")
+    )
+    (data_path / "polls" / "test_parallel.py").write_text(
+        "from django.test import TestCase\n"
+        "from .models import Question\n\n"
+        "class FirstTests(TestCase):\n"
+        "    def test_empty(self):\n"
+        "        self.assertEqual(Question.objects.count(), 0)\n\n"
+        "class SecondTests(TestCase):\n"
+        "    def test_fail(self):\n"
+        "        self.assertEqual(Question.objects.count(), 1)\n",
+        encoding="utf-8",
+    )
+    manage_py_path = os.fsdecode(data_path / "manage.py")
+    script_str = os.fsdecode(pathlib.Path(__file__).parent / "django_test_execution_script.py")
+    test_ids = ["polls.test_parallel.FirstTests", "polls.test_parallel.SecondTests"]
+    actual = helpers.runner_with_cwd_env(
+        [script_str, manage_py_path, *test_ids, "--", "--parallel", "2"],
+        data_path,
+        {"MANAGE_PY_PATH": manage_py_path},
+    )
+    assert actual
+    result: Dict[str, Dict[str, Any]] = {}
+    for item in actual:
+        result.update(item["result"])
+    assert result["polls.test_parallel.FirstTests.test_empty"]["outcome"] == "success"
+    failure = result["polls.test_parallel.SecondTests.test_fail"]
+    assert failure["outcome"] == "failure"
+    assert "0 != 1" in failure["message"]
+    assert "test_parallel.py" in failure["traceback"]
+    assert "self.assertEqual(Question.objects.count(), 1)" in failure["traceback"]
+
+
 def test_project_root_path_with_cwd_override(mock_send_run_data) -> None:  # noqa: ARG001
     """Test unittest execution with project_root_path parameter.
 
@@ -472,3 +595,29 @@ def test_symlink_with_project_root_path(mock_send_run_data) -> None:  # noqa: AR
         assert actual["cwd"] == os.fsdecode(destination), (
             f"CWD does not match symlink path: expected {os.fsdecode(destination)}, got {actual['cwd']}"
         )
+
+
+def test_recorded_messages_read_back(tmp_path):
+    """Test that MESSAGE_RECORDING_FILE records every message of a unittest run once."""
+    from testing_tools.message_recorder import iter_recording
+
+    recording_file = tmp_path / "recording.gz"
+    execution_script = python_files_path / "unittestadapter" / "execution.py"
+    test_ids = [
+        "test_reverse.TestReverseFunctions.test_reverse_sentence",
+        "test_reverse.TestReverseFunctions.test_reverse_string",
+    ]
+
+    actual = helpers.runner_with_cwd_env(
+        [os.fsdecode(execution_script), "--udiscovery", "-s", ".", "-p", "*test*.py", *test_ids],
+        TEST_DATA_PATH / "coverage_ex",
+        {"MESSAGE_RECORDING_FILE": os.fspath(recording_file), "_TEST_VAR_UNITTEST": "True"},
+    )
+
+    assert actual
+    recording = list(iter_recording(recording_file))
+    assert [json.loads(data)["params"] for _, data in recording] == actual
+    results: Dict[str, Any] = {}
+    for payload in actual:
+        results.update(payload["result"] or {})
+    assert set(results) == set(test_ids)
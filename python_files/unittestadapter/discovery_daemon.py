@@ -0,0 +1,209 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+import contextlib
+import importlib
+import os
+import pathlib
+import sys
+import threading
+import traceback
+import unittest
+from typing import Callable, Dict, List, Optional, Tuple
+
+script_dir = pathlib.Path(__file__).parent
+sys.path.append(os.fspath(script_dir))
+sys.path.append(os.fspath(script_dir.parent))
+
+from testing_tools.file_watcher import FileChanges, PollingFileWatcher  # noqa: E402
+from unittestadapter.discovery import discover_tests  # noqa: E402
+from unittestadapter.pvsc_utils import (  # noqa: E402
+    DiscoveryPayloadDict,
+    DiscoveryUpdatePayloadDict,
+    TestNode,
+    VSCodeUnittestError,
+    build_test_tree,
+    parse_unittest_args,
+    send_post_request,
+)
+
+POLL_INTERVAL_SECONDS = 0.2
+
+
+def normalize_path(path: str) -> str:
+    return os.path.normcase(os.path.normpath(path))
+
+
+def get_file_nodes(node: TestNode) -> Dict[str, TestNode]:
+    """Return all file nodes in a test tree, keyed by their normalized path."""
+    if node["type_"] == "file":
+        return {normalize_path(node["path"]): node}
+    file_nodes: Dict[str, TestNode] = {}
+    for child in node["children"]:
+        if "children" in child:
+            file_nodes.update(get_file_nodes(child))  # type: ignore
+    return file_nodes
+
+
+class UnittestDiscoveryDaemon:
+    """Long-running unittest discovery that keeps the last test tree in memory.
+
+    After an initial full discovery, created and modified test files are loaded again on
+    their own, and only the changed file subtrees are sent over TEST_RUN_PIPE.
+    """
+
+    def __init__(
+        self,
+        start_dir: str,
+        pattern: str,
+        top_level_dir: Optional[str],
+        test_run_pipe: Optional[str],
+        project_root_path: Optional[str] = None,
+        send: Callable = send_post_request,
+    ):
+        self.start_dir = start_dir
+        self.pattern = pattern
+        self.top_level_dir = top_level_dir
+        self.test_run_pipe = test_run_pipe
+        self.project_root_path = project_root_path
+        self.cwd = os.path.abspath(project_root_path or start_dir)  # noqa: PTH100
+        self.send = send
+        self.file_nodes: Dict[str, TestNode] = {}
+        self.watcher: Optional[PollingFileWatcher] = None
+
+    @property
+    def top_level_path(self) -> str:
+        return os.path.abspath(self.top_level_dir or self.start_dir)  # noqa: PTH100
+
+    def start(self) -> DiscoveryPayloadDict:
+        """Run a full discovery, send the complete tree and start watching the start directory."""
+        payload = discover_tests(
+            self.start_dir,
+            self.pattern,
+            self.top_level_dir,
+            project_root_path=self.project_root_path,
+        )
+        tests = payload["tests"]
+        self.file_nodes = get_file_nodes(tests) if tests is not None else {}
+        self.send(payload, self.test_run_pipe)
+        if self.watcher is None:
+            self.watcher = PollingFileWatcher(os.path.abspath(self.start_dir), [self.pattern])  # noqa: PTH100
+        return payload
+
+    def get_module_name(self, path: str) -> Optional[str]:
+        """Return the importable module name of a test file, as unittest discovery would load it.
+
+        Returns None if the file is not inside a package reachable from the top level directory.
+        """
+        top_level_path = pathlib.Path(self.top_level_path)
+        try:
+            relative = pathlib.Path(path).relative_to(top_level_path)
+        except ValueError:
+            return None
+        folder = top_level_path
+        for part in relative.parts[:-1]:
+            folder = folder / part
+            if not (folder / "__init__.py").exists():
+                return None
+        return ".".join(relative.with_suffix("").parts)
+
+    def load_file(self, path: str) -> Tuple[Optional[TestNode], List[str]]:
+        """Import a single test file again and build its file node."""
+        module_name = self.get_module_name(path)
+        if module_name is None:
+            return None, []
+        sys.modules.pop(module_name, None)
+        importlib.invalidate_caches()
+        try:
+            suite = unittest.TestLoader().loadTestsFromName(module_name)
+            tree, errors = build_test_tree(suite, self.top_level_path)
+        except Exception:
+            return None, [traceback.format_exc()]
+        file_nodes = get_file_nodes(tree) if tree is not None else {}
+        return file_nodes.get(normalize_path(path)), errors
+
+    def handle_changes(self, changes: FileChanges) -> Optional[DiscoveryUpdatePayloadDict]:
+        """Load the changed files again and send the difference to the last sent tree."""
+        changed: List[TestNode] = []
+        removed: List[str] = []
+        errors: List[str] = []
+        for path in changes.deleted:
+            old_node = self.file_nodes.pop(normalize_path(path), None)
+            if old_node is not None:
+                removed.append(old_node["id_"])
+
+        for path in changes.changed:
+            key = normalize_path(path)
+            new_node, file_errors = self.load_file(path)
+            errors.extend(file_errors)
+            if new_node is not None:
+                if self.file_nodes.get(key) != new_node:
+                    self.file_nodes[key] = new_node
+                    changed.append(new_node)
+            elif not file_errors and key in self.file_nodes:
+                # The file no longer contains any tests.
+                removed.append(self.file_nodes.pop(key)["id_"])
+
+        if not (changed or removed or errors):
+            return None
+        payload: DiscoveryUpdatePayloadDict = {
+            "cwd": self.cwd,
+            "status": "error" if errors else "success",
+            "changed": changed,
+            "removed": removed,
+        }
+        if errors:
+            payload["error"] = errors
+        self.send(payload, self.test_run_pipe)
+        return payload
+
+    def serve_forever(self, stop: threading.Event, interval: float = POLL_INTERVAL_SECONDS) -> None:
+        """Poll the start directory for changes until the stop event is set."""
+        if self.watcher is None:
+            self.start()
+        while not stop.wait(interval):
+            changes = self.watcher.poll()  # type: ignore
+            if changes:
+                try:
+                    self.handle_changes(changes)
+                except Exception:
+                    print(
+                        f"UNITTEST ERROR: discovery daemon failed to process changes: {traceback.format_exc()}",
+                        file=sys.stderr,
+                    )
+
+
+if __name__ == "__main__":
+    # Get unittest discovery arguments.
+    argv = sys.argv[1:]
+    index = argv.index("--udiscovery")
+
+    (
+        start_dir,
+        pattern,
+        top_level_dir,
+        _verbosity,
+        _failfast,
+        _locals,
+    ) = parse_unittest_args(argv[index + 1 :])
+
+    test_run_pipe = os.getenv("TEST_RUN_PIPE")
+    if not test_run_pipe:
+        error_msg = (
+            "UNITTEST ERROR: TEST_RUN_PIPE is not set at the time of unittest trying to send data. "
+            "Please confirm this environment variable is not being changed or removed "
+            "as it is required for successful test discovery and execution."
+            f"TEST_RUN_PIPE = {test_run_pipe}\n"
+        )
+        print(error_msg, file=sys.stderr)
+        raise VSCodeUnittestError(error_msg)
+
+    project_root_path = os.environ.get("PROJECT_ROOT_PATH")
+    if project_root_path:
+        top_level_dir = project_root_path
+
+    daemon = UnittestDiscoveryDaemon(
+        start_dir, pattern, top_level_dir, test_run_pipe, project_root_path=project_root_path
+    )
+    with contextlib.suppress(KeyboardInterrupt):
+        daemon.serve_forever(threading.Event())
@@ -3,9 +3,8 @@
 
 import os
 import pathlib
-import subprocess
 import sys
-from contextlib import contextmanager, suppress
+from contextlib import contextmanager
 from typing import Generator, List
 
 script_dir = pathlib.Path(__file__).parent
@@ -28,42 +27,55 @@ def override_argv(argv: List[str]) -> Generator:
         sys.argv = original_argv
 
 
+def run_manage_py(manage_path: pathlib.Path, manage_argv: List[str]) -> int:
+    """Run manage.py in this interpreter and return its exit code.
+
+    Running manage.py with `exec` instead of in a subprocess avoids starting a second
+    interpreter, and its output is written straight to this process's stdout and stderr.
+    """
+    django_project_dir: pathlib.Path = manage_path.parent
+    sys.path.insert(0, os.fspath(django_project_dir))
+    print(f"Django project directory: {django_project_dir}")
+    print(f"Django manage.py arguments: {manage_argv}")
+
+    try:
+        with manage_path.open() as manage_file:
+            manage_code = manage_file.read()
+    except OSError as e:
+        raise VSCodeUnittestError("Error running Django, unable to read manage.py") from e
+
+    try:
+        with override_argv(manage_argv):
+            exec(manage_code, {"__name__": "__main__", "__file__": os.fspath(manage_path)})
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    return 0
+
+
 def django_discovery_runner(manage_py_path: str, args: List[str]) -> None:
+    manage_path: pathlib.Path = pathlib.Path(manage_py_path)
     # Attempt a small amount of validation on the manage.py path.
-    if not pathlib.Path(manage_py_path).exists():
+    if not manage_path.exists():
         raise VSCodeUnittestError("Error running Django, manage.py path does not exist.")
 
     try:
-        # Get path to the custom_test_runner.py parent folder, add to sys.path and new environment used for subprocess.
+        # Get path to the custom_test_runner.py parent folder, add to sys.path.
         custom_test_runner_dir = pathlib.Path(__file__).parent
         sys.path.insert(0, os.fspath(custom_test_runner_dir))
-        env = os.environ.copy()
-        if "PYTHONPATH" in env:
-            env["PYTHONPATH"] = os.fspath(custom_test_runner_dir) + os.pathsep + env["PYTHONPATH"]
-        else:
-            env["PYTHONPATH"] = os.fspath(custom_test_runner_dir)
-
-        # Build command to run 'python manage.py test'.
-        command = [
-            sys.executable,
-            manage_py_path,
+
+        manage_argv: List[str] = [
+            str(manage_path),
             "test",
             "--testrunner=django_test_runner.CustomDiscoveryTestRunner",
+            *args,
         ]
-        command.extend(args)
-        print("Running Django tests with command:", command)
-
-        subprocess_discovery = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            env=env,
-        )
-        print(subprocess_discovery.stderr, file=sys.stderr)
-        print(subprocess_discovery.stdout, file=sys.stdout)
+        returncode = run_manage_py(manage_path, manage_argv)
         # Zero return code indicates success, 1 indicates test failures, so both are considered successful.
-        if subprocess_discovery.returncode not in (0, 1):
-            error_msg = "Django test discovery process exited with non-zero error code See stderr above for more details."
+        if returncode not in (0, 1):
+            error_msg = "Django test discovery exited with non-zero error code See stderr above for more details."
             print(error_msg, file=sys.stderr)
     except Exception as e:
         raise VSCodeUnittestError(f"Error during Django discovery: {e}")  # noqa: B904
@@ -79,15 +91,6 @@ def django_execution_runner(manage_py_path: str, test_ids: List[str], args: List
         # Get path to the custom_test_runner.py parent folder, add to sys.path.
         custom_test_runner_dir: pathlib.Path = pathlib.Path(__file__).parent
         sys.path.insert(0, os.fspath(custom_test_runner_dir))
-        env: dict[str, str] = os.environ.copy()
-        if "PYTHONPATH" in env:
-            env["PYTHONPATH"] = os.fspath(custom_test_runner_dir) + os.pathsep + env["PYTHONPATH"]
-        else:
-            env["PYTHONPATH"] = os.fspath(custom_test_runner_dir)
-
-        django_project_dir: pathlib.Path = manage_path.parent
-        sys.path.insert(0, os.fspath(django_project_dir))
-        print(f"Django project directory: {django_project_dir}")
 
         manage_argv: List[str] = [
             str(manage_path),
@@ -96,16 +99,6 @@ def django_execution_runner(manage_py_path: str, test_ids: List[str], args: List
             *args,
             *test_ids,
         ]
-        print(f"Django manage.py arguments: {manage_argv}")
-
-        try:
-            argv_context = override_argv(manage_argv)
-            suppress_context = suppress(SystemExit)
-            manage_file = manage_path.open()
-            with argv_context, suppress_context, manage_file:
-                manage_code = manage_file.read()
-                exec(manage_code, {"__name__": "__main__", "__file__": manage_path})
-        except OSError as e:
-            raise VSCodeUnittestError("Error running Django, unable to read manage.py") from e
+        run_manage_py(manage_path, manage_argv)
     except Exception as e:
         print(f"Error during Django test execution: {e}", file=sys.stderr)
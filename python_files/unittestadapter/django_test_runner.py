@@ -1,16 +1,22 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 
+import hashlib
+import importlib.util
+import json
 import os
 import pathlib
+import pickle
 import sys
+import tempfile
+import traceback
 
 script_dir = pathlib.Path(__file__).parent.parent
 sys.path.append(os.fspath(script_dir))
 
 from typing import TYPE_CHECKING  # noqa: E402
 
-from execution import UnittestTestResult  # noqa: E402
+from execution import TRACEBACK_STORE, ErrorType, UnittestTestResult  # noqa: E402
 from pvsc_utils import (  # noqa: E402
     DiscoveryPayloadDict,
     VSCodeUnittestError,
@@ -19,7 +25,12 @@ from pvsc_utils import (  # noqa: E402
 )
 
 try:
-    from django.test.runner import DiscoverRunner
+    from django.test.runner import (
+        DiscoverRunner,
+        ParallelTestSuite,
+        RemoteTestResult,
+        RemoteTestRunner,
+    )
 except ImportError:
     raise ImportError(  # noqa: B904
         "Django module not found. Please only use the environment variable MANAGE_PY_PATH if you want to use Django."
@@ -29,6 +40,125 @@ except ImportError:
 if TYPE_CHECKING:
     import unittest
 
+# When enabled, the test databases are kept between runs and only rebuilt when the
+# migrations or the database settings change.
+KEEPDB_ENABLED = os.getenv("DJANGO_KEEPDB_ENABLED") == "True"
+
+
+def hash_migrations() -> str:
+    """Hash the database settings and the migration files of all installed apps."""
+    from django.apps import apps
+    from django.conf import settings
+    from django.db.migrations.loader import MigrationLoader
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(settings.DATABASES, sort_keys=True, default=str).encode())
+    for app_config in sorted(apps.get_app_configs(), key=lambda app: app.label):
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        if module_name is None:
+            continue
+        try:
+            spec = importlib.util.find_spec(module_name)
+        except (ImportError, ValueError):
+            spec = None
+        if spec is None or not spec.submodule_search_locations:
+            continue
+        for location in spec.submodule_search_locations:
+            for path in sorted(pathlib.Path(location).glob("*.py")):
+                digest.update(f"\0{app_config.label}/{path.name}\0".encode())
+                digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def get_keepdb_state_path() -> pathlib.Path:
+    """Return the file that stores the migrations hash of the kept test databases."""
+    state_file = os.getenv("DJANGO_KEEPDB_STATE_FILE")
+    if state_file:
+        return pathlib.Path(state_file)
+    project_key = f"{pathlib.Path.cwd()}\0{os.getenv('DJANGO_SETTINGS_MODULE', '')}"
+    name = hashlib.blake2b(project_key.encode(), digest_size=8).hexdigest()
+    return pathlib.Path(tempfile.gettempdir()) / f"vscode-django-keepdb-{name}.txt"
+
+
+class RelayedTestError(Exception):
+    """Stands in for an exception of a parallel worker that cannot be pickled."""
+
+
+def make_relayable(err: ErrorType) -> ErrorType:
+    """Return the error without its traceback, in a form that can be sent to the parent process."""
+    exc_type, exc_value, _ = err
+    try:
+        pickle.loads(pickle.dumps((exc_type, exc_value)))
+    except Exception:
+        summary = "".join(traceback.format_exception_only(exc_type, exc_value)).strip()
+        return RelayedTestError, RelayedTestError(summary), None  # type: ignore[return-value]
+    return exc_type, exc_value, None  # type: ignore[return-value]
+
+
+class WorkerTestResult(RemoteTestResult):
+    """Result of a parallel test worker that relays formatted tracebacks to the parent process.
+
+    Tracebacks cannot be pickled without tblib, so they are formatted in the worker and sent
+    as an `addRelayedTraceback` event ahead of the event of the error itself, which is sent
+    without its traceback.
+    """
+
+    def relay_error(self, test_id: str, err: ErrorType) -> ErrorType:
+        self.events.append(
+            (
+                "addRelayedTraceback",
+                self.test_index,
+                test_id,
+                "".join(traceback.format_exception(*err)),
+            )
+        )
+        return make_relayable(err)
+
+    def addError(self, test, err):  # noqa: N802
+        super().addError(test, self.relay_error(test.id(), err))
+
+    def addFailure(self, test, err):  # noqa: N802
+        super().addFailure(test, self.relay_error(test.id(), err))
+
+    def addSubTest(self, test, subtest, err):  # noqa: N802
+        if err is not None:
+            err = self.relay_error(subtest.id(), err)
+        super().addSubTest(test, subtest, err)
+
+    def addExpectedFailure(self, test, err):  # noqa: N802
+        super().addExpectedFailure(test, self.relay_error(test.id(), err))
+
+
+class WorkerTestRunner(RemoteTestRunner):
+    resultclass = WorkerTestResult
+
+
+class CustomParallelTestSuite(ParallelTestSuite):
+    """Run tests in worker processes that each use their own clone of the test databases.
+
+    The events of the workers are replayed on the result of the parent process, which is
+    the only process that sends results over TEST_RUN_PIPE.
+    """
+
+    runner_class = WorkerTestRunner
+
+
+class DjangoTestResult(UnittestTestResult):
+    """UnittestTestResult that uses the tracebacks relayed by parallel test workers."""
+
+    def __init__(self, *args, **kwargs):
+        self.relayed_tracebacks: dict[str, str] = {}
+        super().__init__(*args, **kwargs)
+
+    def addRelayedTraceback(self, test, test_id: str, text: str):  # noqa: ARG002, N802
+        self.relayed_tracebacks[test_id] = text
+
+    def format_traceback(self, test_id: str, error: ErrorType) -> str:
+        text = self.relayed_tracebacks.pop(test_id, None)
+        if text is None:
+            return super().format_traceback(test_id, error)
+        return TRACEBACK_STORE.process(test_id, text)
+
 
 class CustomDiscoveryTestRunner(DiscoverRunner):
     """Custom test runner for Django to handle test DISCOVERY and building the test tree."""
@@ -76,6 +206,42 @@ class CustomDiscoveryTestRunner(DiscoverRunner):
 class CustomExecutionTestRunner(DiscoverRunner):
     """Custom test runner for Django to handle test EXECUTION and uses UnittestTestResult to send dynamic run results."""
 
+    parallel_test_suite = CustomParallelTestSuite
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if KEEPDB_ENABLED:
+            self.keepdb = True
+
+    def setup_databases(self, **kwargs):
+        """Reuse the kept test databases, unless the migrations changed since they were built."""
+        if not KEEPDB_ENABLED:
+            return super().setup_databases(**kwargs)
+        state_path = get_keepdb_state_path()
+        migrations_hash = hash_migrations()
+        try:
+            previous_hash = state_path.read_text(encoding="utf-8").strip()
+        except OSError:
+            previous_hash = None
+
+        interactive = self.interactive
+        if previous_hash != migrations_hash:
+            print("Migrations changed since the test databases were built, rebuilding them.")
+            # Replace the existing test databases without asking for confirmation.
+            self.keepdb = False
+            self.interactive = False
+        try:
+            old_config = super().setup_databases(**kwargs)
+        finally:
+            # Keep the databases on teardown, also after a rebuild.
+            self.keepdb = True
+            self.interactive = interactive
+        try:
+            state_path.write_text(migrations_hash, encoding="utf-8")
+        except OSError as e:
+            print(f"Unable to save the migrations hash of the test databases: {e}", file=sys.stderr)
+        return old_config
+
     def get_test_runner_kwargs(self):
         """Override to provide custom test runner; resultclass."""
         test_run_pipe: str | None = os.getenv("TEST_RUN_PIPE")
@@ -90,6 +256,6 @@ class CustomExecutionTestRunner(DiscoverRunner):
             raise VSCodeUnittestError(error_msg)
         # Get existing kwargs
         kwargs = super().get_test_runner_kwargs()
-        # Add custom resultclass, same resultclass as used in unittest.
-        kwargs["resultclass"] = UnittestTestResult
+        # Add custom resultclass, based on the resultclass used in unittest.
+        kwargs["resultclass"] = DjangoTestResult
         return kwargs
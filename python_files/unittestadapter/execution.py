@@ -10,7 +10,7 @@ import sysconfig
 import traceback
 import unittest
 from types import TracebackType
-from typing import Dict, List, Optional, Set, Tuple, Type, Union
+from typing import Collection, Dict, List, Optional, Set, Tuple, Type, Union
 
 # Adds the scripts directory to the PATH as a workaround for enabling shell for test execution.
 path_var_name = "PATH" if "PATH" in os.environ else "Path"
@@ -23,6 +23,8 @@ sys.path.append(os.fspath(script_dir))
 
 from django_handler import django_execution_runner  # noqa: E402
 
+from testing_tools.id_selection import iter_test_ids  # noqa: E402
+from testing_tools.traceback_store import TracebackStore, hash_exception  # noqa: E402
 from unittestadapter.pvsc_utils import (  # noqa: E402
     CoveragePayloadDict,
     ExecutionPayloadDict,
@@ -39,6 +41,7 @@ START_DIR = ""
 # PROJECT_ROOT_PATH: Used for project-based testing to override cwd in payload
 # When set, this should be used as the cwd in all execution payloads
 PROJECT_ROOT_PATH = None  # type: Optional[str]
+TRACEBACK_STORE = TracebackStore.from_env()
 
 
 class TestOutcomeEnum(str, enum.Enum):
@@ -53,15 +56,38 @@ class TestOutcomeEnum(str, enum.Enum):
 
 
 class UnittestTestResult(unittest.TextTestResult):
+    """Send the result of every test over TEST_RUN_PIPE as soon as it is known.
+
+    Failed subtests are sent immediately. Successful subtests are held back and sent in
+    the same message as the result of their test, so the number of messages scales with
+    the number of tests rather than the number of subtests.
+    """
+
     def __init__(self, *args, **kwargs):
         self.formatted: Dict[str, Dict[str, Union[str, None]]] = {}
+        # Successful subtest results waiting for their test to finish, by test id.
+        self.pending_subtests: Dict[str, Dict[str, Dict[str, Union[str, None]]]] = {}
+        self.test_run_pipe = os.getenv("TEST_RUN_PIPE")
+        # Use PROJECT_ROOT_PATH if set (project-based testing), otherwise use START_DIR
+        self.cwd = os.path.abspath(PROJECT_ROOT_PATH or START_DIR)  # noqa: PTH100
         super().__init__(*args, **kwargs)
 
     def startTest(self, test: unittest.TestCase):  # noqa: N802
         super().startTest(test)
 
+    def stopTest(self, test: unittest.TestCase):  # noqa: N802
+        super().stopTest(test)
+        # Send the successful subtests of a test that did not report a result of its own,
+        # which is the case when one of its subtests failed.
+        pending = self.pending_subtests.pop(test.id(), None)
+        if pending:
+            self.send_results(pending)
+
     def stopTestRun(self):  # noqa: N802
         super().stopTestRun()
+        while self.pending_subtests:
+            _, pending = self.pending_subtests.popitem()
+            self.send_results(pending)
 
     def addError(  # noqa: N802
         self,
@@ -119,17 +145,14 @@ class UnittestTestResult(unittest.TextTestResult):
         tb = None
 
         message = ""
+        test_id = subtest.id() if subtest else test.id()
         # error is a tuple of the form returned by sys.exc_info(): (type, value, traceback).
         if error is not None:
             try:
                 message = f"{error[0]} {error[1]}"
             except Exception:
                 message = "Error occurred, unknown type or value"
-            formatted = traceback.format_exception(*error)
-            tb = "".join(formatted)
-            # Remove the 'Traceback (most recent call last)'
-            formatted = formatted[1:]
-        test_id = subtest.id() if subtest else test.id()
+            tb = self.format_traceback(test_id, error)
 
         result = {
             "test": test.id(),
@@ -139,20 +162,43 @@ class UnittestTestResult(unittest.TextTestResult):
             "subtest": subtest.id() if subtest else None,
         }
         self.formatted[test_id] = result
-        test_run_pipe = os.getenv("TEST_RUN_PIPE")
-        if not test_run_pipe:
+        if outcome == TestOutcomeEnum.subtest_success:
+            self.pending_subtests.setdefault(test.id(), {})[test_id] = result
+            return
+        results = {} if subtest else self.pending_subtests.pop(test.id(), {})
+        results[test_id] = result
+        self.send_results(results)
+
+    def format_traceback(self, test_id: str, error: ErrorType) -> str:
+        return format_traceback(test_id, error)
+
+    def send_results(self, results: Dict[str, Dict[str, Union[str, None]]]) -> None:
+        if not self.test_run_pipe:
             print(
                 "UNITTEST ERROR: TEST_RUN_PIPE is not set at the time of unittest trying to send data. "
-                f"TEST_RUN_PIPE = {test_run_pipe}\n",
+                f"TEST_RUN_PIPE = {self.test_run_pipe}\n",
                 file=sys.stderr,
             )
             raise VSCodeUnittestError(
                 "UNITTEST ERROR: TEST_RUN_PIPE is not set at the time of unittest trying to send data. "
             )
-        send_run_data(result, test_run_pipe)
+        send_run_data(results, self.test_run_pipe, self.cwd)
+
+
+def format_traceback(test_id: str, error: ErrorType) -> str:
+    """Format the traceback of a test error, or refer to an identical one sent before.
+
+    Identical errors are recognized by hashing the frames of the traceback, so the text
+    of a repeated traceback is never formatted again.
+    """
+    if not TRACEBACK_STORE.enabled:
+        return "".join(traceback.format_exception(*error))
+    return TRACEBACK_STORE.get_text(
+        test_id, hash_exception(*error), lambda: "".join(traceback.format_exception(*error))
+    )
 
 
-def filter_tests(suite: unittest.TestSuite, test_ids: List[str]) -> unittest.TestSuite:
+def filter_tests(suite: unittest.TestSuite, test_ids: Collection[str]) -> unittest.TestSuite:
     """Filter the tests in the suite to only run the ones with the given ids."""
     filtered_suite = unittest.TestSuite()
     for test in suite:
@@ -177,7 +223,7 @@ def get_all_test_ids(suite: unittest.TestSuite) -> List[str]:
 
 def find_missing_tests(test_ids: List[str], suite: unittest.TestSuite) -> List[str]:
     """Return a list of test ids that are not in the suite."""
-    all_test_ids = get_all_test_ids(suite)
+    all_test_ids = set(get_all_test_ids(suite))
     return [test_id for test_id in test_ids if test_id not in all_test_ids]
 
 
@@ -244,7 +290,7 @@ def run_tests(
         suite = loader.discover(start_dir, pattern, top_level_dir)
 
         # lets try to tailer our own suite so we can figure out running only the ones we want
-        tailor: unittest.TestSuite = filter_tests(suite, test_ids)
+        tailor: unittest.TestSuite = filter_tests(suite, set(test_ids))
 
         # If any tests are missing, add them to the payload.
         not_found = find_missing_tests(test_ids, tailor)
@@ -274,14 +320,18 @@ __socket = None
 atexit.register(lambda: __socket.close() if __socket else None)
 
 
-def send_run_data(raw_data, test_run_pipe):
-    status = raw_data["outcome"]
-    # Use PROJECT_ROOT_PATH if set (project-based testing), otherwise use START_DIR
-    cwd = os.path.abspath(PROJECT_ROOT_PATH or START_DIR)  # noqa: PTH100
-    test_id = raw_data["subtest"] or raw_data["test"]
-    test_dict = {}
-    test_dict[test_id] = raw_data
-    payload: ExecutionPayloadDict = {"cwd": cwd, "status": status, "result": test_dict}
+def send_run_data(
+    results: Dict[str, Dict[str, Union[str, None]]],
+    test_run_pipe: str,
+    cwd: Optional[str] = None,
+):
+    """Send the results of a test, and of its subtests, in one message."""
+    # The status of the message is the outcome of the last result, which is the test itself.
+    status = next(reversed(results.values()))["outcome"]
+    if cwd is None:
+        # Use PROJECT_ROOT_PATH if set (project-based testing), otherwise use START_DIR
+        cwd = os.path.abspath(PROJECT_ROOT_PATH or START_DIR)  # noqa: PTH100
+    payload: ExecutionPayloadDict = {"cwd": cwd, "status": status, "result": results}
     send_post_request(payload, test_run_pipe)
 
 
@@ -312,7 +362,7 @@ if __name__ == "__main__":
     try:
         # Read the test ids from the file, attempt to delete file afterwords.
         ids_path = pathlib.Path(run_test_ids_pipe)
-        test_ids = ids_path.read_text(encoding="utf-8").splitlines()
+        test_ids = list(iter_test_ids(ids_path))
         try:
             ids_path.unlink()
         except Exception as e:
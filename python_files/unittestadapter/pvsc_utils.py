@@ -19,6 +19,8 @@ sys.path.append(os.fspath(script_dir / "lib" / "python"))
 
 from typing_extensions import NotRequired  # noqa: E402
 
+from testing_tools.message_recorder import MessageRecorder  # noqa: E402
+
 # Types
 
 
@@ -66,6 +68,14 @@ class DiscoveryPayloadDict(TypedDict):
     error: NotRequired[List[str]]
 
 
+class DiscoveryUpdatePayloadDict(TypedDict):
+    cwd: str
+    status: Literal["success", "error"]
+    changed: List[TestNode]
+    removed: List[str]
+    error: NotRequired[List[str]]
+
+
 class ExecutionPayloadDict(TypedDict):
     cwd: str
     status: TestExecutionStatus
@@ -327,10 +337,17 @@ def parse_unittest_args(
 
 __writer = None
 atexit.register(lambda: __writer.close() if __writer else None)
+# Records every message sent when MESSAGE_RECORDING_FILE is set.
+MESSAGE_RECORDER = MessageRecorder.from_env()
 
 
 def send_post_request(
-    payload: Union[ExecutionPayloadDict, DiscoveryPayloadDict, CoveragePayloadDict],
+    payload: Union[
+        ExecutionPayloadDict,
+        DiscoveryPayloadDict,
+        DiscoveryUpdatePayloadDict,
+        CoveragePayloadDict,
+    ],
     test_run_pipe: Optional[str],
 ):
     """
@@ -366,6 +383,8 @@ def send_post_request(
         "params": payload,
     }
     data = json.dumps(rpc)
+    if MESSAGE_RECORDER:
+        MESSAGE_RECORDER.record(data)
     try:
         if __writer:
             request = (
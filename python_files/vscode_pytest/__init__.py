@@ -5,14 +5,17 @@ from __future__ import annotations
 
 import atexit
 import contextlib
+import hashlib
 import json
 import os
 import pathlib
 import sys
+import time
 import traceback
 from typing import (
     TYPE_CHECKING,
     Any,
+    BinaryIO,
     Dict,
     Generator,
     Literal,
@@ -23,11 +26,17 @@ from typing import (
 
 import pytest
 
+from testing_tools.message_recorder import MessageRecorder
+from testing_tools.traceback_store import TracebackStore, hash_exception
+
 if TYPE_CHECKING:
     from pluggy import Result
     from pytest_describe.plugin import DescribeBlock as DescribeBlockType
     from typing_extensions import NotRequired
 
+    from .captured_output import OutputCapture
+    from .profiling import PluginProfiler, ProfilingSummaryDict
+
 USES_PYTEST_DESCRIBE = False
 DescribeBlock: Any = None
 
@@ -96,6 +105,33 @@ PROJECT_ROOT_PATH = os.getenv(
 )  # Path to project root for multi-project workspaces
 SYMLINK_PATH = None
 INCLUDE_BRANCHES = False
+# When enabled, discovery sends only the subtrees that changed since the last sent tree.
+DISCOVERY_DIFF_ENABLED = os.getenv("DISCOVERY_DIFF_ENABLED") == "True"
+DISCOVERY_STATE_CACHE_KEY = "vscode_pytest/discovery_state"
+# Set by the discovery daemon while it collects in-process, it sends the trees itself.
+DISCOVERY_DAEMON_COLLECTING = False
+TEST_ID_FILTER_PLUGIN_NAME = "vscode_test_id_filter"
+SHARD_PLUGIN_NAME = "vscode_shard"
+# When sharding, every message is also written to this file in the format sent over the pipe.
+SHARD_OUTPUT: BinaryIO | None = None
+# Records every message sent when MESSAGE_RECORDING_FILE is set.
+MESSAGE_RECORDER = MessageRecorder.from_env()
+# When enabled, the captured output of each test is sent with its outcome.
+CAPTURED_OUTPUT_ENABLED = os.getenv("CAPTURED_OUTPUT_ENABLED") == "True"
+OUTPUT_CAPTURE: OutputCapture | None = None
+if CAPTURED_OUTPUT_ENABLED:
+    from .captured_output import OutputCapture
+
+    OUTPUT_CAPTURE = OutputCapture.from_env()
+# Deduplicates and caps tracebacks as configured by the TRACEBACK_* environment variables.
+TRACEBACK_STORE = TracebackStore.from_env()
+# When enabled, the plugin times its own hooks and sends a summary at the end of the session.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED") == "True"
+PROFILER: PluginProfiler | None = None
+if PROFILING_ENABLED:
+    from .profiling import PluginProfiler
+
+    PROFILER = PluginProfiler(os.getenv("PROFILING_TRACE_FILE"))
 
 # Performance optimization caches for path resolution
 _path_cache: dict[int, pathlib.Path] = {}  # Cache node paths by object id
@@ -117,6 +153,68 @@ def get_test_root_path() -> pathlib.Path:
     return pathlib.Path.cwd()
 
 
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("vscode_pytest")
+    group.addoption(
+        "--vscode-test-ids-file",
+        dest="vscode_test_ids_file",
+        default=None,
+        help="Path to a newline separated file of test ids. Only these tests are run, "
+        "the ids are applied as a filter after collection.",
+    )
+    group.addoption(
+        "--vscode-shard",
+        dest="vscode_shard",
+        default=os.getenv("VSCODE_SHARD"),
+        help="Run only shard i of N of the collected tests, given as i/N. The tests are "
+        "balanced across shards by their durations in earlier runs.",
+    )
+    group.addoption(
+        "--vscode-shard-output",
+        dest="vscode_shard_output",
+        default=os.getenv("VSCODE_SHARD_OUTPUT"),
+        help="Path of a file the results of this shard are written to, in the same JSON-RPC "
+        "format sent to the extension. Combine the files of all shards with "
+        "`python -m vscode_pytest.merge_shards`.",
+    )
+    group.addoption(
+        "--vscode-shard-durations",
+        dest="vscode_shard_durations",
+        default=os.getenv("VSCODE_SHARD_DURATIONS_FILE"),
+        help="Path of a JSON file mapping test node ids to durations in seconds, used instead "
+        "of the durations in the pytest cache to balance the shards.",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    test_ids_file = config.getoption("vscode_test_ids_file", None)
+    if test_ids_file:
+        from testing_tools.id_selection import iter_test_ids
+
+        config.pluginmanager.register(
+            TestIdFilter(set(iter_test_ids(test_ids_file))), TEST_ID_FILTER_PLUGIN_NAME
+        )
+    shard = config.getoption("vscode_shard", None)
+    if shard:
+        from .sharding import ShardPlugin, parse_shard
+
+        try:
+            shard_index, shard_count = parse_shard(shard)
+        except ValueError as e:
+            raise pytest.UsageError(str(e)) from e
+        config.pluginmanager.register(
+            ShardPlugin(shard_index, shard_count, config.getoption("vscode_shard_durations", None)),
+            SHARD_PLUGIN_NAME,
+        )
+    shard_output = config.getoption("vscode_shard_output", None)
+    if shard_output:
+        global SHARD_OUTPUT
+        # pytest-xdist workers append to the file created by the controller.
+        mode = "ab" if os.getenv("PYTEST_XDIST_WORKER") else "wb"
+        SHARD_OUTPUT = open(shard_output, mode)  # noqa: SIM115, PTH123
+        atexit.register(SHARD_OUTPUT.close)
+
+
 def pytest_load_initial_conftests(early_config, parser, args):  # noqa: ARG001
     has_pytest_cov = early_config.pluginmanager.hasplugin(
         "pytest_cov"
@@ -138,7 +236,10 @@ def pytest_load_initial_conftests(early_config, parser, args):  # noqa: ARG001
         "as it is required for successful test discovery and execution."
         f"TEST_RUN_PIPE = {TEST_RUN_PIPE}\n"
     )
-    if not TEST_RUN_PIPE:
+    writes_shard_output = os.getenv("VSCODE_SHARD_OUTPUT") or any(
+        arg.startswith("--vscode-shard-output") for arg in args
+    )
+    if not TEST_RUN_PIPE and not writes_shard_output:
         print(error_string, file=sys.stderr)
     if "--collect-only" in args:
         global IS_DISCOVERY
@@ -213,11 +314,13 @@ def pytest_exception_interact(node, call, report):
                 node_id,
                 report_value,
                 "Test failed with exception",
-                report.longreprtext,
+                get_traceback_text(node_id, call, report),
             )
+            cwd = pathlib.Path.cwd()
+            if OUTPUT_CAPTURE:
+                attach_captured_output(item_result, report.sections, os.fsdecode(cwd))
             collected_test = TestRunResultDict()
             collected_test[node_id] = item_result
-            cwd = pathlib.Path.cwd()
             send_execution_message(
                 os.fsdecode(cwd),
                 "success",
@@ -225,6 +328,22 @@ def pytest_exception_interact(node, call, report):
             )
 
 
+def get_traceback_text(test_id: str, call: pytest.CallInfo, report: pytest.TestReport) -> str:
+    """Return the traceback of a failed test, or a reference to an identical one sent before.
+
+    Identical errors are recognized by hashing the frames of the exception, so the report of
+    a repeated error is never rendered to text again.
+    """
+    if not TRACEBACK_STORE.enabled or call.excinfo is None:
+        return report.longreprtext
+    excinfo = call.excinfo
+    return TRACEBACK_STORE.get_text(
+        test_id,
+        hash_exception(excinfo.type, excinfo.value, excinfo.tb),
+        lambda: report.longreprtext,
+    )
+
+
 def has_symlink_parent(current_path):
     """Recursively checks if any parent directories of the given path are symbolic links."""
     # Convert the current path to an absolute Path object
@@ -277,6 +396,11 @@ class TestOutcome(Dict):
     message: str | None
     traceback: str | None
     subtest: str | None
+    # Only set when CAPTURED_OUTPUT_ENABLED is set and the test captured output.
+    output: NotRequired[str | None]
+    output_chunks: NotRequired[int]
+    output_size: NotRequired[int]
+    output_file: NotRequired[str | None]
 
 
 def create_test_outcome(
@@ -296,6 +420,38 @@ def create_test_outcome(
     )
 
 
+def attach_captured_output(
+    test_outcome: TestOutcome, sections: list[tuple[str, str]], cwd: str
+) -> None:
+    """Attach the captured output of a test to its outcome.
+
+    Output longer than one chunk is sent in `TestOutputPayloadDict` messages ahead of the
+    outcome, which then only records the number of chunks.
+    """
+    if OUTPUT_CAPTURE is None:
+        return
+    captured = OUTPUT_CAPTURE.collect(test_outcome["test"], sections)
+    if captured is None:
+        return
+    for index, chunk in enumerate(captured.chunks):
+        send_message(
+            TestOutputPayloadDict(
+                cwd=cwd,
+                status="success",
+                output={
+                    "test": test_outcome["test"],
+                    "index": index,
+                    "count": len(captured.chunks),
+                    "data": chunk,
+                },
+            )
+        )
+    test_outcome["output"] = captured.inline
+    test_outcome["output_chunks"] = len(captured.chunks)
+    test_outcome["output_size"] = captured.size
+    test_outcome["output_file"] = captured.spill_file
+
+
 class TestRunResultDict(Dict[str, Dict[str, TestOutcome]]):
     """A class that stores all test run results."""
 
@@ -313,6 +469,7 @@ def pytest_report_teststatus(report, config):  # noqa: ARG001
     report -- the report on the test setup, call, and teardown.
     config -- configuration object.
     """
+    profile_start = time.perf_counter_ns() if PROFILER else 0
     cwd = pathlib.Path.cwd()
     if SYMLINK_PATH:
         cwd = SYMLINK_PATH
@@ -325,7 +482,6 @@ def pytest_report_teststatus(report, config):  # noqa: ARG001
             report_value = "success"
         elif report.failed:
             report_value = "failure"
-            message = report.longreprtext
         try:
             node_path = map_id_to_path[report.nodeid]
         except KeyError:
@@ -334,12 +490,16 @@ def pytest_report_teststatus(report, config):  # noqa: ARG001
         absolute_node_id = get_absolute_test_id(report.nodeid, node_path)
         if absolute_node_id not in collected_tests_so_far:
             collected_tests_so_far.add(absolute_node_id)
+            if report.failed:
+                message = TRACEBACK_STORE.process(absolute_node_id, report.longreprtext)
             item_result = create_test_outcome(
                 absolute_node_id,
                 report_value,
                 message,
                 traceback,
             )
+            if OUTPUT_CAPTURE:
+                attach_captured_output(item_result, report.sections, os.fsdecode(cwd))
             collected_test = TestRunResultDict()
             collected_test[absolute_node_id] = item_result
             send_execution_message(
@@ -347,9 +507,61 @@ def pytest_report_teststatus(report, config):  # noqa: ARG001
                 "success",
                 collected_test or None,
             )
+    if PROFILER:
+        PROFILER.record("pytest_report_teststatus", profile_start)
     yield
 
 
+def absolute_id_path(test_id: str) -> str:
+    """Make the path part of a test id absolute, relative to the invocation directory like pytest."""
+    test_path, separator, selector = test_id.partition("::")
+    if os.path.isabs(test_path):  # noqa: PTH117
+        return test_id
+    absolute_path = os.path.normpath(os.path.join(os.getcwd(), test_path))  # noqa: PTH109, PTH118
+    return f"{absolute_path}{separator}{selector}"
+
+
+class TestIdFilter:
+    """A pytest plugin that keeps only the collected items selected by their absolute test id.
+
+    The ids are looked up in a set, so filtering is linear in the number of collected items
+    instead of pytest resolving every id as a separate command line argument. An id can
+    select a single test, a parameterized function, a class or a whole file.
+    """
+
+    __test__ = False
+
+    def __init__(self, test_ids: set[str]):
+        self.test_ids = {absolute_id_path(test_id) for test_id in test_ids}
+
+    def is_selected(self, absolute_test_id: str) -> bool:
+        if absolute_test_id in self.test_ids:
+            return True
+        # Check the parents of the test: the function of a parameterized test, its classes and file.
+        # The file path may contain "[" itself, the parameters start at the first "[" after it.
+        path, separator, names = absolute_test_id.partition("::")
+        parent_id = path + separator + names.split("[", 1)[0]
+        while True:
+            if parent_id in self.test_ids:
+                return True
+            if "::" not in parent_id:
+                return False
+            parent_id = parent_id.rsplit("::", 1)[0]
+
+    def pytest_collection_modifyitems(self, config: pytest.Config, items: list[pytest.Item]):
+        selected: list[pytest.Item] = []
+        deselected: list[pytest.Item] = []
+        for item in items:
+            absolute_test_id = get_absolute_test_id(item.nodeid, get_node_path(item))
+            if self.is_selected(absolute_test_id):
+                selected.append(item)
+            else:
+                deselected.append(item)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+
 ERROR_MESSAGE_CONST = {
     2: "Pytest was unable to start or run any tests due to issues with test discovery or test collection.",
     3: "Pytest was interrupted by the user, for example by pressing Ctrl+C during test execution.",
@@ -360,6 +572,7 @@ ERROR_MESSAGE_CONST = {
 
 @pytest.hookimpl(hookwrapper=True, trylast=True)
 def pytest_runtest_protocol(item, nextitem):  # noqa: ARG001
+    profile_start = time.perf_counter_ns() if PROFILER else 0
     map_id_to_path[item.nodeid] = get_node_path(item)
     skipped = check_skipped_wrapper(item)
     if skipped:
@@ -381,6 +594,8 @@ def pytest_runtest_protocol(item, nextitem):  # noqa: ARG001
                 "success",
                 collected_test or None,
             )
+    if PROFILER:
+        PROFILER.record("pytest_runtest_protocol", profile_start)
     yield
 
 
@@ -440,6 +655,8 @@ def pytest_sessionfinish(session, exitstatus):
     Exit code 4: pytest command line usage error
     Exit code 5: No tests were collected
     """
+    if DISCOVERY_DAEMON_COLLECTING:
+        return
     # Get the root path for the test tree structure (not the CWD for test execution)
     # This is PROJECT_ROOT_PATH in project-based mode, or cwd in legacy mode
     test_root_path = get_test_root_path()
@@ -464,7 +681,11 @@ def pytest_sessionfinish(session, exitstatus):
                     "Something went wrong following pytest finish, \
                         no session node was created"
                 )
-            send_discovery_message(os.fsdecode(test_root_path), session_node)
+            send_discovery_message(
+                os.fsdecode(test_root_path),
+                session_node,
+                getattr(session.config, "cache", None),
+            )
         except Exception as e:
             ERRORS.append(
                 f"Error Occurred, traceback: {(traceback.format_exc() if e.__traceback__ else '')}"
@@ -496,6 +717,7 @@ def pytest_sessionfinish(session, exitstatus):
     # send coverage if enabled
     is_coverage_run = os.environ.get("COVERAGE_ENABLED")
     if is_coverage_run == "True":
+        profile_start = time.perf_counter_ns() if PROFILER else 0
         # load the report and build the json result to return
         import coverage
 
@@ -578,6 +800,17 @@ def pytest_sessionfinish(session, exitstatus):
             error=None,
         )
         send_message(payload)
+        if PROFILER:
+            PROFILER.record("coverage", profile_start)
+
+    if PROFILER:
+        write_profiling_trace()
+        # Every discovery payload that is not an error removes the error node of a failed
+        # discovery in the extension, so the summary is only sent with test runs.
+        if not IS_DISCOVERY:
+            send_profiling_message(
+                os.fsdecode(test_root_path), "success" if exitstatus in (0, 1) else "error"
+            )
 
 
 def construct_nested_folders(
@@ -704,6 +937,7 @@ def build_test_tree(session: pytest.Session) -> TestNode:
     Returns:
     TestNode -- The root node of the constructed test tree.
     """
+    profile_start = time.perf_counter_ns() if PROFILER else 0
     session_node = create_session_node(session)
     session_children_dict: dict[str, TestNode] = {}
     file_nodes_dict: dict[str, TestNode] = {}
@@ -781,6 +1015,8 @@ def build_test_tree(session: pytest.Session) -> TestNode:
     )
     session_node["children"] = Children(session_children_dict)
 
+    if PROFILER:
+        PROFILER.record("build_test_tree", profile_start)
     return session_node
 
 
@@ -968,6 +1204,45 @@ class CompactDiscoveryPayloadDict(DiscoveryPayloadDict):
     payloadVersion: int
     pathBase: str
     idBase: str
+    version: NotRequired[int]
+
+
+class DiscoveryNodeUpdateDict(TypedDict):
+    """A subtree that was added or replaced, together with the id of its parent node."""
+
+    parentId: str | None
+    node: dict[str, Any]
+
+
+class DiscoveryDiffPayloadDict(TypedDict):
+    """A discovery payload that only contains the subtrees that changed since `baseVersion`.
+
+    It has no `tests` key, which an extension without diff support would read as "no tests".
+    """
+
+    cwd: str
+    status: Literal["success", "error"]
+    error: list[str] | None
+    payloadVersion: int
+    pathBase: str
+    idBase: str
+    baseVersion: int
+    version: int
+    added: list[DiscoveryNodeUpdateDict]
+    changed: list[DiscoveryNodeUpdateDict]
+    removed: list[str]
+
+
+class DiscoveryUpdatePayloadDict(TypedDict):
+    """A dictionary that is used to send incremental discovery updates for changed files."""
+
+    cwd: str
+    status: Literal["success", "error"]
+    changed: list[dict[str, Any]]
+    removed: list[str]
+    pathBase: str
+    idBase: str
+    error: list[str] | None
 
 
 class ExecutionPayloadDict(Dict):
@@ -989,6 +1264,29 @@ class CoveragePayloadDict(Dict):
     error: str | None  # Currently unused need to check
 
 
+class TestOutputChunkDict(TypedDict):
+    test: str
+    index: int
+    count: int
+    data: str
+
+
+class TestOutputPayloadDict(TypedDict):
+    """A dictionary that is used to send one chunk of the captured output of a test."""
+
+    cwd: str
+    status: Literal["success", "error"]
+    output: TestOutputChunkDict
+
+
+class ProfilingPayloadDict(TypedDict):
+    """A dictionary that is used to send the profiling summary of the plugin at session end."""
+
+    cwd: str
+    status: Literal["success", "error"]
+    profiling: ProfilingSummaryDict
+
+
 def cached_fsdecode(path: pathlib.Path) -> str:
     """Convert path to string with caching for performance.
 
@@ -1006,6 +1304,18 @@ def cached_fsdecode(path: pathlib.Path) -> str:
     return _path_to_str_cache[path]
 
 
+def clear_path_caches() -> None:
+    """Clear the node path caches so that a new pytest session can be collected in-process.
+
+    The node path cache is keyed by object id, which can be reused once the nodes of a
+    previous session have been garbage collected.
+    """
+    global _CACHED_CWD
+    _path_cache.clear()
+    _path_to_str_cache.clear()
+    _CACHED_CWD = None
+
+
 def compact_path(path: pathlib.Path | str, path_base: pathlib.Path) -> str:
     """Return path relative to path_base when possible without resolving symlinks."""
     current_path = pathlib.Path(path)
@@ -1071,6 +1381,111 @@ def create_compact_discovery_payload(
     )
 
 
+def hash_discovery_node(node: dict[str, Any], index: dict[str, dict[str, Any]]) -> str:
+    """Hash a compact discovery node and all of its children, recording each node in the index.
+
+    Every index entry holds the hash of the whole subtree, the hash of the node's own fields
+    and the ids of its children, which is all that is needed to diff against the next tree.
+    """
+    children: list[dict[str, Any]] = node.get("children", [])
+    child_hashes = [hash_discovery_node(child, index) for child in children]
+    own_fields = {key: value for key, value in node.items() if key != "children"}
+    own_hash = hashlib.blake2b(
+        json.dumps(own_fields, sort_keys=True).encode("utf-8"), digest_size=8
+    ).hexdigest()
+    subtree_hash = hashlib.blake2b(
+        "".join([own_hash, *child_hashes]).encode("utf-8"), digest_size=8
+    ).hexdigest()
+    index[node["id_"]] = {
+        "hash": subtree_hash,
+        "own": own_hash,
+        "children": [child["id_"] for child in children],
+    }
+    return subtree_hash
+
+
+def diff_discovery_node(
+    node: dict[str, Any],
+    parent_id: str | None,
+    old_index: dict[str, dict[str, Any]],
+    new_index: dict[str, dict[str, Any]],
+    payload: DiscoveryDiffPayloadDict,
+) -> None:
+    """Add the differences between a node and its previously sent version to the payload."""
+    old_entry = old_index.get(node["id_"])
+    new_entry = new_index[node["id_"]]
+    if old_entry is None:
+        payload["added"].append({"parentId": parent_id, "node": node})
+    elif old_entry["hash"] == new_entry["hash"]:
+        return
+    elif old_entry["own"] != new_entry["own"]:
+        payload["changed"].append({"parentId": parent_id, "node": node})
+    else:
+        child_ids = set(new_entry["children"])
+        payload["removed"].extend(
+            child_id for child_id in old_entry["children"] if child_id not in child_ids
+        )
+        for child in node.get("children", []):
+            diff_discovery_node(child, node["id_"], old_index, new_index, payload)
+
+
+def get_discovery_state_key(path_base: str) -> str:
+    """Return the pytest cache key of the last tree sent for the tests under `path_base`."""
+    return (
+        DISCOVERY_STATE_CACHE_KEY
+        + "/"
+        + hashlib.blake2b(path_base.encode("utf-8"), digest_size=8).hexdigest()
+    )
+
+
+def create_discovery_diff_payload(
+    payload: CompactDiscoveryPayloadDict, cache: Any
+) -> tuple[CompactDiscoveryPayloadDict | DiscoveryDiffPayloadDict, dict[str, Any] | None]:
+    """Turn a compact discovery payload into a diff against the last tree sent for this root.
+
+    The last sent tree is remembered as an index of node hashes in the pytest cache. The
+    extension passes the version of the tree it holds in DISCOVERY_BASE_VERSION; when that
+    does not match the stored version, the full tree is sent instead.
+
+    Returns the payload and the state to store under `get_discovery_state_key` once the
+    payload was sent, or None if there is nothing to store.
+    """
+    tests = cast("dict[str, Any] | None", payload["tests"])
+    if tests is None:
+        return payload, None
+    state: dict[str, Any] = cache.get(get_discovery_state_key(payload["pathBase"]), None) or {}
+    new_index: dict[str, dict[str, Any]] = {}
+    hash_discovery_node(tests, new_index)
+    base_version: int = state.get("version", 0)
+    version = base_version + 1
+    new_state = {"version": version, "nodes": new_index}
+
+    old_index: dict[str, dict[str, Any]] = state.get("nodes", {})
+    if (
+        not old_index
+        or os.getenv("DISCOVERY_BASE_VERSION") != str(base_version)
+        or tests["id_"] not in old_index
+    ):
+        payload["version"] = version
+        return payload, new_state
+
+    diff_payload = DiscoveryDiffPayloadDict(
+        cwd=payload["cwd"],
+        status=payload["status"],
+        error=payload["error"],
+        payloadVersion=3,
+        pathBase=payload["pathBase"],
+        idBase=payload["idBase"],
+        baseVersion=base_version,
+        version=version,
+        added=[],
+        changed=[],
+        removed=[],
+    )
+    diff_discovery_node(tests, None, old_index, new_index, diff_payload)
+    return diff_payload, new_state
+
+
 def get_node_path(
     node: pytest.Session
     | pytest.Item
@@ -1161,28 +1576,70 @@ def send_execution_message(
     send_message(payload)
 
 
-def send_discovery_message(cwd: str, session_node: TestNode) -> None:
+def send_discovery_message(cwd: str, session_node: TestNode, cache: Any = None) -> None:
     """
     Sends a POST request with test session details in payload.
 
     Args:
         cwd (str): Current working directory.
         session_node (TestNode): Node information of the test session.
+        cache (pytest.Cache | None): Cache used to remember the last sent tree when
+            DISCOVERY_DIFF_ENABLED is set.
     """
-    payload = create_compact_discovery_payload(cwd, session_node)
+    payload: CompactDiscoveryPayloadDict | DiscoveryDiffPayloadDict = (
+        create_compact_discovery_payload(cwd, session_node)
+    )
+    state = None
+    if DISCOVERY_DIFF_ENABLED and cache is not None:
+        payload, state = create_discovery_diff_payload(payload, cache)
+    # Only a tree the extension received can be the base of the next diff.
+    if send_message(payload) and state is not None:
+        cache.set(get_discovery_state_key(payload["pathBase"]), state)
+
+
+def write_profiling_trace() -> None:
+    """Write the Chrome trace of the profiler if PROFILING_TRACE_FILE is set."""
+    if PROFILER is None:
+        return
+    try:
+        trace_path = PROFILER.write_chrome_trace()
+    except OSError as error:
+        print(f"Plugin error[vscode-pytest]: unable to write profiling trace: {error}")
+    else:
+        if trace_path is not None:
+            print(f"Plugin info[vscode-pytest]: profiling trace written to {trace_path}")
+
+
+def send_profiling_message(cwd: str, status: Literal["success", "error"]) -> None:
+    """Send the profiling summary with the status of the test run."""
+    if PROFILER is None:
+        return
+    payload: ProfilingPayloadDict = {
+        "cwd": cwd,
+        "status": status,
+        "profiling": PROFILER.summary(),
+    }
     send_message(payload)
 
 
 def send_message(
-    payload: ExecutionPayloadDict | DiscoveryPayloadDict | CoveragePayloadDict,
-):
+    payload: ExecutionPayloadDict
+    | DiscoveryPayloadDict
+    | DiscoveryUpdatePayloadDict
+    | CoveragePayloadDict
+    | ProfilingPayloadDict
+    | TestOutputPayloadDict,
+) -> bool:
     """
     Sends a post request to the server.
 
     Keyword arguments:
     payload -- the payload data to be sent.
+
+    Returns whether the message was written to the pipe, or to the shard output file.
     """
-    if not TEST_RUN_PIPE:
+    profile_start = time.perf_counter_ns() if PROFILER else 0
+    if not TEST_RUN_PIPE and SHARD_OUTPUT is None:
         error_msg = (
             "PYTEST ERROR: TEST_RUN_PIPE is not set at the time of pytest starting. "
             "Please confirm this environment variable is not being changed or removed "
@@ -1194,7 +1651,7 @@ def send_message(
 
     global __writer
 
-    if __writer is None:
+    if __writer is None and TEST_RUN_PIPE:
         try:
             __writer = open(TEST_RUN_PIPE, "wb")  # noqa: SIM115, PTH123
         except Exception as error:
@@ -1214,28 +1671,38 @@ def send_message(
         "params": payload,
     }
     data = json.dumps(rpc)
+    request = f"""content-length: {len(data)}\r\ncontent-type: application/json\r\n\r\n{data}"""
+    encoded = request.encode("utf-8")
+    if MESSAGE_RECORDER:
+        MESSAGE_RECORDER.record(data)
+    if SHARD_OUTPUT is not None:
+        # Write each message at once, so the messages of pytest-xdist workers do not interleave.
+        SHARD_OUTPUT.write(encoded)
+        SHARD_OUTPUT.flush()
     try:
         if __writer:
-            request = (
-                f"""content-length: {len(data)}\r\ncontent-type: application/json\r\n\r\n{data}"""
-            )
             size = 4096
-            encoded = request.encode("utf-8")
             bytes_written = 0
             while bytes_written < len(encoded):
                 segment = encoded[bytes_written : bytes_written + size]
                 bytes_written += __writer.write(segment)
                 __writer.flush()
-        else:
+            if PROFILER:
+                PROFILER.record("send_message", profile_start)
+                PROFILER.record_message(len(encoded))
+        elif TEST_RUN_PIPE:
             print(
                 f"Plugin error connection error[vscode-pytest], writer is None \n[vscode-pytest] data: \n{data} \n",
                 file=sys.stderr,
             )
+            return False
     except Exception as error:
         print(
             f"Plugin error, exception thrown while attempting to send data[vscode-pytest]: {error} \n[vscode-pytest] data: \n{data}\n",
             file=sys.stderr,
         )
+        return False
+    return True
 
 
 class DeferPlugin:
@@ -1245,7 +1712,13 @@ class DeferPlugin:
     ) -> Generator[None, Result[int], None]:
         """Determine how many workers to use based on how many tests were selected in the test explorer."""
         outcome = yield
-        result = min(outcome.get_result(), len(config.option.file_or_dir))
+        test_id_filter = config.pluginmanager.get_plugin(TEST_ID_FILTER_PLUGIN_NAME)
+        selected_count = (
+            len(test_id_filter.test_ids)
+            if test_id_filter is not None
+            else len(config.option.file_or_dir)
+        )
+        result = min(outcome.get_result(), selected_count)
         if result == 1:
             result = 0
         outcome.force_result(result)
@@ -0,0 +1,98 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+from __future__ import annotations
+
+import hashlib
+import os
+import pathlib
+import tempfile
+from typing import Iterable, NamedTuple
+
+DEFAULT_CHUNK_CHARS = 64 * 1024
+DEFAULT_MAX_CHARS = 1024 * 1024
+
+
+class CapturedOutput(NamedTuple):
+    """The captured output of one test, ready to be sent with its outcome.
+
+    Output that fits into one chunk is sent `inline` with the outcome. Longer output is
+    split into `chunks` which are sent as separate messages before the outcome. When the
+    output is longer than the per-test limit, only its head is sent and the full text is
+    written to `spill_file`.
+    """
+
+    inline: str | None
+    chunks: list[str]
+    size: int
+    spill_file: str | None
+
+
+def format_sections(sections: Iterable[tuple[str, str]]) -> str:
+    """Join the sections of a pytest report, such as "Captured stdout call", into one text."""
+    parts: list[str] = []
+    for title, content in sections:
+        if content:
+            parts.append(f"----- {title} -----\n{content}")
+            if not content.endswith("\n"):
+                parts.append("\n")
+    return "".join(parts)
+
+
+def get_env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value and value.isdigit() and int(value) > 0 else default
+
+
+class OutputCapture:
+    """Split the captured output of tests into bounded chunks and spill huge logs to files."""
+
+    def __init__(
+        self,
+        chunk_chars: int = DEFAULT_CHUNK_CHARS,
+        max_chars: int = DEFAULT_MAX_CHARS,
+        spill_dir: str | os.PathLike[str] | None = None,
+    ):
+        self.chunk_chars = chunk_chars
+        self.max_chars = max_chars
+        self.spill_dir = pathlib.Path(spill_dir) if spill_dir else None
+
+    @classmethod
+    def from_env(cls) -> OutputCapture:
+        """Create an output capture configured by the CAPTURED_OUTPUT_* environment variables."""
+        return cls(
+            chunk_chars=get_env_int("CAPTURED_OUTPUT_CHUNK_CHARS", DEFAULT_CHUNK_CHARS),
+            max_chars=get_env_int("CAPTURED_OUTPUT_MAX_CHARS", DEFAULT_MAX_CHARS),
+            spill_dir=os.getenv("CAPTURED_OUTPUT_SPILL_DIR"),
+        )
+
+    def collect(self, test_id: str, sections: Iterable[tuple[str, str]]) -> CapturedOutput | None:
+        """Return the captured output of a test, or None if nothing was captured."""
+        text = format_sections(sections)
+        if not text:
+            return None
+        size = len(text)
+        spill_file = None
+        if size > self.max_chars:
+            spill_file = self.spill(test_id, text)
+            location = f", full output in {spill_file}" if spill_file else ""
+            text = f"{text[: self.max_chars]}\n... {size - self.max_chars} characters truncated{location} ...\n"
+        if len(text) <= self.chunk_chars:
+            return CapturedOutput(text, [], size, spill_file)
+        chunks = [
+            text[start : start + self.chunk_chars]
+            for start in range(0, len(text), self.chunk_chars)
+        ]
+        return CapturedOutput(None, chunks, size, spill_file)
+
+    def spill(self, test_id: str, text: str) -> str | None:
+        """Write the full output of a test to the spill directory and return the file path."""
+        name = hashlib.blake2b(test_id.encode("utf-8", "surrogatepass"), digest_size=8).hexdigest()
+        try:
+            if self.spill_dir is None:
+                self.spill_dir = pathlib.Path(tempfile.mkdtemp(prefix="vscode-test-output-"))
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            spill_file = self.spill_dir / f"output-{name}.txt"
+            spill_file.write_text(text, encoding="utf-8", errors="surrogateescape")
+        except OSError:
+            return None
+        return os.fspath(spill_file)
@@ -0,0 +1,247 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+from __future__ import annotations
+
+import contextlib
+import os
+import pathlib
+import sys
+import threading
+import traceback
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+
+script_dir = pathlib.Path(__file__).parent.parent
+sys.path.append(os.fspath(script_dir))
+sys.path.append(os.fspath(script_dir / "lib" / "python"))
+
+import vscode_pytest  # noqa: E402
+from testing_tools.file_watcher import FileChanges, PollingFileWatcher  # noqa: E402
+
+if TYPE_CHECKING:
+    from vscode_pytest import DiscoveryUpdatePayloadDict, TestNode
+
+# Changes to these files can affect every test in the workspace, so they trigger a full rediscovery.
+CONFIG_FILE_NAMES = (
+    "conftest.py",
+    "pytest.ini",
+    ".pytest.ini",
+    "pyproject.toml",
+    "tox.ini",
+    "setup.cfg",
+)
+POLL_INTERVAL_SECONDS = 0.2
+
+
+class CollectionRecorder:
+    """A pytest plugin object that records the test tree of an in-process collection.
+
+    When `targets` is set, collection is restricted to those files and the directories
+    leading to them, so that a changed file can be collected again without walking the
+    rest of the workspace.
+    """
+
+    def __init__(self, targets: set[pathlib.Path] | None = None):
+        self.targets = targets
+        self.target_parents: set[pathlib.Path] = set()
+        for target in targets or ():
+            self.target_parents.update(target.parents)
+        self.tree: TestNode | None = None
+        self.errors: list[str] = []
+        self.failed_paths: set[pathlib.Path] = set()
+        self.python_files: list[str] = []
+        self.rootpath: pathlib.Path | None = None
+
+    def pytest_configure(self, config: pytest.Config) -> None:
+        self.python_files = list(config.getini("python_files"))
+        self.rootpath = config.rootpath
+
+    def pytest_ignore_collect(self, collection_path: pathlib.Path) -> bool | None:
+        if self.targets is None:
+            return None
+        if collection_path in self.targets or collection_path in self.target_parents:
+            return None
+        return True
+
+    def pytest_collectreport(self, report: pytest.CollectReport) -> None:
+        if report.failed:
+            self.errors.append(report.longreprtext)
+            if self.rootpath is not None:
+                self.failed_paths.add(self.rootpath / report.nodeid.split("::")[0])
+
+    def pytest_collection_finish(self, session: pytest.Session) -> None:
+        self.tree = vscode_pytest.build_test_tree(session)
+
+
+def get_file_nodes(node: TestNode) -> dict[str, TestNode]:
+    """Return all file nodes in a test tree, keyed by their absolute path."""
+    if node["type_"] == "file":
+        return {os.fspath(node["path"]): node}
+    file_nodes: dict[str, TestNode] = {}
+    for child in node["children"].values():
+        if "children" in child:
+            file_nodes.update(get_file_nodes(child))  # type: ignore[arg-type]
+    return file_nodes
+
+
+def evict_modules(paths: list[str]) -> None:
+    """Remove the modules loaded from the given files so that they are imported again."""
+    targets = {os.path.normcase(os.path.abspath(path)) for path in paths}  # noqa: PTH100
+    for name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None)
+        if module_file and os.path.normcase(os.path.abspath(module_file)) in targets:  # noqa: PTH100
+            del sys.modules[name]
+
+
+def evict_workspace_modules(root: str | os.PathLike[str]) -> None:
+    """Remove every conftest and every module loaded from under `root` from sys.modules.
+
+    Modules of the adapter itself, and of the installed packages of an environment inside
+    the workspace, such as pytest in a `.venv`, are kept.
+    """
+    root_path = os.path.normcase(os.path.abspath(root))  # noqa: PTH100
+    kept = tuple(
+        os.path.normcase(os.path.abspath(path)) + os.sep  # noqa: PTH100
+        for path in {os.fspath(script_dir), sys.prefix, sys.base_prefix, sys.exec_prefix}
+    )
+    for name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None)
+        if not module_file:
+            continue
+        module_path = os.path.normcase(os.path.abspath(module_file))  # noqa: PTH100
+        if module_path.startswith(kept) or "site-packages" in pathlib.PurePath(module_path).parts:
+            continue
+        if name.rpartition(".")[2] == "conftest" or module_path.startswith(root_path + os.sep):
+            del sys.modules[name]
+
+
+class PytestDiscoveryDaemon:
+    """Long-running pytest discovery that keeps the last test tree in memory.
+
+    After an initial full discovery, file system changes are collected again one file at a
+    time in the same interpreter, and only the changed file subtrees are sent over
+    TEST_RUN_PIPE as a `DiscoveryUpdatePayloadDict`.
+    """
+
+    def __init__(
+        self,
+        args: list[str],
+        send_message: Callable[[Any], None] = vscode_pytest.send_message,
+    ):
+        self.args = [arg for arg in args if arg != "--collect-only"]
+        self.send_message = send_message
+        self.file_nodes: dict[str, dict[str, Any]] = {}
+        self.path_base = vscode_pytest.get_test_root_path()
+        self.watcher: PollingFileWatcher | None = None
+
+    def collect(self, targets: list[str] | None = None) -> CollectionRecorder:
+        """Run pytest collection in-process, optionally restricted to the target files."""
+        recorder = CollectionRecorder(
+            {pathlib.Path(target) for target in targets} if targets is not None else None
+        )
+        vscode_pytest.clear_path_caches()
+        # The args of a regular discovery load the plugin, whose own payload of a partial
+        # collection would replace the whole tree.
+        vscode_pytest.DISCOVERY_DAEMON_COLLECTING = True
+        try:
+            pytest.main(["--collect-only", "-q", *self.args], plugins=[recorder])
+        except Exception:
+            recorder.errors.append(traceback.format_exc())
+        finally:
+            vscode_pytest.DISCOVERY_DAEMON_COLLECTING = False
+        return recorder
+
+    def compact(self, node: TestNode) -> dict[str, Any]:
+        return vscode_pytest.compact_test_node(node, self.path_base, self.path_base)  # type: ignore[return-value]
+
+    def start(self) -> None:
+        """Run a full discovery, send the complete tree and start watching the workspace."""
+        recorder = self.collect()
+        cwd = os.fsdecode(vscode_pytest.get_test_root_path())
+        vscode_pytest.ERRORS.clear()
+        vscode_pytest.ERRORS.extend(recorder.errors)
+        if recorder.tree is None:
+            self.file_nodes = {}
+        else:
+            self.path_base = pathlib.Path(recorder.tree["path"])
+            self.file_nodes = {
+                path: self.compact(node) for path, node in get_file_nodes(recorder.tree).items()
+            }
+            self.send_message(vscode_pytest.create_compact_discovery_payload(cwd, recorder.tree))
+        if self.watcher is None:
+            patterns = [*(recorder.python_files or ["test_*.py", "*_test.py"]), *CONFIG_FILE_NAMES]
+            self.watcher = PollingFileWatcher(recorder.rootpath or self.path_base, patterns)
+
+    def handle_changes(self, changes: FileChanges) -> DiscoveryUpdatePayloadDict | None:
+        """Collect the changed files again and send the difference to the last sent tree."""
+        all_paths = changes.changed + changes.deleted
+        if any(pathlib.Path(path).name in CONFIG_FILE_NAMES for path in all_paths):
+            # pytest runs in this process, conftests and test modules cached from the last
+            # collection would hide the change.
+            evict_workspace_modules(self.watcher.root if self.watcher else self.path_base)
+            self.start()
+            return None
+
+        changed: list[dict[str, Any]] = []
+        removed: list[str] = []
+        errors: list[str] = []
+        for path in changes.deleted:
+            old_node = self.file_nodes.pop(path, None)
+            if old_node is not None:
+                removed.append(old_node["id_"])
+
+        if changes.changed:
+            evict_modules(list(changes.changed))
+            recorder = self.collect(list(changes.changed))
+            errors = recorder.errors
+            new_file_nodes = get_file_nodes(recorder.tree) if recorder.tree else {}
+            for path in changes.changed:
+                new_node = new_file_nodes.get(path)
+                if new_node is not None:
+                    compact_node = self.compact(new_node)
+                    if self.file_nodes.get(path) != compact_node:
+                        self.file_nodes[path] = compact_node
+                        changed.append(compact_node)
+                elif pathlib.Path(path) not in recorder.failed_paths and path in self.file_nodes:
+                    # The file no longer contains any tests.
+                    removed.append(self.file_nodes.pop(path)["id_"])
+
+        if not (changed or removed or errors):
+            return None
+        payload: DiscoveryUpdatePayloadDict = {
+            "cwd": os.fsdecode(vscode_pytest.get_test_root_path()),
+            "status": "error" if errors else "success",
+            "changed": changed,
+            "removed": removed,
+            "pathBase": os.fspath(self.path_base),
+            "idBase": os.fspath(self.path_base),
+            "error": errors or None,
+        }
+        self.send_message(payload)
+        return payload
+
+    def serve_forever(self, stop: threading.Event, interval: float = POLL_INTERVAL_SECONDS) -> None:
+        """Poll the workspace for changes until the stop event is set."""
+        if self.watcher is None:
+            self.start()
+        while not stop.wait(interval):
+            changes = self.watcher.poll()  # type: ignore[union-attr]
+            if changes:
+                try:
+                    self.handle_changes(changes)
+                except Exception:
+                    print(
+                        f"Plugin error[vscode-pytest]: discovery daemon failed to process changes: {traceback.format_exc()}",
+                        file=sys.stderr,
+                    )
+
+
+# This script runs the discovery daemon. It is started with the same args as a regular
+# discovery run and keeps running until it is stopped by the extension.
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.getcwd())  # noqa: PTH109
+    daemon = PytestDiscoveryDaemon(sys.argv[1:])
+    with contextlib.suppress(KeyboardInterrupt):
+        daemon.serve_forever(threading.Event())
@@ -0,0 +1,104 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Combine the result files written by the shards of a `--vscode-shard` run.
+
+    python -m vscode_pytest.merge_shards shard-1.jsonrpc shard-2.jsonrpc -o results.jsonrpc
+
+The output holds one execution payload with the results of all shards and, when the shards
+ran with coverage, one coverage payload, in the JSON-RPC format sent to the extension.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import sys
+from typing import Any, Iterator, Sequence
+
+from testing_tools.rpc_stream import decode_messages
+
+
+def iter_messages(data: bytes) -> Iterator[dict[str, Any]]:
+    """Yield the params of every content-length framed JSON-RPC message in `data`."""
+    for message in decode_messages(data):
+        yield message["params"]
+
+
+def merge_coverage(merged: dict[str, dict[str, Any]], coverage: dict[str, dict[str, Any]]) -> None:
+    """Add the file coverage of one shard to the coverage merged so far.
+
+    A line is covered if any shard covered it. Only branch counts are reported, so the
+    merged branch counts are those of the shard that took the most branches.
+    """
+    for file, info in coverage.items():
+        current = merged.get(file)
+        if current is None:
+            merged[file] = dict(info)
+            continue
+        covered = set(current["lines_covered"]) | set(info["lines_covered"])
+        missed = (set(current["lines_missed"]) | set(info["lines_missed"])) - covered
+        current["lines_covered"] = sorted(covered)
+        current["lines_missed"] = sorted(missed)
+        if info["executed_branches"] > current["executed_branches"]:
+            current["executed_branches"] = info["executed_branches"]
+        current["total_branches"] = max(current["total_branches"], info["total_branches"])
+
+
+def merge_shards(messages: Iterator[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Merge the messages of all shards into one execution and one coverage payload."""
+    execution: dict[str, Any] | None = None
+    coverage: dict[str, Any] | None = None
+    for payload in messages:
+        if payload.get("coverage"):
+            if coverage is None:
+                coverage = {"coverage": True, "cwd": payload["cwd"], "result": {}, "error": None}
+            merge_coverage(coverage["result"], payload.get("result") or {})
+        elif "result" in payload:
+            if execution is None:
+                execution = {
+                    "cwd": payload["cwd"],
+                    "status": "success",
+                    "result": {},
+                    "not_found": None,
+                    "error": None,
+                }
+            execution["result"].update(payload["result"] or {})
+            if payload.get("status") == "error":
+                execution["status"] = "error"
+            errors = payload.get("error")
+            if errors:
+                execution["error"] = [
+                    *(execution["error"] or []),
+                    *(errors if isinstance(errors, list) else [errors]),
+                ]
+    return [payload for payload in (execution, coverage) if payload is not None]
+
+
+def format_message(payload: dict[str, Any]) -> bytes:
+    data = json.dumps({"jsonrpc": "2.0", "params": payload})
+    return f"content-length: {len(data)}\r\ncontent-type: application/json\r\n\r\n{data}".encode()
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+", type=pathlib.Path, help="Result files of the shards.")
+    parser.add_argument(
+        "-o", "--output", type=pathlib.Path, help="File to write to, defaults to stdout."
+    )
+    args = parser.parse_args(argv)
+
+    def iter_all_messages() -> Iterator[dict[str, Any]]:
+        for file in args.files:
+            yield from iter_messages(file.read_bytes())
+
+    output = b"".join(format_message(payload) for payload in merge_shards(iter_all_messages()))
+    if args.output:
+        args.output.write_bytes(output)
+    else:
+        sys.stdout.buffer.write(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
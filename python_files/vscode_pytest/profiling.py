@@ -0,0 +1,105 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import threading
+import time
+from typing import Any, TypedDict
+
+
+class HookTimingDict(TypedDict):
+    calls: int
+    totalMs: float
+    maxMs: float
+
+
+class ProfilingSummaryDict(TypedDict):
+    pid: int
+    wallTimeMs: float
+    messages: int
+    bytesSent: int
+    hooks: dict[str, HookTimingDict]
+
+
+class PluginProfiler:
+    """Cheap counters for the time the plugin spends in its own hooks.
+
+    Callers take a `time.perf_counter_ns()` timestamp and pass it to `record` when the
+    measured section ends. Times are inclusive: a hook that sends a message also contains
+    the time of `send_message`. When `trace_file` is set, every measured section is kept
+    as well and written as Chrome trace events, which can be opened in `chrome://tracing`
+    or https://ui.perfetto.dev.
+    """
+
+    def __init__(self, trace_file: str | None = None):
+        self.trace_file = trace_file
+        self.start_ns = time.perf_counter_ns()
+        # name -> [calls, total_ns, max_ns]
+        self.timings: dict[str, list[int]] = {}
+        self.messages = 0
+        self.bytes_sent = 0
+        self.trace_events: list[tuple[str, int, int, int]] | None = [] if trace_file else None
+
+    def record(self, name: str, start_ns: int) -> None:
+        """Record a section named `name` that started at `start_ns` and ends now."""
+        duration = time.perf_counter_ns() - start_ns
+        timing = self.timings.get(name)
+        if timing is None:
+            self.timings[name] = [1, duration, duration]
+        else:
+            timing[0] += 1
+            timing[1] += duration
+            if duration > timing[2]:
+                timing[2] = duration
+        if self.trace_events is not None:
+            self.trace_events.append((name, start_ns, duration, threading.get_ident()))
+
+    def record_message(self, size: int) -> None:
+        """Count a message of `size` bytes sent over the pipe."""
+        self.messages += 1
+        self.bytes_sent += size
+
+    def summary(self) -> ProfilingSummaryDict:
+        return {
+            "pid": os.getpid(),
+            "wallTimeMs": (time.perf_counter_ns() - self.start_ns) / 1e6,
+            "messages": self.messages,
+            "bytesSent": self.bytes_sent,
+            "hooks": {
+                name: {"calls": calls, "totalMs": total / 1e6, "maxMs": longest / 1e6}
+                for name, (calls, total, longest) in self.timings.items()
+            },
+        }
+
+    def get_trace_path(self) -> pathlib.Path | None:
+        if not self.trace_file:
+            return None
+        path = pathlib.Path(self.trace_file)
+        # Every pytest-xdist worker profiles itself, keep their traces apart.
+        worker = os.getenv("PYTEST_XDIST_WORKER")
+        return path.with_name(f"{path.stem}-{worker}{path.suffix}") if worker else path
+
+    def write_chrome_trace(self) -> pathlib.Path | None:
+        """Write the recorded sections in the Chrome trace event format and return the path."""
+        path = self.get_trace_path()
+        if path is None or self.trace_events is None:
+            return None
+        pid = os.getpid()
+        events: list[dict[str, Any]] = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.start_ns) / 1e3,
+                "dur": duration / 1e3,
+                "pid": pid,
+                "tid": tid,
+            }
+            for name, start, duration, tid in self.trace_events
+        ]
+        path.write_text(
+            json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}), encoding="utf-8"
+        )
+        return path
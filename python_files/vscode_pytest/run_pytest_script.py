@@ -17,6 +17,8 @@ script_dir = pathlib.Path(__file__).parent.parent
 sys.path.append(os.fspath(script_dir))
 sys.path.append(os.fspath(script_dir / "lib" / "python"))
 
+from testing_tools.id_selection import get_id_file_path, iter_test_ids  # noqa: E402
+
 
 def run_pytest(args):
     arg_array = ["-p", "vscode_pytest", *args]
@@ -53,13 +55,17 @@ if __name__ == "__main__":
     if run_test_ids_pipe:
         ids_path = pathlib.Path(run_test_ids_pipe)
         try:
-            # Read the test ids from the file and run pytest.
-            ids = ids_path.read_text(encoding="utf-8").splitlines()
+            # Collect the files of the selected tests, each file is collected once.
+            id_files = list(
+                dict.fromkeys(get_id_file_path(test_id) for test_id in iter_test_ids(ids_path))
+            )
         except Exception as e:
             print("Error[vscode-pytest]: unable to read testIds from temp file" + str(e))
             run_pytest(args)
         else:
-            arg_array = ["-p", "vscode_pytest", *args, *ids]
+            # The plugin reads the ids itself and deselects everything else after collection.
+            ids_arg = [f"--vscode-test-ids-file={ids_path}"] if id_files else []
+            arg_array = ["-p", "vscode_pytest", *ids_arg, *args, *id_files]
             print("Running pytest with args: " + str(arg_array))
             pytest.main(arg_array)
         finally:
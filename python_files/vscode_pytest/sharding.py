@@ -0,0 +1,120 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+from __future__ import annotations
+
+import heapq
+import json
+import os
+import pathlib
+from typing import Any, Mapping, Sequence
+
+import pytest
+
+DURATIONS_CACHE_KEY = "vscode_pytest/durations"
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse a shard given as "i/N", where i is the 1-based index of the shard out of N."""
+    index, separator, count = value.partition("/")
+    if not separator or not index.strip().isdigit() or not count.strip().isdigit():
+        raise ValueError(f"Invalid shard {value!r}, expected the form i/N, for example 1/4.")
+    shard_index, shard_count = int(index), int(count)
+    if not 1 <= shard_index <= shard_count:
+        raise ValueError(f"Invalid shard {value!r}, i must be between 1 and N.")
+    return shard_index, shard_count
+
+
+def assign_shards(
+    test_ids: Sequence[str], durations: Mapping[str, float], shard_count: int
+) -> list[int]:
+    """Return the 0-based shard of every test, balancing the shards by the test durations.
+
+    Tests without a known duration weigh as much as the average known test. The longest
+    tests are placed first, each on the shard with the least total duration so far. The
+    result only depends on the test ids and durations, so every machine that collects the
+    same tests with the same durations agrees on the partition.
+    """
+    known = [durations[test_id] for test_id in test_ids if test_id in durations]
+    default_weight = sum(known) / len(known) if known else 1.0
+    weights = [durations.get(test_id, default_weight) for test_id in test_ids]
+    order = sorted(range(len(test_ids)), key=lambda i: (-weights[i], test_ids[i]))
+
+    shards = [0] * len(test_ids)
+    # (total duration, shard index) of every shard, the least loaded shard on top.
+    totals = [(0.0, shard) for shard in range(shard_count)]
+    for i in order:
+        total, shard = heapq.heappop(totals)
+        shards[i] = shard
+        heapq.heappush(totals, (total + weights[i], shard))
+    return shards
+
+
+def load_durations(config: pytest.Config, durations_file: str | None) -> dict[str, float]:
+    """Load the test durations from `durations_file`, or from the pytest cache."""
+    if durations_file:
+        try:
+            durations: Any = json.loads(pathlib.Path(durations_file).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            raise pytest.UsageError(
+                f"Unable to read the test durations file {durations_file}: {e}"
+            ) from e
+    else:
+        cache = getattr(config, "cache", None)
+        durations = cache.get(DURATIONS_CACHE_KEY, {}) if cache is not None else {}
+    if not isinstance(durations, dict):
+        return {}
+    return {
+        test_id: float(duration)
+        for test_id, duration in durations.items()
+        if isinstance(duration, (int, float))
+    }
+
+
+class ShardPlugin:
+    """A pytest plugin that runs only one shard of the collected tests.
+
+    Tests are identified by their node id, which is relative to the rootdir, so that
+    different machines partition the tests the same way. All shards must see the same
+    durations, either from a shared `durations_file` or from a pytest cache restored from
+    the same run. The durations of the tests that ran are saved to the pytest cache, so
+    later runs can be balanced by them.
+    """
+
+    def __init__(self, shard_index: int, shard_count: int, durations_file: str | None = None):
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.durations_file = durations_file
+        self.durations: dict[str, float] = {}
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config: pytest.Config, items: list[pytest.Item]):
+        shards = assign_shards(
+            [item.nodeid for item in items],
+            load_durations(config, self.durations_file),
+            self.shard_count,
+        )
+        selected: list[pytest.Item] = []
+        deselected: list[pytest.Item] = []
+        for item, shard in zip(items, shards):
+            if shard == self.shard_index - 1:
+                selected.append(item)
+            else:
+                deselected.append(item)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport):
+        # The duration of a test includes its setup and teardown.
+        self.durations[report.nodeid] = self.durations.get(report.nodeid, 0.0) + report.duration
+
+    def pytest_sessionfinish(self, session: pytest.Session):
+        cache = getattr(session.config, "cache", None)
+        # With pytest-xdist, the controller receives the reports of all workers.
+        if cache is None or not self.durations or os.getenv("PYTEST_XDIST_WORKER"):
+            return
+        durations = cache.get(DURATIONS_CACHE_KEY, {})
+        if not isinstance(durations, dict):
+            durations = {}
+        durations.update(self.durations)
+        cache.set(DURATIONS_CACHE_KEY, durations)